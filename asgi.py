@@ -0,0 +1,15 @@
+# asgi.py
+import os
+import sys
+
+# Add the project root to the Python path
+# This ensures that 'audiolms' can be imported correctly
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), 'audiolms'))
+sys.path.insert(0, os.path.dirname(project_root))
+
+from audiolms.asgi import application # Import the ASGI application (Socket.IO + Flask)
+
+# This file is used by ASGI servers to find the application, e.g.:
+#     uvicorn asgi:application --host 0.0.0.0 --port 5000
+# Use a single server worker: media is already spread across cores by the
+# media loop threads (AUDIOLMS_MEDIA_LOOPS).
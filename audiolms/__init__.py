@@ -1,3 +1,24 @@
 # audiolms/__init__.py
 # This file marks the audiolms directory as a Python package.
 # You can import modules from within this package.
+#
+# Submodules are loaded lazily on first attribute access, so `import audiolms`
+# (or `import audiolms.storage`) does not pull in the WebRTC stack or audio
+# device libraries that only some entry points need.
+import importlib
+
+_LAZY_SUBMODULES = ('config', 'models', 'storage', 'async_storage', 'embedder', 'recorder', 'catalog', 'importer', 'analysis', 'similarity', 'analytics', 'live')
+
+__all__ = list(_LAZY_SUBMODULES)
+
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        module = importlib.import_module(f'.{name}', __name__)
+        globals()[name] = module # Cache so __getattr__ is not hit again
+        return module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_SUBMODULES))
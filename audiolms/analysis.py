@@ -0,0 +1,369 @@
+# audiolms/analysis.py
+import concurrent.futures
+import logging
+import multiprocessing
+import struct
+import threading
+import time
+
+import numpy as np
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Analysis frame length; pauses are located to this resolution
+FRAME_SECONDS = 0.02
+FRAMES_PER_SECOND = int(round(1 / FRAME_SECONDS))
+# Audio decoded per streaming block
+BLOCK_SECONDS = 10
+# Log-spaced frequency bands (Hz) summarizing each frame's spectrum
+BAND_EDGES = np.geomspace(80, 7600, 17)
+# Silence after a chapter-starting pause that is kept before the speech resumes
+PAUSE_LEAD_IN = 0.3
+
+_WAVE_FORMAT_PCM = 1
+_WAVE_FORMAT_FLOAT = 3
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class _WavSource:
+    """
+    Reads PCM/float WAV files in blocks straight from the data chunk. Byte
+    offsets are exact: data offset + sample index * block alignment.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave_id != b'WAVE':
+                raise ValueError(f"{path} is not a RIFF/WAVE file")
+            fmt = None
+            while True:
+                header = f.read(8)
+                if len(header) < 8:
+                    raise ValueError(f"{path} has no data chunk")
+                chunk_id, chunk_size = struct.unpack('<4sI', header)
+                if chunk_id == b'fmt ':
+                    fmt = f.read(chunk_size)
+                    f.seek(chunk_size % 2, 1)
+                elif chunk_id == b'data':
+                    self.data_offset = f.tell()
+                    self.data_size = chunk_size
+                    break
+                else:
+                    f.seek(chunk_size + chunk_size % 2, 1) # Chunks are padded to even sizes
+        if fmt is None:
+            raise ValueError(f"{path} has no fmt chunk")
+        tag, self.channels, self.sample_rate, _, self.block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+        if tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            tag = struct.unpack('<H', fmt[24:26])[0] # First two bytes of the sub-format GUID
+        if tag not in (_WAVE_FORMAT_PCM, _WAVE_FORMAT_FLOAT) or bits not in (8, 16, 24, 32):
+            raise ValueError(f"{path}: unsupported WAV encoding (format {tag}, {bits} bits)")
+        self.float = tag == _WAVE_FORMAT_FLOAT
+        self.sample_width = bits // 8
+        self.duration = self.data_size // self.block_align / self.sample_rate
+
+    def _to_mono(self, data: bytes) -> np.ndarray:
+        width = self.sample_width
+        if self.float:
+            samples = np.frombuffer(data, dtype='<f4')
+        elif width == 1:
+            samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128) / 128
+        elif width == 2:
+            samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768
+        elif width == 3:
+            raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+            ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+            ints = np.where(ints & 0x800000, ints - 0x1000000, ints)
+            samples = ints.astype(np.float32) / 8388608
+        else:
+            samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648
+        if self.channels > 1:
+            samples = samples.reshape(-1, self.channels).mean(axis=1)
+        return samples
+
+    def blocks(self):
+        block_bytes = int(BLOCK_SECONDS * self.sample_rate) * self.block_align
+        remaining = self.data_size
+        with open(self.path, 'rb') as f:
+            f.seek(self.data_offset)
+            while remaining > 0:
+                data = f.read(min(block_bytes, remaining))
+                # Drop a trailing partial sample frame (truncated files)
+                data = data[:len(data) - len(data) % self.block_align]
+                if not data:
+                    break
+                remaining -= len(data)
+                yield self._to_mono(data)
+
+    def offset_at(self, seconds: float) -> int:
+        sample = min(int(seconds * self.sample_rate), self.data_size // self.block_align)
+        return self.data_offset + sample * self.block_align
+
+
+class _AvSource:
+    """
+    Decodes any other container/codec with PyAV, resampled to mono float at
+    settings.ANALYSIS_SAMPLE_RATE. Byte offsets come from the container's
+    packet positions, recorded while demuxing.
+    """
+    def __init__(self, path: str):
+        import av
+        self._av = av
+        self.path = path
+        self.sample_rate = settings.ANALYSIS_SAMPLE_RATE
+        self.duration = 0.0
+        # (seconds, byte offset) of packets, at most one per second
+        self._positions = []
+
+    def blocks(self):
+        av = self._av
+        block_samples = BLOCK_SECONDS * self.sample_rate
+        resampler = av.AudioResampler(format='flt', layout='mono', rate=self.sample_rate)
+        pending = []
+        pending_samples = 0
+        decoded = 0
+        with av.open(self.path) as container:
+            stream = container.streams.audio[0]
+            for packet in container.demux(stream):
+                if packet.pts is not None and packet.pos is not None and packet.pos >= 0:
+                    seconds = float(packet.pts * stream.time_base)
+                    if not self._positions or seconds >= self._positions[-1][0] + 1:
+                        self._positions.append((seconds, packet.pos))
+                # A packet without data marks the end of the stream and flushes the decoder.
+                for frame in packet.decode():
+                    frame.pts = None # Let the resampler keep its own timeline
+                    for output in self._resample(resampler, frame):
+                        samples = output.to_ndarray().reshape(-1)
+                        pending.append(samples)
+                        pending_samples += len(samples)
+                        decoded += len(samples)
+                if pending_samples >= block_samples:
+                    yield np.concatenate(pending)
+                    pending, pending_samples = [], 0
+            for output in self._resample(resampler, None):
+                pending.append(output.to_ndarray().reshape(-1))
+                decoded += pending[-1].shape[0]
+        if pending:
+            yield np.concatenate(pending)
+        self.duration = decoded / self.sample_rate
+
+    @staticmethod
+    def _resample(resampler, frame) -> list:
+        # PyAV >= 9 returns a list of frames, older versions a frame or None.
+        output = resampler.resample(frame)
+        if output is None:
+            return []
+        return output if isinstance(output, list) else [output]
+
+    def offset_at(self, seconds: float) -> int:
+        # Last recorded packet starting at or before `seconds`, so playback from
+        # the offset never starts after the requested time.
+        offset = self._positions[0][1] if self._positions else 0
+        for position_seconds, position in self._positions:
+            if position_seconds > seconds:
+                break
+            offset = position
+        return offset
+
+
+def open_source(path: str):
+    if path.lower().endswith('.wav'):
+        try:
+            return _WavSource(path)
+        except ValueError as e:
+            logger.debug(f"Falling back to PyAV for {path}: {e}")
+    return _AvSource(path)
+
+
+class FeatureExtractor:
+    """
+    Turns streamed mono blocks into per-frame loudness (dBFS) and per-second
+    band-energy vectors. All per-frame work is vectorized over a whole block:
+    the block is reshaped into a (frames, frame length) matrix, so each
+    block costs one RMS, one real FFT and one band reduction.
+    """
+    def __init__(self, sample_rate: int):
+        self.frame_length = int(round(sample_rate * FRAME_SECONDS))
+        self.window = np.hanning(self.frame_length).astype(np.float32)
+        frequencies = np.fft.rfftfreq(self.frame_length, 1 / sample_rate)
+        edges = np.searchsorted(frequencies, BAND_EDGES[BAND_EDGES < sample_rate / 2])
+        self.band_stop = edges[-1]
+        self.band_starts = np.unique(edges[:-1][edges[:-1] < self.band_stop])
+        self._leftover = np.zeros(0, dtype=np.float32)
+        self._pending_bands = np.zeros((0, len(self.band_starts) + 1), dtype=np.float32)
+        self._frame_db = []
+        self._seconds = []
+
+    def feed(self, samples: np.ndarray):
+        samples = np.concatenate((self._leftover, samples.astype(np.float32, copy=False)))
+        count = len(samples) // self.frame_length
+        self._leftover = samples[count * self.frame_length:]
+        if not count:
+            return
+        frames = samples[:count * self.frame_length].reshape(count, self.frame_length)
+
+        db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        self._frame_db.append(db.astype(np.float32))
+
+        power = np.abs(np.fft.rfft(frames * self.window, axis=1)) ** 2
+        bands = np.add.reduceat(power[:, :self.band_stop], self.band_starts, axis=1)
+        features = np.column_stack((db, np.log10(bands + 1e-10))).astype(np.float32)
+
+        # Average complete seconds; keep the remainder for the next block.
+        pending = np.concatenate((self._pending_bands, features))
+        whole = len(pending) // FRAMES_PER_SECOND * FRAMES_PER_SECOND
+        if whole:
+            self._seconds.append(pending[:whole].reshape(-1, FRAMES_PER_SECOND, pending.shape[1]).mean(axis=1))
+        self._pending_bands = pending[whole:]
+
+    def finish(self) -> tuple:
+        """Returns (frame loudness in dBFS, per-second feature matrix)."""
+        if len(self._pending_bands):
+            self._seconds.append(self._pending_bands.mean(axis=0, keepdims=True))
+        frame_db = np.concatenate(self._frame_db) if self._frame_db else np.zeros(0, dtype=np.float32)
+        seconds = np.concatenate(self._seconds) if self._seconds else np.zeros((0, len(self.band_starts) + 1), dtype=np.float32)
+        return frame_db, seconds
+
+
+def find_pauses(frame_db: np.ndarray, silence_db: float, min_pause: float) -> list:
+    """Returns (start, end) in seconds of every run of silent frames lasting at least `min_pause`."""
+    silent = np.concatenate(([0], (frame_db < silence_db).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(silent))
+    starts, ends = edges[0::2], edges[1::2]
+    long_enough = (ends - starts) * FRAME_SECONDS >= min_pause
+    return [(start * FRAME_SECONDS, end * FRAME_SECONDS) for start, end in zip(starts[long_enough], ends[long_enough])]
+
+
+def find_change_points(features: np.ndarray, window: int, threshold: float) -> list:
+    """
+    Returns (second, score) of points where the sound changes: the distance
+    between the mean standardized features of the `window` seconds before
+    and after each second, kept where it is a local maximum and at least
+    `threshold` standard deviations above the average distance.
+    """
+    count = len(features)
+    if count < 2 * window + 1:
+        return []
+    normalized = (features - features.mean(axis=0)) / (features.std(axis=0) + 1e-6)
+    cumulative = np.concatenate((np.zeros((1, normalized.shape[1])), np.cumsum(normalized, axis=0)))
+    points = np.arange(window, count - window + 1)
+    before = (cumulative[points] - cumulative[points - window]) / window
+    after = (cumulative[points + window] - cumulative[points]) / window
+    novelty = np.linalg.norm(after - before, axis=1)
+    limit = novelty.mean() + threshold * novelty.std()
+    changes = []
+    for i in np.flatnonzero(novelty > limit):
+        neighbourhood = novelty[max(i - window, 0):i + window + 1]
+        if novelty[i] == neighbourhood.max():
+            changes.append((float(points[i]), float(novelty[i])))
+    return changes
+
+
+def build_chapters(pauses: list, changes: list, duration: float, min_chapter: float) -> list:
+    """
+    Picks chapter starts from pauses (preferred, longest first) and change
+    points (strongest first), keeping them at least `min_chapter` apart and
+    away from the end. Returns (start, reason) sorted by time, starting at 0.
+    """
+    candidates = [(end - start + 1000.0, max(end - PAUSE_LEAD_IN, 0.0), 'pause') for start, end in pauses]
+    candidates += [(score, second, 'change') for second, score in changes]
+    chosen = [(0.0, 'start')]
+    for _, start, reason in sorted(candidates, reverse=True):
+        if duration - start < min_chapter / 2:
+            continue
+        if all(abs(start - existing) >= min_chapter for existing, _ in chosen):
+            chosen.append((start, reason))
+    return sorted(chosen)
+
+
+def analyze_file(path: str) -> dict:
+    """
+    Analyzes one recording in streaming blocks and returns its chapter and
+    seek index:
+
+        {'duration': seconds,
+         'chapters': [{'start': seconds, 'offset': byte offset, 'reason': 'start'|'pause'|'change'}, ...],
+         'seek_index': [[seconds, byte offset], ...]}  # every ANALYSIS_SEEK_INTERVAL seconds
+    """
+    started = time.perf_counter()
+    source = open_source(path)
+    extractor = FeatureExtractor(source.sample_rate)
+    for block in source.blocks():
+        extractor.feed(block)
+    frame_db, features = extractor.finish()
+    duration = source.duration
+
+    pauses = find_pauses(frame_db, settings.ANALYSIS_SILENCE_DB, settings.ANALYSIS_MIN_PAUSE)
+    changes = find_change_points(features, settings.ANALYSIS_CHANGE_WINDOW, settings.ANALYSIS_CHANGE_THRESHOLD)
+    chapters = [
+        {'start': round(float(start), 2), 'offset': source.offset_at(start), 'reason': reason}
+        for start, reason in build_chapters(pauses, changes, duration, settings.ANALYSIS_MIN_CHAPTER)
+    ]
+    seek_index = [
+        [float(seconds), source.offset_at(seconds)]
+        for seconds in np.arange(0, duration, settings.ANALYSIS_SEEK_INTERVAL)
+    ]
+
+    elapsed = time.perf_counter() - started
+    logger.debug(f"Analyzed {path}: {duration:.0f} s in {elapsed:.2f} s "
+                 f"({duration / max(elapsed, 1e-6):.0f}x realtime), {len(chapters)} chapter(s)")
+    return {'duration': round(duration, 3), 'chapters': chapters, 'seek_index': seek_index}
+
+
+def seek(analysis: dict, seconds: float) -> dict:
+    """
+    Returns the seek point at or before `seconds` ({'time', 'offset'}) and the
+    index of the chapter containing it, from a stored analysis.
+    """
+    time_point, offset = 0.0, 0
+    for point_seconds, point_offset in analysis.get('seek_index', []):
+        if point_seconds > seconds:
+            break
+        time_point, offset = point_seconds, point_offset
+    chapter = 0
+    for index, entry in enumerate(analysis.get('chapters', [])):
+        if entry['start'] <= seconds:
+            chapter = index
+    return {'time': time_point, 'offset': offset, 'chapter': chapter}
+
+
+class AnalysisQueue:
+    """
+    Runs analyze_file for newly stored recordings on a pool of worker
+    processes (one per core by default) and saves the results in the
+    catalog. Attach it to an AudioStorage with install(), after which every
+    saved or copied file is queued.
+    """
+    def __init__(self, catalog, workers: int = None):
+        self.catalog = catalog
+        # 'spawn' so workers do not inherit the parent's threads (e.g. an import's pool).
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            workers or settings.ANALYSIS_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+        )
+        # Done callbacks run on the pool's result thread (or the submitting thread)
+        self._counts_lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+
+    def install(self, storage):
+        storage.post_save_hooks.append(self.submit)
+
+    def submit(self, path: str, course_id: str = None):
+        future = self._pool.submit(analyze_file, path)
+        future.add_done_callback(lambda future: self._store(path, future))
+
+    def _store(self, path: str, future):
+        try:
+            self.catalog.save_analysis(path, future.result())
+            with self._counts_lock:
+                self.completed += 1
+        except Exception as e:
+            with self._counts_lock:
+                self.failed += 1
+            logger.error(f"Analysis of {path} failed: {e}")
+
+    def close(self, wait: bool = True):
+        """Stops the workers, by default after all queued files are analyzed."""
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,229 @@
+# audiolms/analytics.py
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+-- Seconds listened per (recording, bucket of ANALYTICS_BUCKET_SECONDS of media time)
+CREATE TABLE IF NOT EXISTS listen_buckets (
+    record_id TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (record_id, bucket)
+) WITHOUT ROWID;
+-- Event counters per recording
+CREATE TABLE IF NOT EXISTS listen_counts (
+    record_id TEXT PRIMARY KEY,
+    plays INTEGER NOT NULL DEFAULT 0,
+    seeks INTEGER NOT NULL DEFAULT 0,
+    heartbeats INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+"""
+
+# Event type -> column of listen_counts it increments
+_COUNTED = {'play': 'plays', 'seek': 'seeks', 'progress': 'heartbeats'}
+_COUNT_COLUMNS = ('plays', 'seeks', 'heartbeats')
+
+_MAX_RECORD_ID = 128
+
+
+class PlaybackAnalytics:
+    """
+    Aggregates playback beacons into per-recording listen histograms.
+
+    Browsers report batches of events (see static/analytics.js):
+        {'r': record_id, 't': 'play' | 'seek' | 'progress', 'from': s, 'to': s}
+    where a 'progress' heartbeat covers the media time [from, to) that was
+    actually played since the previous one. add_events() only updates
+    in-memory counters: the seconds listened per bucket of media time, and
+    event counts per recording. No event touches the database.
+
+    flush() swaps the counters for empty ones and writes them with a few
+    executemany() upserts in one transaction, so a flush costs one commit
+    however many events it covers. start() runs flush() every
+    ANALYTICS_FLUSH_INTERVAL seconds on a background thread.
+
+    Memory is bounded by the number of distinct (recording, bucket) keys
+    pending: reaching `max_pending` wakes the flusher early, and events for
+    new keys beyond twice that (e.g. while a slow flush is running) are
+    dropped and counted in `dropped`.
+    """
+    def __init__(self, path: str = None, bucket_seconds: float = None, flush_interval: float = None,
+                 max_pending: int = None):
+        self.path = path or settings.ANALYTICS_PATH
+        self.bucket_seconds = bucket_seconds or settings.ANALYTICS_BUCKET_SECONDS
+        self.flush_interval = flush_interval or settings.ANALYTICS_FLUSH_INTERVAL
+        self.max_pending = max_pending or settings.ANALYTICS_MAX_PENDING
+        self._lock = threading.Lock() # Guards the pending counters
+        self._db_lock = threading.Lock() # Serializes flushes and reads
+        self._buckets = {} # (record_id, bucket) -> seconds
+        self._counts = {} # record_id -> [plays, seeks, heartbeats]
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.accepted = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.flushes = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buckets) + len(self._counts)
+
+    def add_events(self, events) -> int:
+        """Aggregates a batch of beacon events; returns how many were accepted."""
+        accepted = rejected = dropped = 0
+        size = self.bucket_seconds
+        limit = 2 * self.max_pending
+        with self._lock:
+            buckets, counts = self._buckets, self._counts
+            for event in events:
+                parsed = _parse_event(event)
+                if parsed is None:
+                    rejected += 1
+                    continue
+                record_id, kind, start, end = parsed
+                record_counts = counts.get(record_id)
+                if record_counts is None:
+                    if len(buckets) + len(counts) >= limit:
+                        dropped += 1
+                        continue
+                    record_counts = counts[record_id] = [0, 0, 0]
+                record_counts[_COUNT_COLUMNS.index(_COUNTED[kind])] += 1
+                # Spread the played interval over the buckets it overlaps
+                bucket = int(start // size)
+                while kind == 'progress' and start < end:
+                    bucket_end = min((bucket + 1) * size, end)
+                    key = (record_id, bucket)
+                    if key in buckets:
+                        buckets[key] += bucket_end - start
+                    elif len(buckets) + len(counts) < limit:
+                        buckets[key] = bucket_end - start
+                    else:
+                        dropped += 1
+                        break
+                    start = bucket_end
+                    bucket += 1
+                accepted += 1
+            self.accepted += accepted
+            self.rejected += rejected
+            self.dropped += dropped
+            full = len(buckets) + len(counts) >= self.max_pending
+        if full:
+            self._wake.set()
+        if dropped:
+            logger.warning(f"Dropped {dropped} playback event(s): {self.pending} aggregates pending")
+        return accepted
+
+    def flush(self) -> int:
+        """
+        Writes all pending aggregates in one transaction; returns the number of
+        rows upserted. The database lock is held from taking the aggregates
+        until they are committed, so histogram() always finds them somewhere.
+        """
+        with self._db_lock:
+            with self._lock:
+                buckets, self._buckets = self._buckets, {}
+                counts, self._counts = self._counts, {}
+            if not buckets and not counts:
+                return 0
+            start = time.perf_counter()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO listen_buckets (record_id, bucket, seconds) VALUES (?, ?, ?) "
+                    "ON CONFLICT (record_id, bucket) DO UPDATE SET seconds = seconds + excluded.seconds",
+                    [(record_id, bucket, seconds) for (record_id, bucket), seconds in buckets.items()],
+                )
+                self._conn.executemany(
+                    f"INSERT INTO listen_counts (record_id, {', '.join(_COUNT_COLUMNS)}) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (record_id) DO UPDATE SET "
+                    + ', '.join(f"{column} = {column} + excluded.{column}" for column in _COUNT_COLUMNS),
+                    [(record_id, *values) for record_id, values in counts.items()],
+                )
+            self.flushes += 1
+        rows = len(buckets) + len(counts)
+        logger.debug(f"Flushed {rows} playback aggregate(s) in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return rows
+
+    def histogram(self, record_id: str) -> dict:
+        """
+        Returns a recording's listen histogram (seconds listened per bucket,
+        from bucket 0 to the last one listened to) and event counts, including
+        events not flushed yet.
+        """
+        # Stored and pending aggregates are read under one database lock, so a
+        # flush cannot move them from one to the other in between
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT bucket, seconds FROM listen_buckets WHERE record_id = ?", (record_id,),
+            ).fetchall()
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COUNT_COLUMNS)} FROM listen_counts WHERE record_id = ?", (record_id,),
+            ).fetchone()
+            listened = dict(rows)
+            counts = list(row or (0, 0, 0))
+            with self._lock:
+                for (pending_id, bucket), seconds in self._buckets.items():
+                    if pending_id == record_id:
+                        listened[bucket] = listened.get(bucket, 0.0) + seconds
+                for index, value in enumerate(self._counts.get(record_id, ())):
+                    counts[index] += value
+        seconds = [0.0] * (max(listened) + 1 if listened else 0)
+        for bucket, value in listened.items():
+            seconds[bucket] = round(value, 3)
+        return dict(zip(_COUNT_COLUMNS, counts), record_id=record_id, bucket_seconds=self.bucket_seconds,
+                    seconds=seconds)
+
+    def start(self):
+        """Starts the background flusher (idempotent)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='audiolms-analytics', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Counters were swapped out; losing one interval beats stalling ingestion.
+                logger.error(f"Error flushing playback analytics: {e}")
+
+    def close(self):
+        """Stops the flusher, writes what is pending and closes the database."""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+
+
+def _parse_event(event) -> tuple | None:
+    """Validates one beacon event; returns (record_id, kind, from, to) or None."""
+    if not isinstance(event, dict):
+        return None
+    record_id, kind = event.get('r'), event.get('t')
+    if not isinstance(record_id, str) or not 0 < len(record_id) <= _MAX_RECORD_ID or kind not in _COUNTED:
+        return None
+    if kind != 'progress':
+        return record_id, kind, 0.0, 0.0
+    start, end = event.get('from'), event.get('to')
+    if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+        return None
+    # Heartbeats cover a few seconds; anything longer is a client bug or forged.
+    if not (math.isfinite(start) and math.isfinite(end)) or start < 0 or not 0 <= end - start <= settings.ANALYTICS_MAX_INTERVAL:
+        return None
+    return record_id, kind, float(start), float(end)
@@ -0,0 +1,47 @@
+# audiolms/asgi.py
+# Native asyncio server mode: a python-socketio AsyncServer handles signaling on
+# the ASGI server's event loop, the Flask app serves HTTP routes, and peer
+# connections run on dedicated media loop threads (one per core by default).
+#
+# Run with any ASGI server, e.g.:
+#     uvicorn audiolms.asgi:application
+import logging
+
+import socketio
+from asgiref.wsgi import WsgiToAsgi
+
+from .web import app
+from .live import ice
+from .live.signaling import setup_async_signaling
+
+logger = logging.getLogger(__name__)
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*') # Allow all origins for demo
+media_loops = setup_async_signaling(sio)
+# Lets the Flask admin routes report per-backend load
+app.extensions['audiolms.media'] = media_loops
+
+
+async def _on_startup():
+    ice.install() # Media loop threads share this process's aioice
+    await media_loops.start()
+
+
+async def _on_shutdown():
+    await media_loops.stop()
+
+
+# Socket.IO traffic is handled by `sio`; every other request goes to the Flask app.
+application = socketio.ASGIApp(
+    sio,
+    other_asgi_app=WsgiToAsgi(app),
+    on_startup=_on_startup,
+    on_shutdown=_on_shutdown,
+)
+
+
+def run(host: str = '127.0.0.1', port: int = 5000):
+    import uvicorn # Optional dependency: pip install audiolms[asgi]
+
+    logger.info(f"Starting ASGI server on {host}:{port}")
+    uvicorn.run(application, host=host, port=port, lifespan='on')
@@ -0,0 +1,88 @@
+# audiolms/assets.py
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli # Optional: pip install brotli
+except ImportError:
+    brotli = None
+
+STATIC_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+# Hashed asset URLs never change content, so browsers and CDNs may keep them for a year.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Encodings we can serve, in order of preference
+_ENCODINGS = ('br', 'gzip')
+
+
+class Asset:
+    """One static file, with its content-hashed name and precompressed variants."""
+    def __init__(self, name: str, content: bytes):
+        digest = hashlib.sha256(content).hexdigest()
+        stem, extension = os.path.splitext(name)
+        self.name = name
+        self.hashed_name = f"{stem}.{digest[:12]}{extension}"
+        self.etag = digest[:32]
+        self.mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.variants = {'identity': content}
+        # mtime=0 keeps the gzip output (and so any CDN's copy) identical across restarts.
+        compressed = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed['br'] = brotli.compress(content, quality=11)
+        for encoding, data in compressed.items():
+            # Tiny files can grow when compressed; only keep variants that help.
+            if len(data) < len(content):
+                self.variants[encoding] = data
+
+    def negotiate(self, accept_encodings) -> tuple:
+        """
+        Returns (encoding, body) for a request's parsed Accept-Encoding header
+        (werkzeug's request.accept_encodings).
+        """
+        for encoding in _ENCODINGS:
+            if encoding in self.variants and accept_encodings.quality(encoding) > 0:
+                return encoding, self.variants[encoding]
+        return 'identity', self.variants['identity']
+
+
+class AssetManifest:
+    """
+    Static assets loaded, hashed and compressed once at startup.
+
+    Pages link assets through url_for(name), which returns the content-hashed
+    URL (e.g. /assets/live.3fa2c81b9d0e.js). Because the URL changes whenever
+    the file does, assets can be served with IMMUTABLE_CACHE_CONTROL and
+    repeat visits load them from the browser cache without any request.
+    """
+    def __init__(self, folder: str = STATIC_FOLDER, url_prefix: str = '/assets'):
+        self.folder = folder
+        self.url_prefix = url_prefix
+        self._by_name = {}
+        self._by_hashed_name = {}
+        self.load()
+
+    def load(self):
+        """(Re)reads every file of the folder."""
+        by_name = {}
+        for entry in sorted(os.scandir(self.folder), key=lambda entry: entry.name):
+            if entry.is_file() and not entry.name.startswith('.'):
+                with open(entry.path, 'rb') as f:
+                    by_name[entry.name] = Asset(entry.name, f.read())
+        self._by_name = by_name
+        self._by_hashed_name = {asset.hashed_name: asset for asset in by_name.values()}
+        logger.debug(f"Loaded {len(by_name)} asset(s) from {self.folder} (brotli: {brotli is not None})")
+
+    def url_for(self, name: str) -> str:
+        return f"{self.url_prefix}/{self._by_name[name].hashed_name}"
+
+    def get(self, hashed_name: str) -> Asset | None:
+        return self._by_hashed_name.get(hashed_name)
+
+    def __iter__(self):
+        return iter(self._by_name.values())
@@ -0,0 +1,279 @@
+# audiolms/async_storage.py
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import os
+import threading
+
+from .config import settings
+from .storage import AudioStorage
+
+logger = logging.getLogger(__name__)
+
+
+class IOSlots:
+    """
+    Counting semaphore shared by every event loop in the process (signaling
+    loop, media loops, per-request loops of async Flask views). acquire() is
+    awaited on the caller's loop; release() may be called from any thread.
+    Waiters are served in arrival order.
+    """
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self._lock = threading.Lock()
+        self._waiters = collections.deque() # (loop, future)
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.in_use < self.limit and not self._waiters:
+                self.in_use += 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((loop, future))
+                    granted = False
+                except ValueError:
+                    granted = True # release() handed us the slot as we were cancelled
+            if granted:
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self.in_use -= 1
+                return
+            # The slot passes straight to the next waiter; in_use stays the same.
+            loop, future = self._waiters.popleft()
+        loop.call_soon_threadsafe(_grant, future)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+def _grant(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _FsyncBatcher:
+    """
+    Group commit for completed files. Files finishing while a flush is running
+    queue up and are handled together by the next flush: each file is
+    fsynced and renamed to its final name, then every affected directory is
+    fsynced once for the whole batch (instead of once per file).
+    """
+    def __init__(self, executor, fsync: bool):
+        self._executor = executor
+        self._fsync = fsync
+        self._lock = threading.Lock()
+        self._pending = [] # (file object, partial path, final path, concurrent Future)
+        self._flushing = False
+
+    def commit(self, f, partial_path: str, final_path: str) -> concurrent.futures.Future:
+        done = concurrent.futures.Future()
+        with self._lock:
+            self._pending.append((f, partial_path, final_path, done))
+            if self._flushing:
+                return done
+            self._flushing = True
+        self._executor.submit(self._flush)
+        return done
+
+    def _flush(self):
+        finished = False
+        try:
+            while True:
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    if not batch:
+                        self._flushing = False
+                        finished = True
+                        return
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    # e.g. a directory that cannot be opened or fsynced: the renames are not durable
+                    logger.error(f"Failed to commit {len(batch)} file(s): {e}")
+                    for _, _, _, done in batch:
+                        if not done.done():
+                            done.set_exception(e)
+        finally:
+            if not finished:
+                # Interrupted by a non-Exception error: let the next commit() start a flush again
+                with self._lock:
+                    self._flushing = False
+
+    def _commit_batch(self, batch: list):
+        directories = set()
+        for f, partial_path, final_path, done in batch:
+            try:
+                if self._fsync:
+                    os.fsync(f.fileno())
+                f.close()
+                os.replace(partial_path, final_path)
+                directories.add(os.path.dirname(final_path))
+            except Exception as e:
+                f.close()
+                done.set_exception(e)
+        if self._fsync:
+            for directory in directories:
+                # Makes the renames themselves durable
+                fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        for _, _, final_path, done in batch:
+            if not done.done():
+                done.set_result(final_path)
+        logger.debug(f"Committed {len(batch)} file(s) in {len(directories)} directory fsync(s)")
+
+
+class AsyncAudioStorage:
+    """
+    Non-blocking front end for AudioStorage, for use on event loops.
+
+    All disk work runs on a dedicated, bounded pool of I/O threads, never on
+    the calling loop. Every operation holds one of `max_pending` I/O slots
+    while its disk work is queued or running; when all slots are taken,
+    producers wait in `await`, so a burst of uploads slows itself down
+    instead of piling buffers into memory or starving signaling of CPU.
+
+    Files are written to `<name>.part`, and renamed to their final name only
+    after the last chunk is written and fsynced, so readers never see a
+    partial file. Fsyncs of files completing together are grouped (see
+    _FsyncBatcher).
+    """
+    def __init__(self, storage: AudioStorage = None, io_workers: int = None, max_pending: int = None,
+                 write_buffer: int = None, fsync: bool = None):
+        self.storage = storage or AudioStorage(settings.UPLOAD_FOLDER)
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            io_workers or settings.STORAGE_IO_WORKERS, thread_name_prefix='audiolms-io',
+        )
+        self.slots = IOSlots(max_pending or settings.STORAGE_MAX_PENDING_IO)
+        self.write_buffer = write_buffer or settings.STORAGE_WRITE_BUFFER
+        self._batcher = _FsyncBatcher(self._executor, settings.STORAGE_FSYNC if fsync is None else fsync)
+
+    async def _run(self, function, *args):
+        """Runs a blocking call on the I/O pool while holding an I/O slot."""
+        await self.slots.acquire()
+        try:
+            return await asyncio.wrap_future(self._executor.submit(function, *args))
+        finally:
+            self.slots.release()
+
+    async def save(self, chunks, filename: str, course_id: str = None) -> str:
+        """
+        Writes `chunks` (bytes, or a sync/async iterable of bytes) to local
+        storage and returns the final path once the file is durable.
+        Small chunks are coalesced into `write_buffer`-sized writes. Sync
+        iterables are consumed on the loop, so wrap blocking sources (e.g. a
+        file object) with iterate().
+        """
+        directory = await self._run(self.storage._local_directory, course_id)
+        file_path = os.path.join(directory, filename)
+        partial_path = file_path + '.part'
+        f = await self._run(open, partial_path, 'wb')
+        try:
+            buffer = bytearray()
+            async for chunk in _aiter(chunks):
+                buffer += chunk
+                if len(buffer) >= self.write_buffer:
+                    await self._run(f.write, bytes(buffer))
+                    buffer.clear()
+            if buffer:
+                await self._run(f.write, bytes(buffer))
+            await self._run(f.flush)
+        except BaseException:
+            await self._run(_discard, f, partial_path)
+            raise
+        await self.slots.acquire()
+        try:
+            await asyncio.wrap_future(self._batcher.commit(f, partial_path, file_path))
+        finally:
+            self.slots.release()
+        logger.info(f"Audio file saved locally: {file_path}")
+        await self._run(self.storage._run_post_save_hooks, file_path, course_id)
+        return file_path
+
+    async def copy(self, source_path: str, filename: str, course_id: str = None) -> str:
+        """AudioStorage.copy_audio_local on the I/O pool."""
+        return await self._run(self.storage.copy_audio_local, source_path, filename, course_id)
+
+    async def read(self, path: str, chunk_size: int = None, start: int = 0, stop: int = None):
+        """
+        Async iterator over the bytes [start, stop) of a file. The next chunk
+        is read while the consumer handles the current one.
+        """
+        chunk_size = chunk_size or self.write_buffer
+        f = await self._run(open, path, 'rb')
+        pending = None
+        try:
+            await self._run(f.seek, start)
+            remaining = None if stop is None else stop - start
+
+            def next_size():
+                return chunk_size if remaining is None else min(chunk_size, remaining)
+
+            pending = asyncio.ensure_future(self._run(f.read, next_size())) if next_size() > 0 else None
+            while pending is not None:
+                chunk = await pending
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                pending = asyncio.ensure_future(self._run(f.read, next_size())) if next_size() > 0 else None
+                yield chunk
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            await self._run(f.close)
+
+    async def export_course_zip(self, course_id: str, start: int = 0, stop: int = None):
+        """Async iterator over a course's ZIP export (see AudioStorage.export_course_zip)."""
+        archive = await self._run(self.storage.export_course_zip, course_id)
+        async for chunk in self.iterate(archive.iter_bytes(start, stop)):
+            yield chunk
+
+    async def iterate(self, iterator):
+        """Async iterator driving a blocking iterator (e.g. a file generator) on the I/O pool."""
+        iterator = iter(iterator)
+        done = object()
+        while True:
+            item = await self._run(next, iterator, done)
+            if item is done:
+                return
+            yield item
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+
+def _discard(f, partial_path: str):
+    f.close()
+    try:
+        os.remove(partial_path)
+    except FileNotFoundError:
+        pass
+
+
+async def _aiter(chunks):
+    """Yields from bytes, a sync iterable or an async iterable of bytes."""
+    if isinstance(chunks, (bytes, bytearray, memoryview)):
+        yield bytes(chunks)
+    elif hasattr(chunks, '__aiter__'):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
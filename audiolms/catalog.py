@@ -0,0 +1,146 @@
+# audiolms/catalog.py
+import json
+import logging
+import sqlite3
+import threading
+
+from .config import settings
+from .models import AudioRecord
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    url TEXT NOT NULL,
+    duration REAL NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    sha256 TEXT,
+    course_id TEXT,
+    mime_type TEXT,
+    version INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS recordings_course ON recordings (course_id);
+-- Chapter/seek index from analysis.py, keyed by file URL so it can be saved
+-- before or after the recording's row is inserted.
+CREATE TABLE IF NOT EXISTS recording_analysis (
+    url TEXT PRIMARY KEY,
+    analysis TEXT NOT NULL
+);
+"""
+
+_COLUMNS = ('id', 'name', 'url', 'duration', 'size', 'sha256', 'course_id', 'mime_type', 'version')
+
+# Columns added after the first schema version: name -> definition
+_ADDED_COLUMNS = {
+    'mime_type': 'TEXT',
+    'version': 'INTEGER NOT NULL DEFAULT 1',
+}
+
+_SELECT = (
+    f"SELECT {', '.join('r.' + column for column in _COLUMNS)}, a.analysis "
+    "FROM recordings r LEFT JOIN recording_analysis a ON a.url = r.url"
+)
+
+
+def _record_from_row(row) -> AudioRecord:
+    record = AudioRecord.from_dict(dict(zip(_COLUMNS, row)))
+    record.analysis = json.loads(row[-1]) if row[-1] else None
+    return record
+
+
+class AudioCatalog:
+    """
+    Stores AudioRecord metadata in a SQLite database.
+
+    Writes are meant to be batched: insert_many() adds any number of records
+    in one transaction, which is what makes bulk imports fast (one commit and
+    fsync per batch instead of per file). The connection is shared between
+    threads and serialized with a lock.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or settings.CATALOG_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL lets readers (e.g. the web app) work while an import is writing.
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(recordings)")}
+        with self._conn:
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE recordings ADD COLUMN {column} {definition}")
+                    logger.info(f"Added column {column} to {self.path}")
+
+    def insert_many(self, records: list) -> int:
+        """
+        Inserts records in a single transaction, ignoring IDs already present.
+        Returns the number of records actually added.
+        """
+        rows = [tuple(getattr(record, column) for column in _COLUMNS) for record in records]
+        placeholders = ', '.join('?' * len(_COLUMNS))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                f"INSERT OR IGNORE INTO recordings ({', '.join(_COLUMNS)}) VALUES ({placeholders})", rows,
+            )
+            added = self._conn.total_changes - before
+        logger.debug(f"Inserted {added} of {len(rows)} record(s) into {self.path}")
+        return added
+
+    def get(self, record_id: str) -> AudioRecord | None:
+        with self._lock:
+            row = self._conn.execute(f"{_SELECT} WHERE r.id = ?", (record_id,)).fetchone()
+        return _record_from_row(row) if row else None
+
+    def course_records(self, course_id: str) -> list:
+        """Returns a course's records ordered by name."""
+        with self._lock:
+            rows = self._conn.execute(f"{_SELECT} WHERE r.course_id = ? ORDER BY r.name", (course_id,)).fetchall()
+        return [_record_from_row(row) for row in rows]
+
+    def save_analysis(self, url: str, analysis: dict):
+        """
+        Stores the chapter/seek index of the file at `url` and bumps the version
+        of its record (if already inserted), so cached embeds are re-rendered.
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recording_analysis (url, analysis) VALUES (?, ?)", (url, json.dumps(analysis)),
+            )
+            self._conn.execute("UPDATE recordings SET version = version + 1 WHERE url = ?", (url,))
+
+    def unanalyzed_urls(self) -> list:
+        """Returns the URLs of records that have no analysis yet."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT r.url FROM recordings r LEFT JOIN recording_analysis a ON a.url = r.url WHERE a.url IS NULL",
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def record_urls(self) -> list:
+        """Returns (id, url) of every record."""
+        with self._lock:
+            return self._conn.execute("SELECT id, url FROM recordings").fetchall()
+
+    def stored_content(self) -> list:
+        """Returns (sha256, course_id, url) of every record with a known content digest."""
+        with self._lock:
+            return self._conn.execute("SELECT sha256, course_id, url FROM recordings WHERE sha256 IS NOT NULL").fetchall()
+
+    def ids(self) -> set:
+        """Returns the IDs of all stored records."""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT id FROM recordings")}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM recordings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
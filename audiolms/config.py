@@ -21,8 +21,157 @@ class Settings:
         {"urls": "stun:stun4.l.google.com:19302"},
     ]
 
+    # ICE gathering mode for server-side peer connections:
+    #   'stun' - gather host candidates plus server-reflexive candidates through
+    #            DEFAULT_STUN_SERVERS (needs a STUN round trip per connection).
+    #   'host' - gather host candidates only. Use this when the server has a known,
+    #            directly reachable address; no STUN traffic is generated at all.
+    ICE_MODE = os.environ.get('AUDIOLMS_ICE_MODE', 'stun')
+    # Local interface addresses to gather host candidates on (comma separated in the
+    # environment); the ICE agent binds a socket to each. When empty, local interfaces
+    # are enumerated once and cached.
+    ICE_HOST_ADDRESSES = [a.strip() for a in os.environ.get('AUDIOLMS_ICE_HOST_ADDRESSES', '').split(',') if a.strip()]
+    # Public addresses that map 1:1 to this server's interfaces (e.g. a cloud VM behind
+    # NAT). They are announced as extra host candidates on the ports of the bound
+    # sockets, but never bound themselves.
+    ICE_ADVERTISED_ADDRESSES = [a.strip() for a in os.environ.get('AUDIOLMS_ICE_ADVERTISED_ADDRESSES', '').split(',') if a.strip()]
+    # How long (seconds) the enumerated interface addresses are reused before re-scanning.
+    ICE_HOST_ADDRESS_TTL = 300
+
+    # Number of pre-created RTCPeerConnection objects kept ready per node, so a new
+    # socket does not pay certificate generation on its connect path.
+    PEER_CONNECTION_POOL_SIZE = 8
+
+    # Per-listener adaptive bitrate. Listeners with similar network conditions share
+    # one Opus encoder per tier; tiers are ordered from best to most robust.
+    # A listener stays in the best tier whose max_loss (fraction of packets) and
+    # max_rtt (seconds, None = any) its RTCP receiver reports satisfy.
+    ABR_TIERS = [
+        {'name': 'high', 'bitrate': 48000, 'ptime': 20, 'fec': False, 'packet_loss': 0, 'max_loss': 0.02, 'max_rtt': 0.3},
+        {'name': 'medium', 'bitrate': 24000, 'ptime': 20, 'fec': True, 'packet_loss': 10, 'max_loss': 0.08, 'max_rtt': 0.6},
+        {'name': 'low', 'bitrate': 12000, 'ptime': 60, 'fec': True, 'packet_loss': 25, 'max_loss': 1.0, 'max_rtt': None},
+    ]
+    # Seconds between RTCP stats polls for each listener
+    ABR_INTERVAL = 2.0
+    # Consecutive polls needed before moving a listener down / up one tier
+    ABR_DOWNGRADE_SAMPLES = 2
+    ABR_UPGRADE_SAMPLES = 5
+
+    # Node-wide egress scheduling of live media (see live/egress.py). Outbound media of
+    # the node, and optionally of each session, is capped in bits/s (0 = unlimited:
+    # traffic is only measured). Sessions share the node by weighted max-min fairness.
+    EGRESS_NODE_RATE = int(os.environ.get('AUDIOLMS_EGRESS_NODE_RATE', 0))
+    EGRESS_SESSION_RATE = int(os.environ.get('AUDIOLMS_EGRESS_SESSION_RATE', 0))
+    # Seconds of its rate a bucket may send at once, and longest wait for a speech
+    # packet before it is dropped (silence packets are dropped instead of waiting)
+    EGRESS_BURST = 0.05
+    EGRESS_MAX_DELAY = 0.06
+    # Seconds between re-measuring session demand and reassigning session rates
+    EGRESS_REBALANCE_INTERVAL = 0.5
+    # Encoded frames quieter than this (dBFS RMS) are silence/comfort noise
+    EGRESS_SPEECH_DB = -45.0
+    # IP + UDP + RTP + SRTP bytes added to every packet's payload on the wire
+    EGRESS_PACKET_OVERHEAD = 50
+    # Utilization at which the node counts as full when reporting listener headroom
+    EGRESS_TARGET_UTILIZATION = 0.9
+
+    # Seconds a live session survives its teacher's disconnect. Students stay connected
+    # (hearing silence) and the teacher can resume with the session's resume token.
+    SESSION_GRACE_PERIOD = 30
+
+    # Per-session resource accounting and limits (see live/resources.py). Every
+    # RESOURCE_INTERVAL seconds each live session's usage is measured. A session over
+    # one of its limits (0 = unlimited) first loses its side pipelines (recorders,
+    # analyzers), then its lowest-priority listeners are disconnected.
+    RESOURCE_INTERVAL = 2.0
+    SESSION_MAX_PEER_CONNECTIONS = int(os.environ.get('AUDIOLMS_SESSION_MAX_PEER_CONNECTIONS', 0))
+    # Approximate bytes held for the session (see the estimates below)
+    SESSION_MAX_MEMORY = int(os.environ.get('AUDIOLMS_SESSION_MAX_MEMORY', 0))
+    # Fraction of one core spent in the session's track callbacks (encoding, mixing, egress)
+    SESSION_MAX_CPU = float(os.environ.get('AUDIOLMS_SESSION_MAX_CPU', 0))
+    # Memory estimates on top of measured buffers: per RTCPeerConnection (ICE, DTLS, SRTP
+    # and RTP state) and per encoder, mixer or side pipeline (codec and resampler state)
+    RESOURCE_PEER_CONNECTION_MEMORY = 256 * 1024
+    RESOURCE_PIPELINE_MEMORY = 64 * 1024
+
+    # Server mode used by `python -m audiolms`:
+    #   'eventlet' - Flask-SocketIO on eventlet (the original demo server)
+    #   'asgi'     - python-socketio AsyncServer + Flask under an ASGI server (uvicorn)
+    SERVER_MODE = os.environ.get('AUDIOLMS_SERVER_MODE', 'eventlet')
+    # Where live media runs in 'asgi' mode:
+    #   'threads'   - media event-loop threads inside the server process (MEDIA_LOOPS)
+    #   'processes' - media worker processes, one per core (MEDIA_WORKERS); the server
+    #                 process only proxies signaling to them over local IPC
+    MEDIA_BACKEND = os.environ.get('AUDIOLMS_MEDIA_BACKEND', 'threads')
+    # Number of dedicated media event-loop threads (one per core by default)
+    MEDIA_LOOPS = int(os.environ.get('AUDIOLMS_MEDIA_LOOPS', 0)) or os.cpu_count() or 1
+    # Number of media worker processes (one per core by default)
+    MEDIA_WORKERS = int(os.environ.get('AUDIOLMS_MEDIA_WORKERS', 0)) or os.cpu_count() or 1
+    # How often (seconds) each media worker reports its load to the server process
+    MEDIA_WORKER_REPORT_INTERVAL = 1.0
+
+    # SQLite database holding AudioRecord metadata (see catalog.py)
+    CATALOG_PATH = os.environ.get('AUDIOLMS_CATALOG_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'catalog.sqlite3'))
+
+    # Async storage (see async_storage.py): I/O threads, disk operations queued or
+    # running at once before producers are made to wait, write coalescing size, and
+    # whether completed files are fsynced before being renamed into place
+    STORAGE_IO_WORKERS = 4
+    STORAGE_MAX_PENDING_IO = 16
+    STORAGE_WRITE_BUFFER = 1024 * 1024
+    STORAGE_FSYNC = True
+
+    # Playback analytics (see analytics.py): aggregate database, histogram bucket size
+    # (seconds of media time), seconds between bulk flushes, distinct aggregates kept
+    # in memory before an early flush, longest accepted heartbeat interval (seconds)
+    # and largest accepted beacon body (bytes)
+    ANALYTICS_PATH = os.environ.get('AUDIOLMS_ANALYTICS_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analytics.sqlite3'))
+    ANALYTICS_BUCKET_SECONDS = 10
+    ANALYTICS_FLUSH_INTERVAL = 30.0
+    ANALYTICS_MAX_PENDING = 200000
+    ANALYTICS_MAX_INTERVAL = 60.0
+    ANALYTICS_MAX_BEACON_BYTES = 64 * 1024
+
+    # Rendered recording fragments kept in the embedder's LRU cache (per process)
+    EMBED_CACHE_SIZE = 4096
+
+    # Chapter/seek analysis of stored recordings (see analysis.py)
+    ANALYSIS_WORKERS = int(os.environ.get('AUDIOLMS_ANALYSIS_WORKERS', 0)) or os.cpu_count() or 1
+    # Catalog and analyze recordings uploaded through the web app as they are stored (0 to disable)
+    ANALYZE_UPLOADS = os.environ.get('AUDIOLMS_ANALYZE_UPLOADS', '1') != '0'
+    # Sample rate compressed formats are decoded at for analysis (WAV is read as is)
+    ANALYSIS_SAMPLE_RATE = 16000
+    # Frames quieter than this (dBFS) are silent; this long a silence is a pause (seconds)
+    ANALYSIS_SILENCE_DB = -45.0
+    ANALYSIS_MIN_PAUSE = 2.0
+    # Seconds of audio compared on each side of a candidate change point, and how
+    # many standard deviations above average the change must be
+    ANALYSIS_CHANGE_WINDOW = 10
+    ANALYSIS_CHANGE_THRESHOLD = 2.5
+    # Minimum chapter length and spacing of seek index entries (seconds)
+    ANALYSIS_MIN_CHAPTER = 60.0
+    ANALYSIS_SEEK_INTERVAL = 5.0
+
+    # Landmark fingerprint index for similarity search (see similarity.py), and the
+    # number of hashes that must agree on one time offset for a clip to match
+    SIMILARITY_INDEX_PATH = os.environ.get('AUDIOLMS_SIMILARITY_INDEX_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'similarity.sqlite3'))
+    SIMILARITY_MIN_MATCHES = 12
+
+    # Bulk import (`python -m audiolms import`). Hashing releases the GIL and copies
+    # wait on disk, so a pool larger than the core count keeps cores and disks busy.
+    IMPORT_WORKERS = int(os.environ.get('AUDIOLMS_IMPORT_WORKERS', 0)) or 2 * (os.cpu_count() or 1)
+    # Records inserted per catalog transaction (and per checkpoint flush)
+    IMPORT_BATCH_SIZE = 500
+    # File extensions picked up when walking an archive
+    IMPORT_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.opus', '.oga', '.m4a', '.aac', '.flac', '.webm')
+
+    def ensure_upload_folder(self) -> str:
+        """
+        Creates the upload folder if needed and returns its path.
+        Called by the entry points that write uploads, not at import time.
+        """
+        os.makedirs(self.UPLOAD_FOLDER, exist_ok=True)
+        return self.UPLOAD_FOLDER
+
 # Create an instance of the settings to be imported by other modules
 settings = Settings()
-
-# Ensure the upload folder exists
-os.makedirs(settings.UPLOAD_FOLDER, exist_ok=True)
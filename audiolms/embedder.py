@@ -1,25 +1,72 @@
 # audiolms/embedder.py
 import logging
+import threading
+from collections import OrderedDict
+
+from .config import settings
 
 logger = logging.getLogger(__name__)
 
-def generate_embed_code(audio_url: str, title: str = "Audio Playback") -> str:
+# HTML escaping for text and quoted attribute values, done in one str.translate pass
+_HTML_ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'})
+
+
+def escape(value) -> str:
+    """Escapes a value for use in HTML text or a quoted attribute."""
+    return str(value).translate(_HTML_ESCAPES)
+
+
+# Templates are defined once; every field substituted into them is escaped first.
+_EMBED_TEMPLATE = """
+    <audio controls{attributes}>
+        <source src="{url}" type="{mime_type}">
+        Your browser does not support the audio element.
+    </audio>
+    """
+
+_DOWNLOAD_TEMPLATE = """
+    <a href="{url}" download="{filename}">Download {filename}</a>
+    """
+
+# One recording on a course page. preload="none" when the duration is known:
+# the player shows it from data-duration/the caption instead of fetching the
+# audio to learn it, so a page of 500 players does not start 500 downloads.
+_RECORD_TEMPLATE = (
+    '<figure class="audiolms-recording" data-record-id="{id}" data-duration="{duration}">'
+    '<figcaption>{name} <span class="duration">{duration_label}</span></figcaption>'
+    '<audio controls preload="{preload}"><source src="{url}" type="{mime_type}">'
+    'Your browser does not support the audio element.</audio>'
+    '<a href="{url}" download="{filename}" type="{mime_type}">Download</a>'
+    '{chapters}'
+    '</figure>'
+)
+
+# Chapter links use media fragments (#t=seconds), which players seek to directly.
+_CHAPTER_TEMPLATE = '<li><a href="{url}#t={start}" data-offset="{offset}">{label}</a></li>'
+
+
+def format_duration(seconds: float) -> str:
+    """Formats seconds as M:SS or H:MM:SS."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def generate_embed_code(audio_url: str, title: str = "Audio Playback", mime_type: str = "audio/mpeg",
+                        record_id: str = None) -> str:
     """
     Generates an HTML <audio> tag for embedding an audio file.
+    With a record_id, the player is tagged with data-record-id so that
+    static/analytics.js reports its playback.
     """
     if not audio_url:
         logger.warning("Attempted to generate embed code with empty audio_url.")
         return "<p>Error: Audio URL not provided.</p>"
 
-    # Simple HTML5 audio tag
-    embed_html = f"""
-    <audio controls>
-        <source src="{audio_url}" type="audio/mpeg">
-        Your browser does not support the audio element.
-    </audio>
-    """
-    logger.info(f"Generated embed code for {audio_url}")
-    return embed_html
+    logger.debug(f"Generated embed code for {audio_url}")
+    attributes = f' data-record-id="{escape(record_id)}"' if record_id else ''
+    return _EMBED_TEMPLATE.format(url=escape(audio_url), mime_type=escape(mime_type), attributes=attributes)
+
 
 def generate_download_link(audio_url: str, filename: str = "audio.wav") -> str:
     """
@@ -29,8 +76,121 @@ def generate_download_link(audio_url: str, filename: str = "audio.wav") -> str:
         logger.warning("Attempted to generate download link with empty audio_url.")
         return "<p>Error: Audio URL not provided.</p>"
 
-    download_link_html = f"""
-    <a href="{audio_url}" download="{filename}">Download {filename}</a>
+    logger.debug(f"Generated download link for {audio_url}")
+    return _DOWNLOAD_TEMPLATE.format(url=escape(audio_url), filename=escape(filename))
+
+
+def generate_course_export_link(course_id: str) -> str:
+    """
+    Generates an HTML link for downloading all recordings of a course as one ZIP.
+    """
+    if not course_id:
+        logger.warning("Attempted to generate export link with empty course_id.")
+        return "<p>Error: Course ID not provided.</p>"
+
+    from urllib.parse import quote # Deferred to keep this module cheap to import
+    export_url = f"/courses/{quote(course_id)}/export.zip"
+    logger.debug(f"Generated export link for course {course_id}")
+    return f"""
+    <a href="{escape(export_url)}" download="{escape(course_id)}.zip">Download all recordings ({escape(course_id)}.zip)</a>
+    """
+
+
+class EmbedCache:
+    """
+    Thread-safe LRU cache of rendered recording fragments, keyed by
+    (record ID, record version). Updating a record bumps its version, so
+    stale fragments are never served and simply age out.
+    """
+    def __init__(self, maxsize: int = None):
+        self.maxsize = maxsize or settings.EMBED_CACHE_SIZE
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is None:
+                self.misses += 1
+                return None
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            return fragment
+
+    def put(self, key: tuple, fragment: str):
+        with self._lock:
+            self._fragments[key] = fragment
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def __len__(self):
+        return len(self._fragments)
+
+
+# Shared by all requests of this process
+embed_cache = EmbedCache()
+
+
+def recording_audio_url(record) -> str:
+    """
+    Public URL of a recording's audio (served with Range support by web.py).
+    record.url may be a storage path on the server, so it is never put in pages.
+    """
+    from urllib.parse import quote # Deferred to keep this module cheap to import
+    return f"/recordings/{quote(record.id, safe='')}/audio"
+
+
+def render_record(record) -> str:
+    """Renders one AudioRecord's player, caption, download link and chapters (uncached)."""
+    filename = record.url.rsplit('/', 1)[-1]
+    return _RECORD_TEMPLATE.format(
+        id=escape(record.id),
+        name=escape(record.name),
+        url=escape(recording_audio_url(record)),
+        mime_type=escape(record.mime_type),
+        filename=escape(filename),
+        duration=f"{record.duration:.3f}",
+        duration_label=format_duration(record.duration) if record.duration else '',
+        preload='none' if record.duration else 'metadata',
+        chapters=_render_chapters(record),
+    )
+
+
+def _render_chapters(record) -> str:
+    chapters = (record.analysis or {}).get('chapters') or []
+    if len(chapters) < 2:
+        return ''
+    url = escape(recording_audio_url(record))
+    items = ''.join(
+        _CHAPTER_TEMPLATE.format(url=url, start=chapter['start'], offset=chapter['offset'],
+                                 label=format_duration(chapter['start']))
+        for chapter in chapters
+    )
+    return f'<ol class="chapters">{items}</ol>'
+
+
+def render_records(records, cache: EmbedCache = None) -> str:
+    """
+    Renders many AudioRecords in one pass, reusing cached fragments for
+    records whose (id, version) was rendered before. Returns the joined HTML.
     """
-    logger.info(f"Generated download link for {audio_url}")
-    return download_link_html
+    cache = embed_cache if cache is None else cache
+    fragments = []
+    rendered = 0
+    for record in records:
+        key = (record.id, record.version)
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = render_record(record)
+            cache.put(key, fragment)
+            rendered += 1
+        fragments.append(fragment)
+    logger.debug(f"Rendered {len(fragments)} recording(s), {rendered} not cached")
+    return '\n'.join(fragments)
@@ -0,0 +1,27 @@
+# audiolms/eventlet_server.py
+# Flask-SocketIO server running on eventlet (the original demo server mode).
+
+# IMPORTANT: eventlet.monkey_patch() must be called as early as possible
+# before other modules that might use standard library functions are imported.
+# Importing this module is what opts a process into eventlet; the asgi mode never imports it.
+import eventlet
+eventlet.monkey_patch()
+
+import logging
+from flask_socketio import SocketIO
+
+from .web import app
+from .live import ice
+from .live.signaling import setup_live_signaling
+
+logger = logging.getLogger(__name__)
+
+ice.install() # Cache ICE host addresses for every peer connection of this server
+socketio = SocketIO(app, cors_allowed_origins="*") # Allow all origins for demo
+# Hook up WebRTC signaling handlers; the admin routes read the manager from app.extensions
+app.extensions['audiolms.signaling'] = setup_live_signaling(socketio)
+
+
+def run(host: str = '127.0.0.1', port: int = 5000, debug: bool = True):
+    logger.info(f"Starting eventlet server on {host}:{port}")
+    socketio.run(app, host=host, port=port, debug=debug, allow_unsafe_werkzeug=True)
@@ -0,0 +1,245 @@
+# audiolms/export.py
+import hashlib
+import logging
+import os
+import struct
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Size of the reads used to stream file contents into an archive
+CHUNK_SIZE = 256 * 1024
+
+# Sizes/offsets at or above this need ZIP64 records
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_ENTRY_LIMIT = 0xFFFF
+# Values written to the classic fields when the real value is in a ZIP64 record
+_MARKER = 0xFFFFFFFF
+_ENTRY_MARKER = 0xFFFF
+
+# General purpose flags: bit 3 = CRC and sizes follow in a data descriptor,
+# bit 11 = file names are UTF-8.
+_FLAGS = 0x0008 | 0x0800
+_VERSION = 20
+_VERSION_ZIP64 = 45
+
+# (path, size, mtime_ns) -> CRC-32, so ranged requests can rebuild the
+# central directory without re-reading files that were streamed before.
+_crc_cache = {}
+_CRC_CACHE_MAX = 4096
+
+
+def _dos_datetime(mtime: float) -> tuple:
+    t = time.localtime(mtime)
+    year = max(t.tm_year, 1980) # DOS dates start in 1980
+    dos_date = (year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    dos_time = t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+    return dos_time, dos_date
+
+
+def _file_crc(key: tuple) -> int:
+    crc = _crc_cache.get(key)
+    if crc is None:
+        crc = 0
+        with open(key[0], 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                crc = zlib.crc32(chunk, crc)
+        _remember_crc(key, crc)
+    return crc
+
+
+def _remember_crc(key: tuple, crc: int):
+    if len(_crc_cache) >= _CRC_CACHE_MAX:
+        _crc_cache.pop(next(iter(_crc_cache)))
+    _crc_cache[key] = crc
+
+
+class _Entry:
+    """One file in the archive and the offsets of its parts."""
+    def __init__(self, arcname: str, path: str):
+        stat = os.stat(path)
+        self.arcname = arcname
+        self.name = arcname.encode('utf-8')
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        self.key = (path, stat.st_size, stat.st_mtime_ns)
+        self.dos_time, self.dos_date = _dos_datetime(stat.st_mtime)
+        self.zip64 = self.size >= ZIP64_LIMIT
+        self.offset = 0 # Offset of the local header, set by the layout
+
+    def local_header(self) -> bytes:
+        if self.zip64:
+            extra = struct.pack('<HHQQ', 0x0001, 16, self.size, self.size)
+            sizes = (_MARKER, _MARKER)
+        else:
+            extra = b''
+            sizes = (self.size, self.size)
+        # The CRC is not known before streaming; readers take it from the data descriptor.
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, _VERSION_ZIP64 if self.zip64 else _VERSION, _FLAGS, 0,
+            self.dos_time, self.dos_date, 0, sizes[0], sizes[1], len(self.name), len(extra),
+        ) + self.name + extra
+
+    def descriptor(self, crc: int) -> bytes:
+        if self.zip64:
+            return struct.pack('<IIQQ', 0x08074b50, crc, self.size, self.size)
+        return struct.pack('<IIII', 0x08074b50, crc, self.size, self.size)
+
+    def descriptor_size(self) -> int:
+        return 24 if self.zip64 else 16
+
+    def central_header(self, crc: int) -> bytes:
+        extra_fields = []
+        size = self.size
+        offset = self.offset
+        if self.zip64:
+            extra_fields += [self.size, self.size]
+            size = _MARKER
+        if self.offset >= ZIP64_LIMIT:
+            extra_fields.append(self.offset)
+            offset = _MARKER
+        extra = struct.pack(f'<HH{len(extra_fields)}Q', 0x0001, 8 * len(extra_fields), *extra_fields) if extra_fields else b''
+        version = _VERSION_ZIP64 if extra_fields else _VERSION
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, version, version, _FLAGS, 0,
+            self.dos_time, self.dos_date, crc, size, size, len(self.name), len(extra), 0, 0, 0, 0, offset,
+        ) + self.name + extra
+
+    def central_header_size(self) -> int:
+        fields = (2 if self.zip64 else 0) + (1 if self.offset >= ZIP64_LIMIT else 0)
+        return 46 + len(self.name) + (4 + 8 * fields if fields else 0)
+
+
+class StoredZipStream:
+    """
+    A ZIP archive of existing files, stored without compression (audio is
+    already compressed) and generated on the fly.
+
+    The archive layout is computed up front from file names and sizes, so its
+    total length is known before any byte is produced and any byte range can
+    be generated independently: iter_bytes(start, stop) seeks straight to the
+    files covering the range and reads them in CHUNK_SIZE pieces. Memory use is
+    constant and nothing is written to disk. The only value that depends on
+    file contents, each file's CRC-32, is computed while streaming (or, for
+    ranges that skip a file, by reading it) and cached.
+    """
+    def __init__(self, files: list):
+        """`files` is a list of (name inside the archive, path on disk)."""
+        self.entries = [_Entry(arcname, path) for arcname, path in files]
+        offset = 0
+        for entry in self.entries:
+            entry.offset = offset
+            offset += len(entry.local_header()) + entry.size + entry.descriptor_size()
+        self.central_directory_offset = offset
+        self.central_directory_size = sum(entry.central_header_size() for entry in self.entries)
+        self.zip64 = (
+            len(self.entries) >= ZIP64_ENTRY_LIMIT
+            or self.central_directory_offset >= ZIP64_LIMIT
+            or self.central_directory_size >= ZIP64_LIMIT
+        )
+        self.size = self.central_directory_offset + self.central_directory_size + len(self._end_records())
+
+    @property
+    def etag(self) -> str:
+        """Identifies this exact archive content (names, sizes and modification times)."""
+        digest = hashlib.sha1()
+        for entry in self.entries:
+            digest.update(entry.name + b'\0' + f'{entry.size}:{entry.key[2]}'.encode())
+        return digest.hexdigest()
+
+    def _end_records(self) -> bytes:
+        count = len(self.entries)
+        records = b''
+        if self.zip64:
+            zip64_end_offset = self.central_directory_offset + self.central_directory_size
+            records += struct.pack(
+                '<IQHHIIQQQQ', 0x06064b50, 44, _VERSION_ZIP64, _VERSION_ZIP64, 0, 0,
+                count, count, self.central_directory_size, self.central_directory_offset,
+            )
+            records += struct.pack('<IIQI', 0x07064b50, 0, zip64_end_offset, 1)
+        # Classic fields hold the marker when the real value is only in the ZIP64 records
+        classic_count = _ENTRY_MARKER if count >= ZIP64_ENTRY_LIMIT else count
+        classic_size = _MARKER if self.central_directory_size >= ZIP64_LIMIT else self.central_directory_size
+        classic_offset = _MARKER if self.central_directory_offset >= ZIP64_LIMIT else self.central_directory_offset
+        records += struct.pack(
+            '<IHHHHIIH', 0x06054b50, 0, 0,
+            classic_count, classic_count, classic_size, classic_offset, 0,
+        )
+        return records
+
+    def _segments(self):
+        """
+        Yields (offset, length, producer) for every part of the archive in order.
+        Producers are called as producer(skip, length) and yield bytes.
+        """
+        crcs = {}
+
+        def static(data):
+            def produce(skip, length):
+                yield data[skip:skip + length]
+            return produce
+
+        def file_data(entry):
+            def produce(skip, length):
+                crc = 0
+                with open(entry.path, 'rb') as f:
+                    f.seek(skip)
+                    remaining = length
+                    while remaining > 0:
+                        chunk = f.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise IOError(f"{entry.path} shrank while being exported.")
+                        if skip == 0:
+                            crc = zlib.crc32(chunk, crc)
+                        remaining -= len(chunk)
+                        yield chunk
+                if skip == 0 and length == entry.size:
+                    crcs[entry.key] = crc
+                    _remember_crc(entry.key, crc)
+            return produce
+
+        def descriptor(entry):
+            def produce(skip, length):
+                crc = crcs.get(entry.key)
+                if crc is None:
+                    crc = _file_crc(entry.key)
+                yield entry.descriptor(crc)[skip:skip + length]
+            return produce
+
+        def central_directory(skip, length):
+            # Built entry by entry, so its memory use does not grow with the file count.
+            position = 0
+            for entry in self.entries:
+                size = entry.central_header_size()
+                if position + size > skip:
+                    crc = crcs.get(entry.key)
+                    if crc is None:
+                        crc = _file_crc(entry.key)
+                    yield entry.central_header(crc)[max(skip - position, 0):skip + length - position]
+                position += size
+                if position >= skip + length:
+                    break
+
+        for entry in self.entries:
+            header = entry.local_header()
+            yield entry.offset, len(header), static(header)
+            data_offset = entry.offset + len(header)
+            yield data_offset, entry.size, file_data(entry)
+            yield data_offset + entry.size, entry.descriptor_size(), descriptor(entry)
+        yield self.central_directory_offset, self.central_directory_size, central_directory
+        end = self._end_records()
+        yield self.central_directory_offset + self.central_directory_size, len(end), static(end)
+
+    def iter_bytes(self, start: int = 0, stop: int = None):
+        """Yields the archive bytes in [start, stop) as they are built."""
+        stop = self.size if stop is None else min(stop, self.size)
+        for offset, length, produce in self._segments():
+            if offset + length <= start or length == 0:
+                continue
+            if offset >= stop:
+                break
+            skip = max(start - offset, 0)
+            take = min(offset + length, stop) - offset - skip
+            yield from produce(skip, take)
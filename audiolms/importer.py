@@ -0,0 +1,279 @@
+# audiolms/importer.py
+import concurrent.futures
+import hashlib
+import logging
+import os
+import threading
+import time
+import wave
+
+from .catalog import AudioCatalog
+from .config import settings
+from .models import AudioRecord
+from .storage import AudioStorage
+
+logger = logging.getLogger(__name__)
+
+# Read size used while hashing; large reads keep per-call overhead low and let
+# hashlib release the GIL for long stretches, so hashing threads run in parallel.
+HASH_CHUNK_SIZE = 1024 * 1024
+# Seconds between progress log lines
+PROGRESS_INTERVAL = 5.0
+
+
+def iter_audio_files(root: str, extensions: tuple = None):
+    """
+    Yields the paths of audio files under `root`. Uses os.scandir, which gets
+    file types from the directory listing instead of one stat() per file.
+    Symlinked directories are not followed.
+    """
+    extensions = tuple(extension.lower() for extension in (extensions or settings.IMPORT_EXTENSIONS))
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith(extensions) and entry.is_file():
+                        yield entry.path
+        except OSError as e:
+            logger.warning(f"Skipping unreadable directory {directory}: {e}")
+
+
+def hash_file(path: str) -> tuple:
+    """Returns (SHA-256 hex digest, size in bytes), reading the file in chunks into one reused buffer."""
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray(HASH_CHUNK_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+            size += n
+    return digest.hexdigest(), size
+
+
+def record_id(sha256: str, course_id: str = None) -> str:
+    """
+    ID of the catalog record for some content in a course. The same file can
+    belong to several courses, each with its own record (sharing one stored copy).
+    """
+    return f"{course_id}:{sha256}" if course_id else sha256
+
+
+def record_for_file(path: str, course_id: str = None) -> AudioRecord:
+    """Builds the catalog record of a stored file (hashing and probing it), named after the file."""
+    sha256, size = hash_file(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return AudioRecord(record_id(sha256, course_id), stem, path, probe_duration(path), size, sha256, course_id)
+
+
+def probe_duration(path: str) -> float:
+    """
+    Returns the duration of an audio file in seconds, or 0.0 if it cannot be
+    determined. WAV headers are read with the standard library; other formats
+    need PyAV, which only reads the container header.
+    """
+    try:
+        if path.lower().endswith('.wav'):
+            with wave.open(path, 'rb') as w:
+                return w.getnframes() / float(w.getframerate())
+        import av
+        with av.open(path) as container:
+            if container.duration is not None:
+                return container.duration / av.time_base
+    except ImportError:
+        logger.debug(f"PyAV not available, duration of {path} unknown.")
+    except Exception as e:
+        logger.warning(f"Could not probe {path}: {e}")
+    return 0.0
+
+
+class ImportCheckpoint:
+    """
+    Append-only list of source files whose records are committed to the
+    catalog, one path per line. A resumed import skips these files. A line
+    cut short by a crash is ignored, so that file is simply imported again.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.done = {line[:-1] for line in f if line.endswith('\n')}
+        self._file = None
+
+    def record(self, paths: list):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(''.join(f"{path}\n" for path in paths))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class ImportStats:
+    """Counters and throughput of one import run."""
+    def __init__(self):
+        self.started = time.monotonic()
+        self.imported = 0
+        self.bytes = 0
+        self.duplicates = 0
+        self.skipped = 0 # already in the checkpoint
+        self.failed = 0
+
+    def rates(self) -> tuple:
+        """Returns (files per second, MB per second) since the start of the run."""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return (self.imported + self.duplicates) / elapsed, self.bytes / elapsed / 1e6
+
+    def summary(self) -> str:
+        files_per_second, mb_per_second = self.rates()
+        return (f"{self.imported} imported, {self.duplicates} duplicate(s), {self.skipped} already done, "
+                f"{self.failed} failed; {self.bytes / 1e6:.1f} MB at {files_per_second:.1f} files/s, {mb_per_second:.1f} MB/s")
+
+
+class BulkImporter:
+    """
+    Imports an existing archive of recordings: walks a directory tree, then
+    hashes, probes and copies each file on a pool of worker threads, and
+    inserts the resulting AudioRecords into the catalog in batches.
+
+    The number of files in flight is bounded (a few per worker), so memory
+    use does not depend on the size of the archive. Files are copied with
+    AudioStorage.copy_audio_local and never read into memory whole. Content
+    already stored (same SHA-256) is not copied again: a recording found in a
+    second course gets its own record pointing at the existing copy, and only
+    content already in the same course is skipped as a duplicate.
+
+    After each batch is committed, its source paths are appended to the
+    checkpoint file; a rerun with the same checkpoint skips them, so an
+    interrupted migration resumes where it stopped.
+    """
+    def __init__(self, storage: AudioStorage = None, catalog: AudioCatalog = None, checkpoint_path: str = None,
+                 workers: int = None, batch_size: int = None, course_id: str = None):
+        self.storage = storage or AudioStorage(settings.UPLOAD_FOLDER)
+        self.catalog = catalog or AudioCatalog()
+        self.checkpoint = ImportCheckpoint(checkpoint_path or os.path.join(self.storage.local_base_path, '.import.checkpoint'))
+        self.workers = workers or settings.IMPORT_WORKERS
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+        self.course_id = course_id
+        self.stats = ImportStats()
+        # (course_id, sha256) pairs already in the catalog (or being imported by a worker)
+        self._known = set()
+        # sha256 -> Future of the stored file's path, set once its copy is done
+        self._stored = {}
+        self._known_lock = threading.Lock()
+        self._batch_records = []
+        self._batch_paths = []
+        self._last_progress = time.monotonic()
+
+    def run(self, root: str) -> ImportStats:
+        root = os.path.abspath(root)
+        for sha256, course_id, url in self.catalog.stored_content():
+            self._known.add((course_id, sha256))
+            if sha256 not in self._stored:
+                self._stored[sha256] = concurrent.futures.Future()
+                self._stored[sha256].set_result(url)
+        max_in_flight = 4 * self.workers
+        logger.info(f"Importing {root} with {self.workers} worker(s); "
+                    f"{len(self.checkpoint.done)} file(s) already done per {self.checkpoint.path}")
+        try:
+            with concurrent.futures.ThreadPoolExecutor(self.workers, thread_name_prefix='audiolms-import') as pool:
+                pending = {}
+                for path in iter_audio_files(root):
+                    if path in self.checkpoint.done:
+                        self.stats.skipped += 1
+                        continue
+                    pending[pool.submit(self._import_file, path, root)] = path
+                    if len(pending) >= max_in_flight:
+                        done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                        self._collect(done, pending)
+                if pending:
+                    self._collect(concurrent.futures.wait(pending).done, pending)
+            self._flush()
+        finally:
+            self.checkpoint.close()
+        logger.info(f"Import finished: {self.stats.summary()}")
+        return self.stats
+
+    def _course_for(self, path: str, root: str) -> str | None:
+        if self.course_id:
+            return self.course_id
+        # Files in a top-level directory of the archive belong to the course named after it.
+        parts = os.path.relpath(path, root).split(os.sep)
+        return parts[0] if len(parts) > 1 else None
+
+    def _import_file(self, path: str, root: str) -> AudioRecord | None:
+        """Runs on a worker thread. Returns the new record, or None if the content is already in its course."""
+        sha256, size = hash_file(path)
+        stem, extension = os.path.splitext(os.path.basename(path))
+        course_id = self._course_for(path, root)
+        with self._known_lock:
+            if (course_id, sha256) in self._known:
+                return None
+            self._known.add((course_id, sha256))
+            stored = self._stored.get(sha256)
+            copying = stored is None
+            if copying:
+                stored = self._stored[sha256] = concurrent.futures.Future()
+        try:
+            if copying:
+                try:
+                    # The digest suffix keeps same-named files apart and makes reruns overwrite, not duplicate.
+                    stored.set_result(self.storage.copy_audio_local(path, f"{stem}-{sha256[:8]}{extension.lower()}", course_id))
+                except Exception as e:
+                    with self._known_lock:
+                        del self._stored[sha256]
+                    stored.set_exception(e)
+                    raise
+            # Another worker may still be copying the same content for another course
+            stored_path = stored.result()
+            return AudioRecord(record_id(sha256, course_id), stem, stored_path, probe_duration(path), size, sha256, course_id)
+        except Exception:
+            with self._known_lock:
+                self._known.discard((course_id, sha256))
+            raise
+
+    def _collect(self, done: set, pending: dict):
+        for future in done:
+            path = pending.pop(future)
+            try:
+                record = future.result()
+            except Exception as e:
+                self.stats.failed += 1
+                logger.error(f"Failed to import {path}: {e}")
+                continue # Not checkpointed, so a rerun retries it
+            if record is None:
+                self.stats.duplicates += 1
+            else:
+                self.stats.imported += 1
+                self.stats.bytes += record.size
+                self._batch_records.append(record)
+            self._batch_paths.append(path)
+            if len(self._batch_paths) >= self.batch_size:
+                self._flush()
+        now = time.monotonic()
+        if now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            files_per_second, mb_per_second = self.stats.rates()
+            logger.info(f"{self.stats.imported + self.stats.duplicates} file(s), {self.stats.bytes / 1e6:.1f} MB "
+                        f"({files_per_second:.1f} files/s, {mb_per_second:.1f} MB/s), {self.stats.failed} failed")
+
+    def _flush(self):
+        """Commits the current batch to the catalog, then records it in the checkpoint."""
+        if self._batch_records:
+            self.catalog.insert_many(self._batch_records)
+        if self._batch_paths:
+            self.checkpoint.record(self._batch_paths)
+        self._batch_records = []
+        self._batch_paths = []
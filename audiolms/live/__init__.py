@@ -1,7 +1,30 @@
 # audiolms/live/__init__.py
 # This file marks the 'live' directory as a Python package.
 # It also serves as a convenient place to import core components for easier access.
+#
+# The components are resolved lazily: importing `audiolms.live` does not load
+# aiortc/av until one of the names below is actually used.
+import importlib
 
-from .signaling import setup_live_signaling
-from .webrtc_manager import WebRTCManager
-from .audio_track import MicrophoneAudioTrack
+# public name -> submodule defining it
+_LAZY_ATTRIBUTES = {
+    'setup_live_signaling': 'signaling',
+    'WebRTCManager': 'webrtc_manager',
+    'MicrophoneAudioTrack': 'audio_track',
+    'PeerConnectionPool': 'pc_pool',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_ATTRIBUTES))
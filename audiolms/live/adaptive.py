@@ -0,0 +1,161 @@
+# audiolms/live/adaptive.py
+import asyncio
+import logging
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Weight of the newest sample in the exponentially weighted moving averages
+EWMA_ALPHA = 0.5
+# RTP clock rate of Opus, used to convert RTCP jitter to seconds
+OPUS_CLOCK_RATE = 48000
+
+
+class ListenerQuality:
+    """Smoothed network conditions of one listener and its tier hysteresis state."""
+    def __init__(self, tier: str):
+        self.tier = tier
+        self.loss = None # fraction of packets lost, 0..1
+        self.rtt = None # seconds
+        self.jitter = None # seconds
+        self.worse_samples = 0
+        self.better_samples = 0
+
+    def update(self, loss: float, rtt: float | None, jitter: float | None):
+        def ewma(previous, sample):
+            if sample is None:
+                return previous
+            return sample if previous is None else EWMA_ALPHA * sample + (1 - EWMA_ALPHA) * previous
+
+        self.loss = ewma(self.loss, loss)
+        self.rtt = ewma(self.rtt, rtt)
+        self.jitter = ewma(self.jitter, jitter)
+
+    def to_dict(self) -> dict:
+        return {'tier': self.tier, 'loss': self.loss, 'rtt': self.rtt, 'jitter': self.jitter}
+
+
+def read_remote_inbound(report) -> tuple | None:
+    """
+    Extracts (loss, rtt, jitter) from the 'remote-inbound-rtp' entry of an
+    RTCRtpSender stats report, i.e. what the listener's RTCP receiver reports
+    say about our stream. Returns None if no receiver report arrived yet.
+    """
+    for stats in report.values():
+        if getattr(stats, 'type', None) != 'remote-inbound-rtp':
+            continue
+        # aiortc reports the raw 8-bit RTCP fixed point value (0-255), so 1 means ~0.4%
+        loss = stats.fractionLost / 256.0
+        jitter = stats.jitter / OPUS_CLOCK_RATE if stats.jitter is not None else None
+        return loss, stats.roundTripTime, jitter
+    return None
+
+
+class AdaptiveBitrateController:
+    """
+    Moves listeners between quality tiers based on their RTCP receiver reports.
+
+    Every `interval` seconds each listener's sender stats are read; a listener
+    is moved down one tier after `downgrade_samples` consecutive polls in which
+    its conditions call for a more robust tier, and back up one tier after
+    `upgrade_samples` consecutive polls of better conditions. Moving only
+    re-points the listener's egress track at another tier's shared encoder
+    (EgressTrack.replace_source), so no renegotiation is needed and healthy
+    listeners are never affected by weak ones.
+    """
+    def __init__(self, manager, tiers: list = None, interval: float = None,
+                 downgrade_samples: int = None, upgrade_samples: int = None):
+        self.manager = manager
+        self.tiers = tiers or settings.ABR_TIERS
+        self.tier_names = [tier['name'] for tier in self.tiers]
+        self.interval = settings.ABR_INTERVAL if interval is None else interval
+        self.downgrade_samples = downgrade_samples or settings.ABR_DOWNGRADE_SAMPLES
+        self.upgrade_samples = upgrade_samples or settings.ABR_UPGRADE_SAMPLES
+        # (session_id, sid) -> ListenerQuality
+        self._listeners = {}
+        self._task = None
+
+    def start(self):
+        """Starts the polling task on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def forget(self, session_id: str, sid: str):
+        self._listeners.pop((session_id, sid), None)
+
+    def target_tier(self, quality: ListenerQuality) -> str:
+        """Returns the best tier whose limits the listener's conditions satisfy."""
+        for tier in self.tiers:
+            if quality.loss is not None and quality.loss > tier['max_loss']:
+                continue
+            if tier['max_rtt'] is not None and quality.rtt is not None and quality.rtt > tier['max_rtt']:
+                continue
+            return tier['name']
+        return self.tier_names[-1]
+
+    def decide(self, quality: ListenerQuality) -> str:
+        """
+        Applies hysteresis to the target tier and returns the tier the listener
+        should be in now (at most one step away from its current tier).
+        """
+        current = self.tier_names.index(quality.tier)
+        target = self.tier_names.index(self.target_tier(quality))
+        if target > current:
+            quality.worse_samples += 1
+            quality.better_samples = 0
+            if quality.worse_samples >= self.downgrade_samples:
+                quality.worse_samples = 0
+                return self.tier_names[current + 1]
+        elif target < current:
+            quality.better_samples += 1
+            quality.worse_samples = 0
+            if quality.better_samples >= self.upgrade_samples:
+                quality.better_samples = 0
+                return self.tier_names[current - 1]
+        else:
+            quality.worse_samples = quality.better_samples = 0
+        return quality.tier
+
+    async def poll(self):
+        """Reads every listener's sender stats once and re-tiers listeners as needed."""
+        for session_id, sid, listener in self.manager.iter_listeners():
+            key = (session_id, sid)
+            quality = self._listeners.get(key)
+            if quality is None:
+                quality = self._listeners[key] = ListenerQuality(listener['tier'])
+            try:
+                report = await listener['sender'].getStats()
+            except Exception as e:
+                logger.debug(f"Could not read stats for listener {sid}: {e}")
+                continue
+            sample = read_remote_inbound(report)
+            if sample is None:
+                continue
+            quality.update(*sample)
+            tier = self.decide(quality)
+            if tier != quality.tier:
+                logger.info(f"Listener {sid} in session {session_id}: {quality.tier} -> {tier} "
+                            f"(loss={quality.loss:.3f}, rtt={quality.rtt})")
+                await self.manager.set_listener_tier(session_id, sid, tier)
+                quality.tier = tier
+
+    def report(self) -> dict:
+        """Returns the current quality estimate of every listener, keyed by session then SID."""
+        report = {}
+        for (session_id, sid), quality in self._listeners.items():
+            report.setdefault(session_id, {})[sid] = quality.to_dict()
+        return report
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Adaptive bitrate poll failed: {e}")
@@ -1,9 +1,17 @@
 # audiolms/live/audio_track.py
 import asyncio
+import collections
+import fractions
 import logging
+import time
+import av
+import numpy as np
 from aiortc.contrib.media import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
 from av import AudioFrame # For creating audio frames if needed
 
+from ..config import settings
+
 logger = logging.getLogger(__name__)
 
 class MicrophoneAudioTrack(MediaStreamTrack):
@@ -55,3 +63,364 @@ class MicrophoneAudioTrack(MediaStreamTrack):
         # frame.pts = self.pts # Increment this based on previous frames
         # frame.time_base = "1/48000" # Example time base for 48kHz
         # return frame
+
+
+# Opus always runs at 48 kHz; RTP timestamps for Opus use the same clock.
+OPUS_SAMPLE_RATE = 48000
+OPUS_TIME_BASE = fractions.Fraction(1, OPUS_SAMPLE_RATE)
+
+# Packets whose speech/silence classification an OpusEncodedTrack remembers
+_ACTIVITY_HISTORY = 256
+
+
+def is_speech_frame(frame: AudioFrame) -> bool:
+    """True if a packed s16 frame is louder than settings.EGRESS_SPEECH_DB (dBFS RMS)."""
+    count = frame.samples * len(frame.layout.channels)
+    if not count:
+        return False
+    # Runs for every encoded packet: read the plane in place and compare energies (no square root)
+    samples = np.frombuffer(frame.planes[0], dtype=np.int16, count=count).astype(np.float32)
+    threshold = 32768.0 * 10 ** (settings.EGRESS_SPEECH_DB / 20)
+    return float(np.dot(samples, samples)) > threshold * threshold * count
+
+
+class OpusEncodedTrack(MediaStreamTrack):
+    """
+    Encodes the frames of a source audio track once with libopus and yields the
+    encoded av.Packet objects. aiortc senders packetize packets without
+    re-encoding them, so every listener subscribed to this track (through a
+    MediaRelay) shares this one encoder and its settings: bitrate, packet
+    time (ptime, in ms) and in-band FEC tuned for an expected packet loss.
+    CPU time spent resampling and encoding is charged to `meter`, if given
+    (see resources.UsageMeter).
+    """
+    kind = "audio"
+
+    def __init__(self, source: MediaStreamTrack, bitrate: int = 32000, ptime: int = 20,
+                 fec: bool = False, packet_loss: int = 0, meter=None):
+        super().__init__()
+        self.source = source
+        self.meter = meter
+        self.bitrate = bitrate
+        self.ptime = ptime
+        self.fec = fec
+        self.packet_loss = packet_loss
+        self.frame_size = OPUS_SAMPLE_RATE * ptime // 1000
+        self._codec = self._open_codec()
+        self._resampler = av.AudioResampler(format='s16', layout='stereo', rate=OPUS_SAMPLE_RATE)
+        self._fifo = av.AudioFifo()
+        self._packets = collections.deque()
+        self._pts = 0
+        # id(packet) -> whether it carries speech, for the egress scheduler
+        self._activity = collections.OrderedDict()
+
+    def _open_codec(self):
+        codec = av.CodecContext.create('libopus', 'w')
+        codec.bit_rate = self.bitrate
+        codec.sample_rate = OPUS_SAMPLE_RATE
+        codec.layout = 'stereo'
+        codec.format = 's16'
+        codec.time_base = OPUS_TIME_BASE
+        codec.options = {
+            'application': 'voip',
+            'frame_duration': str(self.ptime),
+            'fec': '1' if self.fec else '0',
+            'packet_loss': str(self.packet_loss),
+        }
+        return codec
+
+    async def recv(self):
+        while not self._packets:
+            frame = await self.source.recv()
+            started = time.thread_time()
+            for resampled in self._resampler.resample(frame):
+                resampled.pts = None # Timestamps are re-assigned below, in encoder frame units
+                self._fifo.write(resampled)
+            # Feed the encoder exactly one packet time worth of samples at a time
+            while self._fifo.samples >= self.frame_size:
+                chunk = self._fifo.read(self.frame_size)
+                chunk.pts = self._pts
+                chunk.sample_rate = OPUS_SAMPLE_RATE
+                chunk.time_base = OPUS_TIME_BASE
+                self._pts += self.frame_size
+                speech = is_speech_frame(chunk)
+                for packet in self._codec.encode(chunk):
+                    packet.time_base = OPUS_TIME_BASE
+                    self._packets.append(packet)
+                    self._activity[id(packet)] = speech
+                    self._activity.move_to_end(id(packet))
+            while len(self._activity) > _ACTIVITY_HISTORY:
+                self._activity.popitem(last=False)
+            if self.meter is not None:
+                self.meter.charge(time.thread_time() - started)
+        return self._packets.popleft()
+
+    @property
+    def queued_frames(self) -> int:
+        """Encoded packets waiting to be read."""
+        return len(self._packets)
+
+    @property
+    def buffered_bytes(self) -> int:
+        """Bytes held between reads: resampled samples not yet encoded plus queued packets."""
+        return self._fifo.samples * 4 + sum(packet.size for packet in self._packets) # s16 stereo
+
+    def is_speech(self, packet) -> bool:
+        """
+        Whether a packet recently produced by this encoder carries speech
+        (rather than silence or comfort noise). Unknown packets count as speech.
+        """
+        return self._activity.get(id(packet), True)
+
+    def stop(self):
+        super().stop()
+        self.source.stop()
+
+
+class SwitchableAudioTrack(MediaStreamTrack):
+    """
+    An audio track whose source can be replaced while it is being consumed.
+
+    Used as the input of a fan-out: when the teacher reconnects, their new
+    track is swapped in underneath and every downstream encoder and listener
+    keeps running untouched. While no source is attached (or the source has
+    ended), real-time paced silence is produced so senders stay alive.
+    """
+    kind = "audio"
+
+    def __init__(self, source: MediaStreamTrack = None, silence_ptime: int = 20):
+        super().__init__()
+        self._source = source
+        self._silence_samples = OPUS_SAMPLE_RATE * silence_ptime // 1000
+        self._silence_pts = 0
+        self._silence_start = None
+
+    @property
+    def source(self) -> MediaStreamTrack | None:
+        return self._source
+
+    def replace_source(self, source: MediaStreamTrack | None):
+        """Attaches a new source (or None for silence) without interrupting consumers."""
+        self._source = source
+        self._silence_start = None
+
+    async def _silence(self) -> AudioFrame:
+        loop = asyncio.get_running_loop()
+        if self._silence_start is None:
+            self._silence_start = loop.time() - self._silence_pts / OPUS_SAMPLE_RATE
+        # Pace silence in real time, like a live source would
+        delay = self._silence_start + self._silence_pts / OPUS_SAMPLE_RATE - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        frame = AudioFrame(format='s16', layout='mono', samples=self._silence_samples)
+        for plane in frame.planes:
+            plane.update(bytes(plane.buffer_size))
+        frame.sample_rate = OPUS_SAMPLE_RATE
+        frame.time_base = OPUS_TIME_BASE
+        frame.pts = self._silence_pts
+        self._silence_pts += self._silence_samples
+        return frame
+
+    async def recv(self):
+        source = self._source
+        if source is not None:
+            try:
+                return await source.recv()
+            except MediaStreamError:
+                # The source ended (e.g. the teacher's PeerConnection closed); fall back to silence.
+                if self._source is source:
+                    self._source = None
+        return await self._silence()
+
+
+class AudioMixerTrack(MediaStreamTrack):
+    """
+    Mixes several live audio tracks into one 48 kHz mono track.
+
+    Each input is read by its own task into a short sample buffer (at most
+    `max_buffer_ms`, older samples are dropped), and the mixer emits one
+    `ptime` frame per tick in real time, summing whatever each input has
+    buffered (missing samples count as silence). A stalled or ended input
+    therefore never stalls the mix. CPU time spent resampling and mixing is
+    charged to `meter`, if given.
+    """
+    kind = "audio"
+
+    def __init__(self, inputs: list, ptime: int = 20, max_buffer_ms: int = 200, meter=None):
+        super().__init__()
+        self._inputs = list(inputs)
+        self.meter = meter
+        self.frame_size = OPUS_SAMPLE_RATE * ptime // 1000
+        self._max_buffered = OPUS_SAMPLE_RATE * max_buffer_ms // 1000
+        # One deque of int16 sample arrays per input, plus its buffered sample count
+        self._buffers = [collections.deque() for _ in self._inputs]
+        self._buffered = [0] * len(self._inputs)
+        self._readers = []
+        self._start = None
+        self._pts = 0
+
+    async def _read(self, index: int, track: MediaStreamTrack):
+        resampler = av.AudioResampler(format='s16', layout='mono', rate=OPUS_SAMPLE_RATE)
+        buffer = self._buffers[index]
+        try:
+            while True:
+                frame = await track.recv()
+                started = time.thread_time()
+                for resampled in resampler.resample(frame):
+                    samples = resampled.to_ndarray().reshape(-1)
+                    buffer.append(samples)
+                    self._buffered[index] += len(samples)
+                # Drop the oldest audio if this input runs ahead of the mix
+                while self._buffered[index] > self._max_buffered:
+                    self._buffered[index] -= len(buffer.popleft())
+                if self.meter is not None:
+                    self.meter.charge(time.thread_time() - started)
+        except MediaStreamError:
+            logger.debug(f"Mixer input {index} ended.")
+
+    def _take(self, index: int):
+        """Removes up to frame_size samples from an input's buffer, zero-padded."""
+        out = np.zeros(self.frame_size, dtype=np.int32)
+        buffer = self._buffers[index]
+        filled = 0
+        while buffer and filled < self.frame_size:
+            chunk = buffer.popleft()
+            count = min(len(chunk), self.frame_size - filled)
+            out[filled:filled + count] = chunk[:count]
+            if count < len(chunk):
+                buffer.appendleft(chunk[count:])
+            filled += count
+        self._buffered[index] -= filled
+        return out
+
+    async def recv(self):
+        loop = asyncio.get_running_loop()
+        if self._start is None:
+            self._start = loop.time()
+            self._readers = [loop.create_task(self._read(i, track)) for i, track in enumerate(self._inputs)]
+        delay = self._start + self._pts / OPUS_SAMPLE_RATE - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        started = time.thread_time()
+        mixed = np.zeros(self.frame_size, dtype=np.int32)
+        for index in range(len(self._inputs)):
+            mixed += self._take(index)
+        np.clip(mixed, -32768, 32767, out=mixed)
+
+        frame = AudioFrame.from_ndarray(mixed.astype(np.int16).reshape(1, -1), format='s16', layout='mono')
+        frame.sample_rate = OPUS_SAMPLE_RATE
+        frame.time_base = OPUS_TIME_BASE
+        frame.pts = self._pts
+        self._pts += self.frame_size
+        if self.meter is not None:
+            self.meter.charge(time.thread_time() - started)
+        return frame
+
+    @property
+    def queued_frames(self) -> int:
+        """Sample chunks buffered across all inputs."""
+        return sum(len(buffer) for buffer in self._buffers)
+
+    @property
+    def buffered_bytes(self) -> int:
+        return sum(self._buffered) * 2 # s16 mono
+
+    def stop(self):
+        super().stop()
+        for reader in self._readers:
+            reader.cancel()
+        for track in self._inputs:
+            track.stop()
+
+
+class EgressTrack(MediaStreamTrack):
+    """
+    A listener's view of an encoded fan-out track, passed through the node's
+    EgressScheduler (see egress.py): each packet is sent, delayed or dropped
+    according to the node and session budgets. `classify(packet)` tells
+    speech from silence (OpusEncodedTrack.is_speech); without it every
+    packet is treated as speech. CPU time spent deciding is charged to
+    `meter`, if given.
+
+    The source can be replaced (tier switches, room moves) while the track is
+    being sent. Every encoder numbers its packets from its own start, so
+    after a switch pts are rebased onto this listener's timeline: the RTP
+    timestamps the browser sees keep advancing with real time instead of
+    jumping to another encoder's clock.
+
+    Stopping this track does not stop its source, which belongs to the
+    FanoutNode (FanoutNode.unsubscribe).
+    """
+    kind = "audio"
+
+    def __init__(self, source: MediaStreamTrack, scheduler, session_id: str, classify=None, meter=None):
+        super().__init__()
+        self.source = source
+        self._scheduler = scheduler
+        self._session_id = session_id
+        self._classify = classify
+        self.meter = meter
+        # Added to the source's pts to place its packets on this listener's timeline
+        self._pts_offset = 0
+        self._rebase = False
+        # pts and end (pts + duration) of the last packet sent, on this listener's timeline, and when it was sent
+        self._last_pts = None
+        self._last_end = None
+        self._last_sent = None
+
+    def replace_source(self, source: MediaStreamTrack, classify=None):
+        """
+        Reads from another encoded track from the next packet on. A recv()
+        blocked on the old source is released when that source ends
+        (FanoutNode.unsubscribe), and carries on with the new one.
+        """
+        self.source = source
+        self._classify = classify
+        self._rebase = True
+
+    async def recv(self):
+        while True:
+            source = self.source
+            try:
+                packet = await source.recv()
+            except MediaStreamError:
+                if self.source is not source:
+                    continue # Replaced while waiting; read from the new source
+                raise
+            if self.source is not source:
+                continue # Replaced while waiting; this packet is on the old timeline
+            started = time.thread_time()
+            speech = self._classify(packet) if self._classify else True
+            duration = float(packet.duration * packet.time_base) if packet.duration and packet.time_base else 0.0
+            wait = self._scheduler.reserve(self._session_id, packet.size, speech, duration)
+            if wait is not None and packet.pts is not None and packet.time_base:
+                packet = self._retime(packet)
+            if self.meter is not None:
+                self.meter.charge(time.thread_time() - started)
+            if wait is None:
+                continue # Dropped
+            if wait > 0:
+                await asyncio.sleep(wait)
+            return packet
+
+    def _retime(self, packet: av.Packet) -> av.Packet:
+        """Places a packet on this listener's timeline; shared packets are copied before being changed."""
+        now = time.monotonic()
+        if self._rebase:
+            self._rebase = False
+            if self._last_pts is not None:
+                # Continue where the last source stopped, or later if more time passed since
+                elapsed = int((now - self._last_sent) / packet.time_base)
+                self._pts_offset = max(self._last_end, self._last_pts + elapsed) - packet.pts
+        if self._pts_offset:
+            retimed = av.Packet(bytes(packet))
+            retimed.pts = packet.pts + self._pts_offset
+            retimed.dts = retimed.pts
+            retimed.time_base = packet.time_base
+            retimed.duration = packet.duration
+            packet = retimed
+        self._last_pts = packet.pts
+        self._last_end = packet.pts + (packet.duration or 0)
+        self._last_sent = now
+        return packet
@@ -0,0 +1,305 @@
+# audiolms/live/egress.py
+import asyncio
+import logging
+import threading
+import time
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Fraction of a bucket's burst that silence packets may not use, kept for speech
+_SILENCE_RESERVE = 0.25
+
+
+class TokenBucket:
+    """
+    Byte-rate token bucket. Tokens may go negative: a packet admitted before
+    enough tokens accumulated is a reservation, and the debt delays the
+    packets after it. Not thread-safe; EgressScheduler locks around it.
+    """
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self._updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, size: float, reserve: float = 0.0) -> float:
+        """Seconds until `size` bytes can be sent while keeping `reserve` tokens."""
+        missing = size + reserve - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.rate if self.rate > 0 else float('inf')
+
+    def set_rate(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = min(self.tokens, burst)
+
+
+def water_fill(capacity: float, demands: dict) -> dict:
+    """
+    Weighted max-min fair allocation: `demands` maps key -> (weight, demand).
+    Keys demanding less than their weighted share get their demand; the
+    capacity they leave is shared among the rest by weight.
+    """
+    allocation = {}
+    pending = sorted(demands.items(), key=lambda item: item[1][1] / item[1][0])
+    weight_left = sum(weight for weight, _ in demands.values())
+    for key, (weight, demand) in pending:
+        fair = capacity * weight / weight_left if weight_left > 0 else 0.0
+        allocation[key] = min(demand, fair)
+        capacity -= allocation[key]
+        weight_left -= weight
+    return allocation
+
+
+class _SessionShare:
+    """Per-session scheduler state."""
+    def __init__(self, weight: float, rate: float, burst: float, now: float):
+        self.weight = weight
+        self.bucket = TokenBucket(rate, burst, now)
+        self.listeners = set()
+        # Wire bytes offered (speech, silence), the seconds of media they carry
+        # and bytes sent, since the last rebalance
+        self.offered = [0, 0]
+        self.media = 0.0
+        self.sent = 0
+        # Smoothed rates in bytes/s, updated on rebalance
+        self.demand = [0.0, 0.0]
+        self.sent_rate = 0.0
+        self.dropped = 0
+        self.delayed = 0
+
+
+class EgressScheduler:
+    """
+    Node-wide scheduler for outbound live media.
+
+    Every packet a listener's sender is about to send goes through reserve()
+    (see audio_track.EgressTrack), which charges its wire size to a node
+    token bucket (EGRESS_NODE_RATE) and to its session's bucket. A packet
+    that fits both is sent at once. Otherwise a speech packet waits for its
+    tokens, up to EGRESS_MAX_DELAY, and is dropped past that. A silence or
+    comfort-noise packet is dropped unless it fits without waiting and
+    leaves a reserve for speech. Opus receivers conceal dropped packets.
+
+    Session bucket rates are reassigned every EGRESS_REBALANCE_INTERVAL
+    seconds by weighted max-min fairness over the measured demand of each
+    session: first speech demand, then silence demand from what is left.
+    Capacity nobody uses is split by weight, so sessions can grow into it.
+    This gives the per-session shares of weighted fair queuing, without a
+    single queue owner, because sessions run on several media loops. All
+    state is guarded by one lock, and waiting happens on the caller's loop.
+
+    With no node rate configured, nothing is delayed or dropped; traffic is
+    only measured for report().
+    """
+    def __init__(self, node_rate: float = None, session_rate: float = None, burst: float = None,
+                 max_delay: float = None, interval: float = None, clock=time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._sessions = {}
+        now = clock()
+        self._last_rebalance = now
+        self._sent = 0
+        self.sent_rate = 0.0
+        self.node = TokenBucket(0.0, 0.0, now)
+        self.configure(node_rate, session_rate, burst, max_delay, interval)
+
+    def configure(self, node_rate: float = None, session_rate: float = None, burst: float = None,
+                  max_delay: float = None, interval: float = None):
+        """(Re)applies limits; rates are in bits/s, 0 meaning unlimited."""
+        with self._lock:
+            node_rate = settings.EGRESS_NODE_RATE if node_rate is None else node_rate
+            session_rate = settings.EGRESS_SESSION_RATE if session_rate is None else session_rate
+            self.node_rate = node_rate / 8 if node_rate else None # bytes/s
+            self.session_rate = session_rate / 8 if session_rate else None
+            self.burst = burst or settings.EGRESS_BURST
+            self.max_delay = settings.EGRESS_MAX_DELAY if max_delay is None else max_delay
+            self.interval = interval or settings.EGRESS_REBALANCE_INTERVAL
+            if self.node_rate:
+                self.node.set_rate(self.node_rate, self._burst_bytes(self.node_rate))
+            self._rebalance(self._clock())
+
+    def _burst_bytes(self, rate: float) -> float:
+        # At least one full-size packet, or nothing could ever be sent
+        return max(rate * self.burst, 1500.0)
+
+    def _share(self, session_id: str, now: float) -> _SessionShare:
+        share = self._sessions.get(session_id)
+        if share is None:
+            share = self._sessions[session_id] = _SessionShare(1.0, 0.0, 0.0, now)
+            self._rebalance(now) # Gives the new session its share of spare capacity
+            share.bucket.tokens = share.bucket.burst
+        return share
+
+    def set_weight(self, session_id: str, weight: float):
+        """Sets a session's weight (default 1) in the fair sharing of the node."""
+        with self._lock:
+            self._share(session_id, self._clock()).weight = max(float(weight), 1e-3)
+            self._rebalance(self._clock())
+
+    def add_listener(self, session_id: str, sid: str):
+        with self._lock:
+            self._share(session_id, self._clock()).listeners.add(sid)
+
+    def remove_listener(self, session_id: str, sid: str):
+        with self._lock:
+            share = self._sessions.get(session_id)
+            if share:
+                share.listeners.discard(sid)
+
+    def forget_session(self, session_id: str):
+        with self._lock:
+            if self._sessions.pop(session_id, None) is not None:
+                self._rebalance(self._clock())
+
+    def reserve(self, session_id: str, size: int, speech: bool = True, duration: float = 0.0) -> float | None:
+        """
+        Charges a `size`-byte media payload carrying `duration` seconds of
+        audio to the budgets. Returns the seconds to wait before sending it
+        (0 to send at once), or None if it should be dropped.
+        """
+        wire = size + settings.EGRESS_PACKET_OVERHEAD
+        with self._lock:
+            now = self._clock()
+            if now - self._last_rebalance >= self.interval:
+                self._rebalance(now)
+            share = self._share(session_id, now)
+            share.offered[0 if speech else 1] += wire
+            share.media += duration
+            if self.node_rate is None and self.session_rate is None:
+                share.sent += wire
+                self._sent += wire
+                return 0.0
+            share.bucket.refill(now)
+            self.node.refill(now)
+            reserve = 0.0 if speech else _SILENCE_RESERVE
+            wait = share.bucket.wait_time(wire, reserve * share.bucket.burst)
+            if self.node_rate is not None:
+                wait = max(wait, self.node.wait_time(wire, reserve * self.node.burst))
+            if wait > 0 and (not speech or wait > self.max_delay):
+                share.dropped += 1
+                return None
+            share.bucket.tokens -= wire
+            self.node.tokens -= wire
+            share.sent += wire
+            self._sent += wire
+            if wait > 0:
+                share.delayed += 1
+            return wait
+
+    async def admit(self, session_id: str, size: int, speech: bool = True, duration: float = 0.0) -> bool:
+        """
+        reserve(), then waits (for speech) if the packet is within the delay
+        budget. Returns False if the packet should be dropped.
+        """
+        wait = self.reserve(session_id, size, speech, duration)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def _rebalance(self, now: float):
+        """Re-measures demand and reassigns session rates. Called with the lock held."""
+        elapsed = now - self._last_rebalance
+        if elapsed > 0:
+            self._last_rebalance = now
+            smoothing = min(1.0, elapsed / (2 * self.interval))
+            for share in self._sessions.values():
+                # Demand is bytes per second of media times listeners, not bytes
+                # per wall-clock second: a throttled sender offers packets only
+                # as fast as they are admitted, which would make any allocation
+                # look sufficient. Without durations, fall back to wall-clock time.
+                if share.media > 0:
+                    offered = [count / share.media * len(share.listeners) for count in share.offered]
+                else:
+                    offered = [count / elapsed for count in share.offered]
+                for index in (0, 1):
+                    share.demand[index] += smoothing * (offered[index] - share.demand[index])
+                share.sent_rate += smoothing * (share.sent / elapsed - share.sent_rate)
+                share.offered = [0, 0]
+                share.media = 0.0
+                share.sent = 0
+            self.sent_rate += smoothing * (self._sent / elapsed - self.sent_rate)
+            self._sent = 0
+        if not self._sessions:
+            return
+
+        def capped(rate):
+            return min(rate, self.session_rate) if self.session_rate else rate
+
+        if self.node_rate is None:
+            rates = {session_id: self.session_rate or 0.0 for session_id in self._sessions}
+        else:
+            weights = {session_id: share.weight for session_id, share in self._sessions.items()}
+            speech = water_fill(self.node_rate, {
+                session_id: (weights[session_id], capped(share.demand[0]))
+                for session_id, share in self._sessions.items()
+            })
+            left = self.node_rate - sum(speech.values())
+            silence = water_fill(left, {
+                session_id: (weights[session_id], max(0.0, capped(sum(share.demand)) - speech[session_id]))
+                for session_id, share in self._sessions.items()
+            })
+            spare = max(0.0, left - sum(silence.values()))
+            total_weight = sum(weights.values())
+            rates = {
+                session_id: capped(speech[session_id] + silence[session_id] + spare * weights[session_id] / total_weight)
+                for session_id in self._sessions
+            }
+        for session_id, share in self._sessions.items():
+            share.bucket.refill(now)
+            share.bucket.set_rate(rates[session_id], self._burst_bytes(rates[session_id]))
+
+    def report(self, sessions: bool = True) -> dict:
+        """
+        Live utilization: node rate and use, and how many more listeners fit
+        at the current average per-listener rate before the node reaches
+        EGRESS_TARGET_UTILIZATION. All rates are in bits/s.
+        """
+        with self._lock:
+            self._rebalance(self._clock())
+            listeners = sum(len(share.listeners) for share in self._sessions.values())
+            sent = self.sent_rate * 8
+            per_listener = sent / listeners if listeners else None
+            node_rate = self.node_rate * 8 if self.node_rate else None
+            report = {
+                'node_rate': node_rate,
+                'sent_rate': round(sent),
+                'utilization': round(sent / node_rate, 3) if node_rate else None,
+                'listeners': listeners,
+                'per_listener_rate': round(per_listener) if per_listener else None,
+                'listener_headroom': (
+                    max(0, int((node_rate * settings.EGRESS_TARGET_UTILIZATION - sent) / per_listener))
+                    if node_rate and per_listener else None
+                ),
+                'dropped': sum(share.dropped for share in self._sessions.values()),
+                'delayed': sum(share.delayed for share in self._sessions.values()),
+            }
+            if sessions:
+                report['sessions'] = {
+                    session_id: {
+                        'weight': share.weight,
+                        'listeners': len(share.listeners),
+                        'rate': round(share.bucket.rate * 8) if self.node_rate or self.session_rate else None,
+                        'demand': round(sum(share.demand) * 8),
+                        'speech_demand': round(share.demand[0] * 8),
+                        'sent_rate': round(share.sent_rate * 8),
+                        'dropped': share.dropped,
+                        'delayed': share.delayed,
+                    }
+                    for session_id, share in self._sessions.items()
+                }
+        return report
+
+
+# Shared by every media loop of this process. Media worker processes each
+# get an equal slice of the node rate (see workers.MediaWorker).
+egress_scheduler = EgressScheduler()
@@ -0,0 +1,133 @@
+# audiolms/live/fanout.py
+import logging
+
+from aiortc.contrib.media import MediaRelay, MediaStreamTrack
+
+from ..config import settings
+from .audio_track import OpusEncodedTrack, SwitchableAudioTrack
+
+logger = logging.getLogger(__name__)
+
+
+class FanoutNode:
+    """
+    Fans one source audio track (typically the teacher's) out to many
+    listeners.
+
+    Listeners are grouped by quality tier (see settings.ABR_TIERS). Each tier
+    in use has exactly one OpusEncodedTrack reading the source, and every
+    listener in that tier receives a relay subscription of the encoded
+    packets, so encoding cost scales with the number of tiers, not listeners.
+    A tier's encoder is stopped when its last listener leaves.
+
+    The node reads its source through a SwitchableAudioTrack, so the source
+    can be attached later or hot-swapped (teacher reconnect) with set_source()
+    while listeners stay subscribed; silence is sent while it is detached.
+    Encoding CPU time is charged to `meter` (see resources.UsageMeter).
+    """
+    def __init__(self, source: MediaStreamTrack = None, tiers: list = None, meter=None):
+        self.input = SwitchableAudioTrack(source)
+        self.tiers = {tier['name']: tier for tier in (tiers or settings.ABR_TIERS)}
+        self.meter = meter
+        self._relay = MediaRelay()
+        # tier name -> OpusEncodedTrack
+        self._encoders = {}
+        # subscription track -> tier name
+        self._subscriptions = {}
+
+    @property
+    def source(self) -> MediaStreamTrack | None:
+        return self.input.source
+
+    def set_source(self, source: MediaStreamTrack | None):
+        """Swaps the node's source under all running encoders and listeners."""
+        self.input.replace_source(source)
+
+    @property
+    def default_tier(self) -> str:
+        return next(iter(self.tiers))
+
+    def subscribe(self, tier: str = None) -> MediaStreamTrack:
+        """Returns a new listener track carrying `tier`'s encoded stream."""
+        tier = tier or self.default_tier
+        encoder = self._encoders.get(tier)
+        if encoder is None:
+            profile = self.tiers[tier]
+            encoder = OpusEncodedTrack(
+                self._relay.subscribe(self.input, buffered=False),
+                bitrate=profile['bitrate'],
+                ptime=profile['ptime'],
+                fec=profile['fec'],
+                packet_loss=profile['packet_loss'],
+                meter=self.meter,
+            )
+            self._encoders[tier] = encoder
+            logger.info(f"Started '{tier}' encoder ({profile['bitrate']} bps, {profile['ptime']} ms, fec={profile['fec']}).")
+        # Unbuffered: a slow listener only ever gets the latest packet instead of a growing backlog.
+        track = self._relay.subscribe(encoder, buffered=False)
+        self._subscriptions[track] = tier
+        return track
+
+    def subscribe_raw(self) -> MediaStreamTrack:
+        """
+        Returns a subscription to the node's decoded input. Child nodes (e.g.
+        breakout rooms receiving a broadcast) feed from this, so the source is
+        decoded once no matter how many children listen.
+        """
+        return self._relay.subscribe(self.input, buffered=False)
+
+    def unsubscribe(self, track: MediaStreamTrack):
+        """
+        Stops a listener track; stops its tier's encoder if nobody else uses it.
+        A recv() waiting on the track raises MediaStreamError.
+        """
+        tier = self._subscriptions.pop(track, None)
+        _end_subscription(track)
+        track.stop()
+        if tier is not None and tier not in self._subscriptions.values():
+            encoder = self._encoders.pop(tier, None)
+            if encoder:
+                encoder.stop()
+                logger.info(f"Stopped unused '{tier}' encoder.")
+
+    def tier_of(self, track: MediaStreamTrack) -> str | None:
+        return self._subscriptions.get(track)
+
+    def classifier_of(self, track: MediaStreamTrack):
+        """Returns the speech classifier (OpusEncodedTrack.is_speech) of a listener track's encoder."""
+        encoder = self._encoders.get(self._subscriptions.get(track))
+        return encoder.is_speech if encoder else None
+
+    def listener_counts(self) -> dict:
+        """Returns the number of listener tracks per tier."""
+        counts = {}
+        for tier in self._subscriptions.values():
+            counts[tier] = counts.get(tier, 0) + 1
+        return counts
+
+    def usage(self) -> dict:
+        """Running encoders, and the packets and bytes they hold between reads."""
+        return {
+            'pipelines': len(self._encoders),
+            'queued_frames': sum(encoder.queued_frames for encoder in self._encoders.values()),
+            'buffered_bytes': sum(encoder.buffered_bytes for encoder in self._encoders.values()),
+        }
+
+    def stop(self):
+        for track in list(self._subscriptions):
+            _end_subscription(track)
+            track.stop()
+        self._subscriptions.clear()
+        for encoder in self._encoders.values():
+            encoder.stop()
+        self._encoders.clear()
+        self.input.stop()
+
+
+def _end_subscription(track: MediaStreamTrack):
+    # MediaRelay does not wake a recv() pending on an unbuffered subscription it
+    # stops; hand it the relay's own end-of-stream marker (no frame) instead
+    event = getattr(track, '_new_frame_event', None)
+    if event is not None:
+        track._frame = None
+        event.set()
@@ -0,0 +1,136 @@
+# audiolms/live/ice.py
+import ipaddress
+import logging
+import time
+
+import aioice.ice
+from aioice.candidate import Candidate, candidate_foundation
+from aiortc import RTCConfiguration, RTCIceServer
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def build_rtc_configuration(mode: str = None) -> RTCConfiguration:
+    """
+    Builds the RTCConfiguration used for server-side peer connections.
+
+    In 'host' mode no ICE servers are configured, so gathering only produces
+    host candidates and never waits on a STUN round trip. In 'stun' mode the
+    servers from settings.DEFAULT_STUN_SERVERS are used (aiortc only queries
+    the first STUN server in the list).
+    """
+    mode = mode or settings.ICE_MODE
+    if mode == 'host':
+        return RTCConfiguration(iceServers=[])
+    if mode != 'stun':
+        logger.warning(f"Unknown ICE mode '{mode}', falling back to 'stun'.")
+    # aiortc expects RTCIceServer objects, not the plain dicts kept in settings.
+    return RTCConfiguration(iceServers=[RTCIceServer(urls=server['urls']) for server in settings.DEFAULT_STUN_SERVERS])
+
+
+def _address_version(address: str) -> int | None:
+    try:
+        return ipaddress.ip_address(address).version
+    except ValueError:
+        return None
+
+
+class HostAddressCache:
+    """
+    Caches the local interface addresses that aioice enumerates for every
+    ICE gathering. Enumerating interfaces is repeated for each new peer
+    connection otherwise; the result only changes when the host's network
+    configuration changes, so it is reused for `ttl` seconds.
+
+    aioice binds a socket to every address returned here, so they must be
+    addresses of local interfaces. If `known_addresses` is set, those are
+    used (filtered by the address families ICE asks for) and interfaces are
+    never enumerated. Public addresses that only map to this host, such as a
+    1:1 NAT's, go in `advertised_addresses` instead: they are never bound,
+    only added to local descriptions by advertise().
+    """
+    def __init__(self, ttl: float = 300, known_addresses: list = None, advertised_addresses: list = None):
+        self.ttl = ttl
+        self.known_addresses = list(known_addresses or [])
+        self.advertised_addresses = list(advertised_addresses or [])
+        # (use_ipv4, use_ipv6) -> (timestamp, [addresses])
+        self._cache = {}
+        self._original = None
+
+    def get_host_addresses(self, use_ipv4: bool, use_ipv6: bool) -> list:
+        if self.known_addresses:
+            versions = {4} if use_ipv4 else set()
+            if use_ipv6:
+                versions.add(6)
+            return [address for address in self.known_addresses if _address_version(address) in versions]
+        key = (use_ipv4, use_ipv6)
+        cached = self._cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.ttl:
+            return list(cached[1])
+        addresses = self._original(use_ipv4=use_ipv4, use_ipv6=use_ipv6)
+        self._cache[key] = (now, list(addresses))
+        logger.debug(f"Enumerated host addresses for ICE: {addresses}")
+        return list(addresses)
+
+    def advertise(self, sdp: str) -> str:
+        """
+        Adds a host candidate for every advertised address to a local session
+        description, on the port of each gathered host candidate of the same
+        address family. Returns the SDP unchanged if there is nothing to add.
+        """
+        if not self.advertised_addresses:
+            return sdp
+        lines = []
+        for line in sdp.split('\r\n'):
+            lines.append(line)
+            if not line.startswith('a=candidate:'):
+                continue
+            candidate = Candidate.from_sdp(line[len('a=candidate:'):])
+            if candidate.type != 'host':
+                continue
+            for address in self.advertised_addresses:
+                if address == candidate.host or _address_version(address) != _address_version(candidate.host):
+                    continue
+                # Just below the interface's own candidate, so a directly reachable one is tried first
+                lines.append('a=candidate:' + Candidate(
+                    foundation=candidate_foundation('host', candidate.transport, address),
+                    component=candidate.component, transport=candidate.transport,
+                    priority=candidate.priority - 1, host=address, port=candidate.port, type='host',
+                ).to_sdp())
+        return '\r\n'.join(lines)
+
+    def invalidate(self):
+        """Forgets cached addresses, e.g. after a network change."""
+        self._cache.clear()
+
+    def install(self):
+        """Routes aioice's host address lookup through this cache."""
+        if self._original is not None:
+            return
+        self._original = aioice.ice.get_host_addresses
+        aioice.ice.get_host_addresses = self.get_host_addresses
+        logger.info("ICE host address cache installed.")
+
+    def uninstall(self):
+        if self._original is None:
+            return
+        aioice.ice.get_host_addresses = self._original
+        self._original = None
+        self._cache.clear()
+
+
+# Shared cache for this node; routed into aioice by install() at server startup.
+host_address_cache = HostAddressCache(ttl=settings.ICE_HOST_ADDRESS_TTL, known_addresses=settings.ICE_HOST_ADDRESSES,
+                                      advertised_addresses=settings.ICE_ADVERTISED_ADDRESSES)
+
+
+def install():
+    """
+    Routes aioice's host address lookup through the node's cache. Servers call
+    this once at startup (in every process that creates peer connections);
+    importing audiolms.live never patches aioice by itself.
+    """
+    host_address_cache.install()
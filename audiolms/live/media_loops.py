@@ -0,0 +1,245 @@
+# audiolms/live/media_loops.py
+import asyncio
+import logging
+import threading
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MediaLoop:
+    """
+    An asyncio event loop running on its own thread, owning one WebRTCManager
+    and the peer connections created through it. aiortc objects are bound to
+    the loop they were created on, so everything touching them is submitted
+    to this loop.
+    """
+    def __init__(self, index: int, emit):
+        self.index = index
+        self._emit = emit
+        self.loop = asyncio.new_event_loop()
+        self.signaling = None # LiveSignaling, created on the loop thread
+        self._thread = threading.Thread(target=self._run, name=f'audiolms-media-{index}', daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _setup(self):
+        # Imported here to keep aiortc off the import path of the ASGI front end.
+        from .signaling import LiveSignaling
+        from .webrtc_manager import WebRTCManager
+
+        manager = WebRTCManager()
+        self.signaling = LiveSignaling(manager, self._emit)
+        await manager.warm_pool()
+
+    async def resource_report(self, peers: bool = True) -> dict:
+        """Per-session resource usage of this loop's manager (must run on this loop)."""
+        return self.signaling.manager.resources.report(peers=peers)
+
+    async def start(self):
+        """Starts the thread and sets up its manager, awaiting it without blocking the caller's loop."""
+        self._thread.start()
+        await self.call(self._setup())
+        logger.info(f"Media loop {self.index} started.")
+
+    async def call(self, coro):
+        """Runs `coro` on this media loop and awaits its result from the caller's loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, self.loop))
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+
+
+class SessionRouter:
+    """
+    Routes signaling events from a python-socketio AsyncServer to a set of
+    media backends (event-loop threads or worker processes), each owning its
+    own WebRTCManager.
+
+    A client's peer connection is created on the backend that owns the live
+    session it names (`session_id` in start/join/offer messages), so a
+    teacher and the students relaying their track always share a backend. A
+    client is bound lazily, on its first event; clients that never name a
+    session go to the least-loaded backend. New sessions are placed on the
+    least-loaded backend at the time they are first named.
+
+    Subclasses implement `_start_backends`, `_stop_backends`, `_call` and
+    `_resource_report`.
+    """
+    def __init__(self, sio, count: int):
+        self._sio = sio
+        self.count = count
+        self._signaling_loop = None
+        # sid -> backend index
+        self._sid_loops = {}
+        # session_id -> backend index, and session_id -> set of member sids
+        self._session_loops = {}
+        self._session_members = {}
+        # sid -> session_id it is currently a member of
+        self._sid_sessions = {}
+        # sid -> asyncio.Lock; AsyncServer runs handlers concurrently, but one
+        # client's events must reach its backend in order.
+        self._sid_locks = {}
+
+    async def _emit(self, event, data, to):
+        # May be called from another thread's loop; Socket.IO emits must run on the signaling loop.
+        future = asyncio.run_coroutine_threadsafe(self._sio.emit(event, data, to=to), self._signaling_loop)
+        await asyncio.wrap_future(future)
+
+    async def _start_backends(self):
+        raise NotImplementedError
+
+    async def _stop_backends(self):
+        raise NotImplementedError
+
+    async def _call(self, index: int, event: str, sid: str, data=None):
+        """Runs LiveSignaling.dispatch(event, sid, data) on backend `index`."""
+        raise NotImplementedError
+
+    async def _resource_report(self, index: int, peers: bool) -> dict:
+        """Returns ResourceGovernor.report(peers) of backend `index`."""
+        raise NotImplementedError
+
+    async def resource_report(self, peers: bool = True) -> list:
+        """
+        Returns per-session resource usage, one dict per backend. May be
+        called from another thread's loop (e.g. a Flask view): the backends
+        are queried from the signaling loop.
+        """
+        async def gather():
+            reports = await asyncio.gather(*(self._resource_report(index, peers) for index in range(self.count)),
+                                           return_exceptions=True)
+            return [
+                {'index': index, 'error': str(report)} if isinstance(report, Exception) else dict(report, index=index)
+                for index, report in enumerate(reports)
+            ]
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(gather(), self._signaling_loop))
+
+    async def start(self):
+        self._signaling_loop = asyncio.get_running_loop()
+        await self._start_backends()
+
+    async def stop(self):
+        await self._stop_backends()
+
+    def load(self) -> list:
+        """Returns the number of bound clients per backend."""
+        counts = [0] * self.count
+        for index in list(self._sid_loops.values()):
+            counts[index] += 1
+        return counts
+
+    def load_report(self) -> list:
+        """Returns one dict per backend with its bound clients and live sessions."""
+        sessions = [0] * self.count
+        for index in list(self._session_loops.values()):
+            sessions[index] += 1
+        return [
+            {'index': index, 'clients': clients, 'sessions': sessions[index]}
+            for index, clients in enumerate(self.load())
+        ]
+
+    def _least_loaded(self) -> int:
+        counts = self.load()
+        return counts.index(min(counts))
+
+    def _loop_for_session(self, session_id: str) -> int:
+        if session_id not in self._session_loops:
+            self._session_loops[session_id] = self._least_loaded()
+            self._session_members[session_id] = set()
+        return self._session_loops[session_id]
+
+    def _leave_session(self, sid: str):
+        session_id = self._sid_sessions.pop(sid, None)
+        if session_id is None:
+            return
+        members = self._session_members.get(session_id)
+        if members is not None:
+            members.discard(sid)
+            if not members:
+                # Keep the placement while the session may still be resumed on its backend
+                # (see settings.SESSION_GRACE_PERIOD), then forget it so a restart is
+                # placed on the currently least-loaded backend.
+                self._signaling_loop.call_later(settings.SESSION_GRACE_PERIOD, self._forget_session, session_id)
+
+    def _forget_session(self, session_id: str):
+        if not self._session_members.get(session_id, True):
+            self._session_members.pop(session_id)
+            self._session_loops.pop(session_id)
+
+    async def _bind(self, sid: str, index: int):
+        """Binds `sid` to backend `index`, moving it off its previous backend if needed."""
+        current = self._sid_loops.get(sid)
+        if current == index:
+            return
+        if current is not None:
+            await self._call(current, 'disconnect', sid)
+        self._sid_loops[sid] = index
+        await self._call(index, 'connect', sid)
+
+    async def dispatch(self, event: str, sid: str, data=None):
+        if self._signaling_loop is None:
+            await self.start()
+
+        if event == 'connect':
+            # Binding is deferred until the client names a session.
+            return
+        lock = self._sid_locks.setdefault(sid, asyncio.Lock())
+        async with lock:
+            if event == 'disconnect':
+                self._sid_locks.pop(sid, None)
+                index = self._sid_loops.pop(sid, None)
+                self._leave_session(sid)
+                if index is not None:
+                    await self._call(index, 'disconnect', sid)
+                return
+            return await self._dispatch_bound(event, sid, data)
+
+    async def _dispatch_bound(self, event: str, sid: str, data):
+        session_id = data.get('session_id') if isinstance(data, dict) else None
+        if session_id is not None:
+            if self._sid_sessions.get(sid) != session_id:
+                self._leave_session(sid)
+            index = self._loop_for_session(session_id)
+            self._session_members[session_id].add(sid)
+            self._sid_sessions[sid] = session_id
+        else:
+            index = self._sid_loops.get(sid)
+            if index is None:
+                index = self._least_loaded()
+        await self._bind(sid, index)
+        return await self._call(index, event, sid, data)
+
+
+class MediaLoopPool(SessionRouter):
+    """
+    SessionRouter backed by media loop threads in this process (one per core
+    by default). Signaling and media no longer share a loop, but all media
+    still shares this process' GIL; see MediaWorkerPool for processes.
+    """
+    def __init__(self, sio, count: int = None):
+        super().__init__(sio, count or settings.MEDIA_LOOPS)
+        self.loops = []
+
+    async def _start_backends(self):
+        self.loops = [MediaLoop(i, self._emit) for i in range(self.count)]
+        # Loops warm their peer connection pools concurrently, each on its own thread.
+        await asyncio.gather(*(media_loop.start() for media_loop in self.loops))
+        logger.info(f"Started {self.count} media loop thread(s).")
+
+    async def _stop_backends(self):
+        for media_loop in self.loops:
+            media_loop.stop()
+        self.loops = []
+
+    async def _call(self, index: int, event: str, sid: str, data=None):
+        media_loop = self.loops[index]
+        return await media_loop.call(media_loop.signaling.dispatch(event, sid, data))
+
+    async def _resource_report(self, index: int, peers: bool) -> dict:
+        media_loop = self.loops[index]
+        return await media_loop.call(media_loop.resource_report(peers))
@@ -0,0 +1,87 @@
+# audiolms/live/pc_pool.py
+import asyncio
+import collections
+import logging
+
+from aiortc import RTCPeerConnection, RTCConfiguration
+
+from ..config import settings
+from .ice import build_rtc_configuration
+
+logger = logging.getLogger(__name__)
+
+
+class PeerConnectionPool:
+    """
+    Keeps a small number of pre-created RTCPeerConnection objects ready for
+    new sockets. Creating a peer connection generates its DTLS certificate,
+    which is the most expensive synchronous step on the connect path; with
+    the pool, a connect only pops an idle connection and the pool is refilled
+    in the background.
+
+    Pooled connections are never reused after being handed out: a closed
+    RTCPeerConnection cannot be restarted.
+    """
+    def __init__(self, size: int = None, config: RTCConfiguration = None):
+        self.size = settings.PEER_CONNECTION_POOL_SIZE if size is None else size
+        self.config = config or build_rtc_configuration()
+        self._idle = collections.deque()
+        self._refill_task = None
+        self._closed = False
+        # Counters exposed through stats()
+        self._hits = 0
+        self._misses = 0
+
+    def _create(self) -> RTCPeerConnection:
+        return RTCPeerConnection(self.config)
+
+    async def warm(self):
+        """
+        Fills the pool up to its target size. Connections are created one at a
+        time, yielding to the event loop in between so signaling is not stalled.
+        """
+        while not self._closed and len(self._idle) < self.size:
+            self._idle.append(self._create())
+            await asyncio.sleep(0)
+        logger.debug(f"PeerConnection pool warmed: {len(self._idle)} idle.")
+
+    def _schedule_refill(self):
+        if self._closed or self.size <= 0:
+            return
+        if self._refill_task and not self._refill_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return # No loop running (e.g. called from sync code); refill on next acquire.
+        self._refill_task = loop.create_task(self.warm())
+
+    def acquire(self) -> RTCPeerConnection:
+        """
+        Returns a ready RTCPeerConnection, creating one on the spot if the pool
+        is empty, and schedules a background refill.
+        """
+        if self._idle:
+            pc = self._idle.popleft()
+            self._hits += 1
+        else:
+            pc = self._create()
+            self._misses += 1
+        self._schedule_refill()
+        return pc
+
+    async def close(self):
+        """Closes all idle connections and stops refilling."""
+        self._closed = True
+        if self._refill_task:
+            self._refill_task.cancel()
+        while self._idle:
+            await self._idle.popleft().close()
+
+    def stats(self) -> dict:
+        return {
+            'idle': len(self._idle),
+            'size': self.size,
+            'hits': self._hits,
+            'misses': self._misses,
+        }
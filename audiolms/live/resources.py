@@ -0,0 +1,235 @@
+# audiolms/live/resources.py
+import asyncio
+import logging
+import math
+import time
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bytes of one decoded 20 ms, 48 kHz stereo s16 frame: the estimate used for
+# frames queued in received tracks, whose size is not known before decoding
+_DECODED_FRAME_BYTES = 3840
+
+
+class UsageMeter:
+    """
+    CPU time spent in track callbacks on behalf of one owner: a session, a
+    listener or a side pipeline. Charges also count towards `parent`, so a
+    session's meter adds up everything done for it.
+
+    Tracks charge time.thread_time() differences taken around their
+    synchronous work only; time spent awaiting (and so running other tasks)
+    is never counted.
+    """
+    __slots__ = ('cpu_time', 'parent')
+
+    def __init__(self, parent: 'UsageMeter' = None):
+        self.cpu_time = 0.0
+        self.parent = parent
+
+    def charge(self, seconds: float):
+        self.cpu_time += seconds
+        if self.parent is not None:
+            self.parent.cpu_time += seconds
+
+
+def pending_frames(track) -> tuple:
+    """
+    Returns (frames, bytes) waiting to be read from a track: the queue of a
+    received track (aiortc RemoteStreamTrack) or buffered relay subscription,
+    or the undelivered frame of an unbuffered MediaRelay subscription.
+    Other tracks report (0, 0).
+    """
+    queue = getattr(track, '_queue', None)
+    if queue is not None:
+        frames = queue.qsize()
+        return frames, frames * _DECODED_FRAME_BYTES
+    event = getattr(track, '_new_frame_event', None)
+    if event is not None and event.is_set():
+        return 1, getattr(getattr(track, '_frame', None), 'size', None) or _DECODED_FRAME_BYTES
+    return 0, 0
+
+
+class ResourceGovernor:
+    """
+    Accounts for what each live session of a WebRTCManager costs the node,
+    and enforces the per-session limits (SESSION_MAX_*; 0 means unlimited).
+
+    Every `interval` seconds, each session's usage is read from the manager
+    (WebRTCManager.session_usage): peer connections, queued frames, buffered
+    bytes, approximate memory and CPU time spent in its track callbacks,
+    turned here into a fraction of one core over the interval.
+
+    A session over a limit first loses its side pipelines (recorders,
+    analyzers; see WebRTCManager.add_side_pipeline), lowest priority first,
+    while its memory or CPU is still over. Then its lowest-priority
+    listeners are disconnected: speakers last, and within a priority the
+    most recent joiners first. Most of a session's CPU is shared between its
+    listeners (encoders, mixers), so CPU overuse sheds listeners in
+    proportion: 10% over sheds 10% of them. Every poll measures again, so
+    shedding converges over a few intervals instead of overshooting.
+    """
+    def __init__(self, manager, interval: float = None, max_peer_connections: int = None,
+                 max_memory: int = None, max_cpu: float = None, clock=time.monotonic):
+        self.manager = manager
+        self.interval = settings.RESOURCE_INTERVAL if interval is None else interval
+        self.max_peer_connections = (settings.SESSION_MAX_PEER_CONNECTIONS
+                                     if max_peer_connections is None else max_peer_connections)
+        self.max_memory = settings.SESSION_MAX_MEMORY if max_memory is None else max_memory
+        self.max_cpu = settings.SESSION_MAX_CPU if max_cpu is None else max_cpu
+        self._clock = clock
+        # (session_id, kind, name) -> (time, cpu_time) at the previous poll, where kind is
+        # 'session' (name None), 'peer' (a SID) or 'pipeline' (a side pipeline name)
+        self._samples = {}
+        # Same keys -> CPU use over the last interval, as a fraction of one core
+        self._cpu = {}
+        # session_id -> what enforcement did to it so far
+        self._actions = {}
+        self._task = None
+
+    def start(self):
+        """Starts the polling task on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    def limits(self) -> dict:
+        return {
+            'peer_connections': self.max_peer_connections or None,
+            'memory': self.max_memory or None,
+            'cpu': self.max_cpu or None,
+        }
+
+    def admits_listener(self, session_id: str) -> bool:
+        """False if one more listener would take the session over its peer connection limit."""
+        if not self.max_peer_connections:
+            return True
+        usage = self.manager.session_usage(session_id, peers=False)
+        return usage is None or usage['peer_connections'] < self.max_peer_connections
+
+    def _measure(self, session_id: str, usage: dict, now: float, seen: set):
+        """Fills in the 'cpu' fraction of a session, its peers and side pipelines."""
+        entries = [(('session', None), usage)]
+        entries += [(('peer', sid), peer) for sid, peer in usage.get('peers', {}).items()]
+        entries += [(('pipeline', name), pipeline) for name, pipeline in usage['side_pipelines'].items()]
+        for (kind, name), entry in entries:
+            key = (session_id, kind, name)
+            seen.add(key)
+            if entry.get('cpu_time') is None:
+                continue
+            previous = self._samples.get(key)
+            if previous is not None and now > previous[0]:
+                self._cpu[key] = max(0.0, entry['cpu_time'] - previous[1]) / (now - previous[0])
+            self._samples[key] = (now, entry['cpu_time'])
+            entry['cpu'] = self._cpu.get(key)
+
+    def exceeded(self, usage: dict) -> list:
+        """Names of the limits a session's usage is over."""
+        exceeded = []
+        if self.max_peer_connections and usage['peer_connections'] > self.max_peer_connections:
+            exceeded.append('peer_connections')
+        if self.max_memory and usage['memory'] > self.max_memory:
+            exceeded.append('memory')
+        if self.max_cpu and (usage.get('cpu') or 0.0) > self.max_cpu:
+            exceeded.append('cpu')
+        return exceeded
+
+    async def poll(self):
+        """Measures every session once and brings those over their limits back within them."""
+        now = self._clock()
+        seen = set()
+        for session_id in self.manager.live_session_ids():
+            usage = self.manager.session_usage(session_id)
+            if usage is None:
+                continue
+            self._measure(session_id, usage, now, seen)
+            exceeded = self.exceeded(usage)
+            if exceeded:
+                await self._enforce(session_id, usage, exceeded)
+        for key in set(self._samples) - seen:
+            self._samples.pop(key, None)
+            self._cpu.pop(key, None)
+        live = {session_id for session_id, _, _ in seen}
+        for session_id in set(self._actions) - live:
+            del self._actions[session_id]
+
+    async def _enforce(self, session_id: str, usage: dict, exceeded: list):
+        actions = self._actions.setdefault(session_id, {'stopped_pipelines': [], 'shed_listeners': 0})
+        memory_over = usage['memory'] - self.max_memory if 'memory' in exceeded else 0
+        cpu = usage.get('cpu') or 0.0
+        cpu_over = cpu - self.max_cpu if 'cpu' in exceeded else 0.0
+
+        # Side pipelines go first: they are optional and no listener hears them
+        pipelines = sorted(usage['side_pipelines'].items(), key=lambda item: item[1]['priority'])
+        for name, pipeline in pipelines:
+            if memory_over <= 0 and cpu_over <= 0:
+                break
+            if self.manager.stop_side_pipeline(session_id, name):
+                memory_over -= pipeline['memory']
+                cpu_over -= pipeline.get('cpu') or 0.0
+                cpu -= pipeline.get('cpu') or 0.0
+                actions['stopped_pipelines'].append(name)
+                logger.warning(f"Session {session_id} over its {', '.join(exceeded)} limit: stopped side pipeline '{name}'.")
+
+        peers = usage['peers']
+        listeners = sorted(
+            (sid for sid, peer in peers.items() if peer['role'] == 'listener'),
+            key=lambda sid: (peers[sid]['priority'], peers[sid]['speaker'], -peers[sid]['joined']),
+        )
+        count = 0
+        if 'peer_connections' in exceeded:
+            count = usage['peer_connections'] - self.max_peer_connections
+        if cpu_over > 0 and cpu > 0:
+            count = max(count, math.ceil(len(listeners) * cpu_over / cpu))
+        shed = []
+        for sid in listeners:
+            if len(shed) >= count and memory_over <= 0:
+                break
+            shed.append(sid)
+            memory_over -= peers[sid]['memory']
+        if shed:
+            actions['shed_listeners'] += len(shed)
+            logger.warning(f"Session {session_id} over its {', '.join(exceeded)} limit: shedding {len(shed)} listener(s).")
+            await self.manager.shed_listeners(session_id, shed, reason='session_over_capacity')
+
+    def report(self, peers: bool = True) -> dict:
+        """
+        Current usage of every session, with CPU as measured at the last poll,
+        the limits it exceeds and what enforcement did to it. Rates and
+        memory are approximate: see WebRTCManager.session_usage.
+        """
+        egress = self.manager.egress.report()['sessions']
+        sessions = {}
+        for session_id in self.manager.live_session_ids():
+            usage = self.manager.session_usage(session_id, peers=peers)
+            if usage is None:
+                continue
+            for kind, entries in (('peer', usage.get('peers', {})), ('pipeline', usage['side_pipelines'])):
+                for name, entry in entries.items():
+                    entry['cpu'] = _round(self._cpu.get((session_id, kind, name)))
+                    entry['cpu_time'] = _round(entry.get('cpu_time'))
+            usage['cpu'] = _round(self._cpu.get((session_id, 'session', None)))
+            usage['cpu_time'] = _round(usage['cpu_time'])
+            usage['limits_exceeded'] = self.exceeded(usage)
+            usage.update(self._actions.get(session_id, {'stopped_pipelines': [], 'shed_listeners': 0}))
+            usage['egress'] = egress.get(session_id)
+            sessions[session_id] = usage
+        return {'limits': self.limits(), 'interval': self.interval, 'sessions': sessions}
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error(f"Resource accounting poll failed: {e}")
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 4) if value is not None else None
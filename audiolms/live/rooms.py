@@ -0,0 +1,100 @@
+# audiolms/live/rooms.py
+import logging
+
+from aiortc.contrib.media import MediaRelay, MediaStreamTrack
+
+from .audio_track import AudioMixerTrack
+from .fanout import FanoutNode
+
+logger = logging.getLogger(__name__)
+
+# ID of the room every live session starts with
+MAIN_ROOM = 'main'
+
+
+class Room:
+    """
+    One room of a live session: a set of speakers and a FanoutNode that
+    listeners subscribe to.
+
+    Rooms form a tree. A child room (e.g. a breakout) can receive its parent's
+    audio as a broadcast; it is read from the parent node's decoded output, so
+    the parent's audio is decoded once and re-encoded only per room and tier.
+    The room's input is rewired whenever its speakers or broadcast setting
+    change: nothing (silence), a single track, or a mix of several. Rewiring
+    swaps the node's source in place, so listeners are never renegotiated.
+
+    Encoding and mixing CPU time is charged to `meter` (by default the
+    parent's), so a session's rooms add up to one figure.
+    """
+    def __init__(self, room_id: str, parent: 'Room' = None, receive_broadcast: bool = True, meter=None):
+        self.room_id = room_id
+        self.parent = parent
+        self.children = {}
+        self.receive_broadcast = receive_broadcast
+        self.meter = meter if meter is not None or parent is None else parent.meter
+        self.node = FanoutNode(meter=self.meter)
+        # speaker key (a SID, or 'teacher') -> MediaStreamTrack
+        self.speakers = {}
+        self._relay = MediaRelay()
+        # Tracks currently feeding the node's input, stopped on rewire
+        self._inputs = []
+        if parent is not None:
+            parent.children[room_id] = self
+
+    def set_speaker(self, key: str, track: MediaStreamTrack | None):
+        """Adds, replaces or (with track=None) removes a speaker and rewires the room."""
+        if track is None:
+            if self.speakers.pop(key, None) is None:
+                return
+        else:
+            self.speakers[key] = track
+        self.rewire()
+
+    def set_receive_broadcast(self, enabled: bool):
+        if self.parent is not None and enabled != self.receive_broadcast:
+            self.receive_broadcast = enabled
+            self.rewire()
+
+    def rewire(self):
+        """Rebuilds the node's input from the current speakers and broadcast."""
+        # Speakers whose track has not arrived yet are kept as None placeholders
+        inputs = [self._relay.subscribe(track, buffered=False) for track in self.speakers.values() if track is not None]
+        if self.parent is not None and self.receive_broadcast:
+            inputs.append(self.parent.node.subscribe_raw())
+
+        previous = self._inputs
+        if not inputs:
+            self.node.set_source(None)
+            self._inputs = []
+        elif len(inputs) == 1:
+            self.node.set_source(inputs[0])
+            self._inputs = inputs
+        else:
+            mixer = AudioMixerTrack(inputs, meter=self.meter)
+            self.node.set_source(mixer)
+            self._inputs = [mixer] # Stopping the mixer stops its inputs
+        for track in previous:
+            track.stop()
+        logger.debug(f"Room {self.room_id} rewired: {len(self.speakers)} speaker(s), broadcast={self.receive_broadcast and self.parent is not None}.")
+
+    def usage(self) -> dict:
+        """The node's usage (FanoutNode.usage) plus this room's mixer, if it has one."""
+        usage = self.node.usage()
+        for track in self._inputs:
+            if isinstance(track, AudioMixerTrack):
+                usage['pipelines'] += 1
+                usage['queued_frames'] += track.queued_frames
+                usage['buffered_bytes'] += track.buffered_bytes
+        return usage
+
+    def close(self):
+        """Closes this room and its children, stopping all their media."""
+        for child in list(self.children.values()):
+            child.close()
+        if self.parent is not None:
+            self.parent.children.pop(self.room_id, None)
+        for track in self._inputs:
+            track.stop()
+        self._inputs = []
+        self.node.stop()
@@ -1,51 +1,91 @@
 # audiolms/live/signaling.py
-import json
 import logging
-from flask import request # Import request to get sid
-from flask_socketio import SocketIO, emit
-from aiortc import RTCPeerConnection, RTCSessionDescription, RTCIceCandidate, RTCConfiguration, RTCIceServer
-from aiortc.contrib.media import MediaRelay # Useful if you have multiple listeners for one teacher's stream
-import asyncio
+from aiortc import RTCSessionDescription, RTCIceCandidate
 
-from ..config import settings # Import settings for STUN servers
+from ..config import settings
+from .ice import host_address_cache
 from .webrtc_manager import WebRTCManager
-from .audio_track import MicrophoneAudioTrack # This will be the source for the teacher (conceptual)
+from .rooms import MAIN_ROOM
 
 
 logger = logging.getLogger(__name__)
 
-# Initialize the WebRTCManager globally for the signaling module
-webrtc_manager = WebRTCManager()
 
-def setup_live_signaling(socketio: SocketIO):
+class LiveSignaling:
     """
-    Sets up SocketIO event handlers for WebRTC signaling.
-    Call this function from your main Flask app with your SocketIO instance.
+    Transport-independent WebRTC signaling logic.
+
+    Every handler takes the client's socket SID explicitly and replies through
+    `emit(event, data, to)`, an async callable supplied by the server flavour
+    (Flask-SocketIO or a python-socketio AsyncServer). All handlers must run on
+    the event loop that owns `manager` and its peer connections.
     """
-    @socketio.on('connect')
-    async def handle_connect():
-        sid = request.sid
+    # Socket.IO event name -> handler method name
+    EVENTS = {
+        'connect': 'on_connect',
+        'disconnect': 'on_disconnect',
+        'offer': 'on_offer',
+        'answer': 'on_answer',
+        'ice_candidate': 'on_ice_candidate',
+        'start_live_session': 'on_start_live_session',
+        'join_live_session': 'on_join_live_session',
+        'resume_live_session': 'on_resume_live_session',
+        'create_breakout_rooms': 'on_create_breakout_rooms',
+        'close_breakout_rooms': 'on_close_breakout_rooms',
+        'assign_rooms': 'on_assign_rooms',
+        'move_to_room': 'on_move_to_room',
+        'set_room_speakers': 'on_set_room_speakers',
+        'broadcast_to_rooms': 'on_broadcast_to_rooms',
+        'get_room_layout': 'on_get_room_layout',
+        'set_listener_priorities': 'on_set_listener_priorities',
+        'leave_session': 'on_leave_session',
+    }
+
+    def __init__(self, manager: WebRTCManager, emit):
+        self.manager = manager
+        self._emit = emit
+        self.manager.on_session_closed = self._on_session_closed
+        self.manager.on_listeners_shed = self._on_listeners_shed
+
+    async def _on_session_closed(self, session_id: str, listener_sids: list):
+        for listener_sid in listener_sids:
+            await self._emit('live_session_ended', {'session_id': session_id}, to=listener_sid)
+
+    async def _on_listeners_shed(self, session_id: str, listener_sids: list, reason: str):
+        for listener_sid in listener_sids:
+            await self._emit('live_session_ended', {'session_id': session_id, 'reason': reason}, to=listener_sid)
+
+    async def dispatch(self, event: str, sid: str, data=None):
+        """Runs the handler registered for a Socket.IO event."""
+        handler = getattr(self, self.EVENTS[event])
+        if event in ('connect', 'disconnect'):
+            return await handler(sid)
+        return await handler(sid, data)
+
+    async def on_connect(self, sid: str):
         logger.info(f"Socket connected: {sid}")
-        # Add a new peer connection for the connecting client
-        # Use STUN servers from config.py
-        await webrtc_manager.add_peer_connection_for_sid(sid, RTCConfiguration(iceServers=settings.DEFAULT_STUN_SERVERS))
+        # Add a new peer connection for the connecting client.
+        # It comes from the manager's pre-warmed pool, configured by settings.ICE_MODE.
+        await self.manager.add_peer_connection_for_sid(sid)
         logger.info(f"New peer connection created for SID: {sid}")
 
-    @socketio.on('disconnect')
-    async def handle_disconnect():
-        sid = request.sid
+    async def on_disconnect(self, sid: str):
         logger.info(f"Socket disconnected: {sid}")
         # Close and remove the peer connection associated with the disconnected SID
-        await webrtc_manager.close_peer_connection(sid)
+        orphaned_sessions = await self.manager.close_peer_connection(sid)
         logger.info(f"Peer connection closed for SID: {sid}")
+        # A teacher dropped: their sessions wait for a resume, students stay connected.
+        for session_id in orphaned_sessions:
+            for listener_sid in self.manager.get_listener_sids(session_id):
+                await self._emit('teacher_reconnecting', {'session_id': session_id}, to=listener_sid)
 
-    @socketio.on('offer')
-    async def handle_offer(message):
-        sid = request.sid
+    async def on_offer(self, sid: str, message: dict):
         offer_sdp = message['sdp']
         offer_type = message['type']
-        
-        pc = webrtc_manager.get_peer_connection(sid)
+        manager = self.manager
+        emit = self._emit
+
+        pc = manager.get_peer_connection(sid)
         if not pc:
             logger.error(f"No PeerConnection found for SID {sid} when receiving offer.")
             return
@@ -57,73 +97,63 @@ def setup_live_signaling(socketio: SocketIO):
             if pc.connectionState == "failed":
                 logger.warning(f"PeerConnection for SID {sid} failed. Closing.")
                 await pc.close()
-                await webrtc_manager.close_peer_connection(sid)
+                # A resume may already have given this SID a new connection; leave that one alone.
+                if manager.get_peer_connection(sid) is pc:
+                    await manager.close_peer_connection(sid)
             elif pc.connectionState == "closed":
                 logger.info(f"PeerConnection for SID {sid} closed.")
-        
+
         # Define track handler for the current PeerConnection
         @pc.on("track")
         async def on_track(track):
             logger.info(f"Track {track.kind} received from SID: {sid}")
             if track.kind == "audio":
-                # This is typically the teacher's audio coming from their browser.
-                # Store this track in the WebRTCManager, associated with the teacher's SID.
-                webrtc_manager.set_teacher_audio_track(sid, track)
-                logger.info(f"Teacher {sid} audio track received and stored.")
-                
-                # If this is a teacher's track, we need to fan it out to students
-                # who have joined the same session.
-                session_id = None
-                for sess_id, data in webrtc_manager._live_sessions.items():
-                    if data['teacher_sid'] == sid:
-                        session_id = sess_id
-                        break
-                
-                if session_id:
-                    # Iterate through all other connected clients (students) in this session
-                    # and add the teacher's track to their peer connections.
-                    # This assumes a server-side media relay/SFU approach.
-                    # For a simple demo, students will initiate connection to receive.
-                    # The `join_live_session` logic will handle adding the track.
-                    pass # Fan-out logic is handled when students join and request audio.
+                if manager.is_teacher(sid):
+                    # This is typically the teacher's audio coming from their browser.
+                    # Store this track in the WebRTCManager, associated with the teacher's SID.
+                    manager.set_teacher_audio_track(sid, track)
+                    logger.info(f"Teacher {sid} audio track received and stored.")
+                    # Fan-out to students is handled when students join and request audio.
+                else:
+                    # A student sending audio; heard once they are made a room speaker.
+                    manager.set_incoming_audio_track(sid, track)
 
         # Define ICE candidate handler for the current PeerConnection
         @pc.on("icecandidate")
         async def on_icecandidate(candidate):
             if candidate:
                 logger.info(f"Sending ICE candidate for SID {sid}: {candidate.sdpMid} {candidate.sdpMLineIndex}")
-                # Emit the ICE candidate to the specific client (room=sid)
-                emit('ice_candidate', {
+                # Emit the ICE candidate to the specific client
+                await emit('ice_candidate', {
                     'candidate': candidate.candidate,
                     'sdpMid': candidate.sdpMid,
                     'sdpMLineIndex': candidate.sdpMLineIndex
-                }, room=sid)
+                }, to=sid)
 
         try:
             # Create an RTCSessionDescription object from the received offer
             offer = RTCSessionDescription(sdp=offer_sdp, type=offer_type)
             # Set the remote description (the offer from the client)
             await pc.setRemoteDescription(offer)
-            
+
             # Create an answer to the offer
             answer = await pc.createAnswer()
             # Set the local description (our answer)
             await pc.setLocalDescription(answer)
 
             logger.info(f"Sending answer to SID {sid}")
-            # Emit the answer back to the client
-            emit('answer', {'sdp': pc.localDescription.sdp, 'type': pc.localDescription.type}, room=sid)
+            # Emit the answer back to the client, announcing any public addresses of this host (1:1 NAT)
+            sdp = host_address_cache.advertise(pc.localDescription.sdp)
+            await emit('answer', {'sdp': sdp, 'type': pc.localDescription.type}, to=sid)
 
         except Exception as e:
             logger.error(f"Error handling offer for SID {sid}: {e}")
 
-    @socketio.on('answer')
-    async def handle_answer(message):
-        sid = request.sid
+    async def on_answer(self, sid: str, message: dict):
         answer_sdp = message['sdp']
         answer_type = message['type']
 
-        pc = webrtc_manager.get_peer_connection(sid)
+        pc = self.manager.get_peer_connection(sid)
         if not pc:
             logger.error(f"No PeerConnection found for SID {sid} when receiving answer.")
             return
@@ -137,11 +167,8 @@ def setup_live_signaling(socketio: SocketIO):
         except Exception as e:
             logger.error(f"Error handling answer for SID {sid}: {e}")
 
-    @socketio.on('ice_candidate')
-    async def handle_ice_candidate(message):
-        sid = request.sid
-        
-        pc = webrtc_manager.get_peer_connection(sid)
+    async def on_ice_candidate(self, sid: str, message: dict):
+        pc = self.manager.get_peer_connection(sid)
         if not pc:
             logger.error(f"No PeerConnection found for SID {sid} when receiving ICE candidate.")
             return
@@ -160,78 +187,257 @@ def setup_live_signaling(socketio: SocketIO):
             logger.error(f"Error adding ICE candidate for SID {sid}: {e}")
 
     # --- Live Room Management Events ---
-    @socketio.on('start_live_session')
-    async def start_live_session(data):
+    async def on_start_live_session(self, sid: str, data: dict):
         """
         Handles a teacher initiating a live session.
         The teacher's browser will send an offer with their audio stream.
         """
-        sid = request.sid
         session_id = data.get('session_id')
         user_role = data.get('role', 'teacher')
 
         if user_role != 'teacher':
-            emit('error', {'message': 'Only teachers can start live sessions.'}, room=sid)
+            await self._emit('error', {'message': 'Only teachers can start live sessions.'}, to=sid)
             return
 
         logger.info(f"Teacher {sid} attempting to start live session {session_id}")
-        pc = webrtc_manager.get_peer_connection(sid)
+        pc = self.manager.get_peer_connection(sid)
         if not pc:
             logger.error(f"No PeerConnection for teacher {sid} to start session.")
-            emit('error', {'message': 'No active WebRTC connection found for you.'}, room=sid)
+            await self._emit('error', {'message': 'No active WebRTC connection found for you.'}, to=sid)
             return
 
         # Activate the live session in the manager
-        webrtc_manager.activate_live_session(session_id, teacher_sid=sid)
-        emit('live_session_started', {'session_id': session_id, 'status': 'success'}, room=sid)
+        resume_token = self.manager.activate_live_session(session_id, teacher_sid=sid)
+        if resume_token is None:
+            await self._emit('error', {'message': f'Live session {session_id} is already held by another teacher.'}, to=sid)
+            return
+        # The resume token lets this teacher take the session back after a reconnect.
+        await self._emit('live_session_started', {'session_id': session_id, 'status': 'success', 'resume_token': resume_token}, to=sid)
         logger.info(f"Live session {session_id} started by teacher {sid}")
 
-    @socketio.on('join_live_session')
-    async def join_live_session(data):
+    async def on_resume_live_session(self, sid: str, data: dict):
+        """
+        Handles a teacher reconnecting to a session in its grace period.
+        Students are not renegotiated: the teacher's next offer brings a new
+        audio track that is swapped in under the existing fan-out.
+
+        The resume may come over the same socket after only the peer
+        connection dropped. That connection was closed on failure, or is
+        already negotiated (aiortc cannot restart ICE), so the SID gets a
+        fresh one from the pool for the offer that follows.
+        """
+        session_id = data.get('session_id')
+        pc = self.manager.get_peer_connection(sid)
+        if pc is None or pc.remoteDescription is not None:
+            if pc is not None:
+                await self.manager.close_peer_connection(sid)
+            await self.manager.add_peer_connection_for_sid(sid)
+        if not self.manager.resume_live_session(session_id, data.get('resume_token'), teacher_sid=sid):
+            logger.warning(f"Teacher {sid} failed to resume live session {session_id}.")
+            await self._emit('resume_failed', {'session_id': session_id}, to=sid)
+            return
+        await self._emit('live_session_resumed', {'session_id': session_id, 'status': 'success'}, to=sid)
+        for listener_sid in self.manager.get_listener_sids(session_id):
+            await self._emit('teacher_resumed', {'session_id': session_id}, to=listener_sid)
+
+    async def on_join_live_session(self, sid: str, data: dict):
         """
         Handles a student joining a live session.
         The student's browser will send an offer requesting to receive audio.
         The server will then add the teacher's audio track to the student's PeerConnection.
         """
-        sid = request.sid
         session_id = data.get('session_id')
-        
-        teacher_sid = webrtc_manager.get_live_session_teacher(session_id)
-        if not teacher_sid:
-            emit('error', {'message': f'Live session {session_id} not active or no teacher found.'}, room=sid)
+
+        teacher_sid = self.manager.get_live_session_teacher(session_id)
+        # A session waiting for its teacher to resume can still be joined.
+        if not self.manager.has_live_session(session_id):
+            await self._emit('error', {'message': f'Live session {session_id} not active or no teacher found.'}, to=sid)
             logger.warning(f"Student {sid} tried to join non-existent/inactive session {session_id}.")
             return
 
-        student_pc = webrtc_manager.get_peer_connection(sid)
-        teacher_audio_track = webrtc_manager.get_teacher_audio_track(teacher_sid)
+        if self.manager.session_full(session_id):
+            await self._emit('error', {'message': f'Live session {session_id} is full.'}, to=sid)
+            logger.warning(f"Student {sid} refused: live session {session_id} is at its peer connection limit.")
+            return
+
+        student_pc = self.manager.get_peer_connection(sid)
 
         if not student_pc:
-             logger.error(f"Missing PeerConnection for student {sid} to join session {session_id}.")
-             emit('error', {'message': 'No active WebRTC connection found for you.'}, room=sid)
-             return
-
-        if teacher_audio_track:
-            logger.info(f"Adding teacher {teacher_sid} audio track to student {sid}'s PC.")
-            # Use MediaRelay to subscribe to the teacher's track and add it to the student's PC.
-            # This allows multiple students to receive the same teacher's stream.
-            student_pc.addTrack(MediaRelay().subscribe(teacher_audio_track))
-            logger.info(f"Teacher's audio track added to student {sid}'s PeerConnection.")
-        else:
-            logger.warning(f"Teacher {teacher_sid} audio track not available yet for student {sid}. Student will connect but might not receive audio immediately.")
-            # The student's browser will still send its offer, and once the teacher's track
-            # becomes available (via on_track on teacher's PC), it can be added.
-
-        emit('live_session_joined', {'session_id': session_id, 'teacher_sid': teacher_sid}, room=sid)
+            logger.error(f"Missing PeerConnection for student {sid} to join session {session_id}.")
+            await self._emit('error', {'message': 'No active WebRTC connection found for you.'}, to=sid)
+            return
+
+        logger.info(f"Adding session {session_id} audio to student {sid}'s PC.")
+        # Subscribe the student to the session's fan-out. Students share one encoder
+        # per quality tier and are moved between tiers from their RTCP feedback.
+        # If the teacher's track has not arrived yet (or the teacher is reconnecting),
+        # the student hears silence until it is swapped in; no renegotiation is needed.
+        self.manager.add_listener(session_id, sid, student_pc)
+        logger.info(f"Session audio track added to student {sid}'s PeerConnection.")
+
+        await self._emit('live_session_joined', {'session_id': session_id, 'teacher_sid': teacher_sid}, to=sid)
         logger.info(f"Student {sid} joined live session {session_id}")
 
-    @socketio.on('leave_session')
-    async def handle_leave_session(data):
+    # --- Breakout Rooms ---
+    async def _require_teacher(self, sid: str, session_id: str) -> bool:
+        if self.manager.get_live_session_teacher(session_id) != sid:
+            await self._emit('error', {'message': f'Only the teacher of session {session_id} can manage it.'}, to=sid)
+            return False
+        return True
+
+    async def _notify_room_changes(self, session_id: str, moves: dict):
+        for listener_sid, room_id in moves.items():
+            await self._emit('room_changed', {'session_id': session_id, 'room_id': room_id}, to=listener_sid)
+
+    async def on_create_breakout_rooms(self, sid: str, data: dict):
+        """
+        Creates breakout rooms in one step: either the given `rooms` IDs or
+        `count` numbered rooms, optionally under `parent` and with the parent's
+        `broadcast` on or off. Students are placed with 'assign_rooms'.
+        """
+        session_id = data.get('session_id')
+        if not await self._require_teacher(sid, session_id):
+            return
+        room_ids = data.get('rooms') or [f'room-{i + 1}' for i in range(int(data.get('count', 0)))]
+        created = self.manager.create_breakout_rooms(
+            session_id, room_ids, parent_id=data.get('parent', MAIN_ROOM), receive_broadcast=data.get('broadcast', True))
+        await self._emit('breakout_rooms_created', {'session_id': session_id, 'rooms': created}, to=sid)
+
+    async def on_close_breakout_rooms(self, sid: str, data: dict):
+        """Closes the given breakout `rooms` (all of them by default); their students return to the parent room."""
+        session_id = data.get('session_id')
+        if not await self._require_teacher(sid, session_id):
+            return
+        room_ids = data.get('rooms') or [room_id for room_id in self.manager.room_layout(session_id) if room_id != MAIN_ROOM]
+        moves = {}
+        for room_id in room_ids:
+            moves.update(self.manager.close_breakout_room(session_id, room_id))
+        await self._notify_room_changes(session_id, moves)
+        await self._emit('breakout_rooms_closed', {'session_id': session_id, 'rooms': room_ids}, to=sid)
+
+    async def on_assign_rooms(self, sid: str, data: dict):
+        """Moves many students at once: `assignments` maps student SID -> room ID."""
+        session_id = data.get('session_id')
+        if not await self._require_teacher(sid, session_id):
+            return
+        moves = self.manager.assign_rooms(session_id, data.get('assignments', {}))
+        await self._notify_room_changes(session_id, moves)
+        await self._emit('rooms_assigned', {'session_id': session_id, 'assignments': moves}, to=sid)
+
+    async def on_move_to_room(self, sid: str, data: dict):
+        """Lets a student move themselves to another room of their session."""
+        session_id = data.get('session_id')
+        moves = self.manager.assign_rooms(session_id, {sid: data.get('room_id')})
+        if not moves:
+            await self._emit('error', {'message': f"Could not move to room {data.get('room_id')}."}, to=sid)
+            return
+        await self._notify_room_changes(session_id, moves)
+
+    async def on_set_room_speakers(self, sid: str, data: dict):
+        """Replaces the speaker set of a room with the given student SIDs."""
+        session_id = data.get('session_id')
+        if not await self._require_teacher(sid, session_id):
+            return
+        speakers = data.get('speakers', [])
+        if not self.manager.set_room_speakers(session_id, data.get('room_id'), speakers):
+            await self._emit('error', {'message': f"Room {data.get('room_id')} not found."}, to=sid)
+            return
+        for speaker_sid in speakers:
+            await self._emit('speaker_enabled', {'session_id': session_id, 'room_id': data.get('room_id')}, to=speaker_sid)
+
+    async def on_broadcast_to_rooms(self, sid: str, data: dict):
+        """Turns the main room's broadcast into breakout `rooms` (all by default) on or off."""
+        session_id = data.get('session_id')
+        if not await self._require_teacher(sid, session_id):
+            return
+        self.manager.set_broadcast(session_id, bool(data.get('enabled', True)), data.get('rooms'))
+
+    async def on_set_listener_priorities(self, sid: str, data: dict):
+        """
+        Sets listener priorities: `priorities` maps student SID -> integer
+        (default 0). When the session exceeds its resource limits, the
+        lowest-priority students are disconnected first.
+        """
+        session_id = data.get('session_id')
+        if not await self._require_teacher(sid, session_id):
+            return
+        applied = {
+            listener_sid: priority for listener_sid, priority in data.get('priorities', {}).items()
+            if self.manager.set_listener_priority(session_id, listener_sid, priority)
+        }
+        await self._emit('listener_priorities_set', {'session_id': session_id, 'priorities': applied}, to=sid)
+
+    async def on_get_room_layout(self, sid: str, data: dict):
+        session_id = data.get('session_id')
+        await self._emit('room_layout', {'session_id': session_id, 'rooms': self.manager.room_layout(session_id)}, to=sid)
+
+    async def on_leave_session(self, sid: str, data: dict):
         """
         Handles a client explicitly leaving a live session.
         """
-        sid = request.sid
         session_id = data.get('session_id')
         logger.info(f"Client {sid} leaving session {session_id}")
         # Additional logic to remove client from session tracking if needed
         # For now, we rely on disconnect to clean up PC.
-        emit('session_left', {'session_id': session_id, 'status': 'success'}, room=sid)
+        await self._emit('session_left', {'session_id': session_id, 'status': 'success'}, to=sid)
+
+
+def setup_live_signaling(socketio, manager: WebRTCManager = None):
+    """
+    Sets up Flask-SocketIO event handlers for WebRTC signaling.
+    Call this function from your main Flask app with your SocketIO instance.
+    A WebRTCManager is created unless one is given; it is reachable as the
+    returned LiveSignaling's `manager`.
+    """
+    from flask import request # Import request to get sid
+
+    async def emit(event, data, to):
+        socketio.emit(event, data, to=to)
+
+    signaling = LiveSignaling(manager or WebRTCManager(), emit)
+
+    def register(event):
+        @socketio.on(event)
+        async def handler(data=None):
+            await signaling.dispatch(event, request.sid, data)
+
+    for event in LiveSignaling.EVENTS:
+        register(event)
+    return signaling
+
+
+def setup_async_signaling(sio, backend: str = None, count: int = None):
+    """
+    Sets up python-socketio AsyncServer event handlers for WebRTC signaling.
+
+    Signaling runs on the ASGI server's event loop; peer connections and their
+    media run on dedicated media loop threads (MediaLoopPool) or, with the
+    'processes' backend, on per-core worker processes (MediaWorkerPool), so
+    RTP work never blocks Socket.IO traffic. Returns the SessionRouter, which
+    the caller starts and stops with the application's lifespan.
+    """
+    backend = backend or settings.MEDIA_BACKEND
+    if backend == 'processes':
+        from .workers import MediaWorkerPool
+        media = MediaWorkerPool(sio, count=count)
+    else:
+        from .media_loops import MediaLoopPool
+        media = MediaLoopPool(sio, count=count)
+
+    @sio.event
+    async def connect(sid, environ, auth=None):
+        await media.dispatch('connect', sid)
+
+    @sio.event
+    async def disconnect(sid, *args):
+        await media.dispatch('disconnect', sid)
+
+    def register(event):
+        @sio.on(event)
+        async def handler(sid, data=None):
+            await media.dispatch(event, sid, data)
+
+    for event in LiveSignaling.EVENTS:
+        if event not in ('connect', 'disconnect'):
+            register(event)
+    return media
@@ -3,6 +3,16 @@ from aiortc import RTCPeerConnection, RTCConfiguration
 from aiortc.contrib.media import MediaRelay, MediaStreamTrack # MediaStreamTrack for type hinting
 import asyncio
 import logging
+import secrets
+import time
+
+from ..config import settings
+from .pc_pool import PeerConnectionPool
+from .rooms import Room, MAIN_ROOM
+from .adaptive import AdaptiveBitrateController
+from .audio_track import EgressTrack
+from .egress import EgressScheduler, egress_scheduler
+from .resources import ResourceGovernor, UsageMeter, pending_frames
 
 logger = logging.getLogger(__name__)
 
@@ -12,11 +22,35 @@ class WebRTCManager:
     Provides methods to create, retrieve, and close connections,
     and manage active live sessions (e.g., classes).
     """
-    def __init__(self):
+    def __init__(self, pool: PeerConnectionPool = None, egress: EgressScheduler = None):
+        # Pool of pre-created peer connections used when no explicit config is given
+        self._pool = pool or PeerConnectionPool()
+        # Paces every listener's outbound packets within the node's bandwidth budget
+        self.egress = egress or egress_scheduler
         # Stores active RTCPeerConnection objects: sid -> RTCPeerConnection
         self._peer_connections = {}
-        # Stores active live session data: session_id -> {'teacher_sid': str, 'teacher_audio_track': MediaStreamTrack}
+        # Stores active live session data: session_id -> {'teacher_sid': str, 'teacher_audio_track': MediaStreamTrack,
+        #                                                  'rooms': {room_id: Room}, 'listeners': {sid: listener},
+        #                                                  'side_pipelines': {name: side_pipeline}, 'meter': UsageMeter,
+        #                                                  'resume_token': str, 'grace_task': asyncio.Task}
+        # where listener = {'sender': RTCRtpSender, 'track': MediaStreamTrack, 'egress': EgressTrack, 'tier': str,
+        #                   'room': str, 'priority': int, 'joined': float, 'meter': UsageMeter}
+        # ('track' is the fan-out subscription the sender's 'egress' track currently reads from)
+        # and side_pipeline = {'pipeline': object with stop(), 'track': MediaStreamTrack, 'priority': int,
+        #                      'meter': UsageMeter}.
+        # 'rooms' always holds the MAIN_ROOM (speaker: the teacher) plus any breakout rooms.
+        # 'teacher_sid' is None while the session waits for its teacher to resume.
         self._live_sessions = {}
+        # Audio tracks received from non-teacher peers (potential room speakers): sid -> MediaStreamTrack
+        self._incoming_tracks = {}
+        # Optional async callback(session_id, listener_sids) run when a session is torn down
+        self.on_session_closed = None
+        # Optional async callback(session_id, listener_sids, reason) run when listeners are shed
+        self.on_listeners_shed = None
+        # Re-tiers listeners from their RTCP feedback; started with the first listener
+        self.adaptive_bitrate = AdaptiveBitrateController(self)
+        # Accounts per-session resource use and enforces the SESSION_MAX_* limits; started with the first listener
+        self.resources = ResourceGovernor(self)
         # Lock to ensure thread-safe access to _peer_connections and _live_sessions
         self._peer_connection_lock = asyncio.Lock()
 
@@ -24,10 +58,11 @@ class WebRTCManager:
         """
         Adds a new RTCPeerConnection for a given SocketIO SID if one doesn't already exist.
         Returns the created or existing RTCPeerConnection.
+        Without an explicit config, the connection is taken from the node's pool.
         """
         async with self._peer_connection_lock:
             if sid not in self._peer_connections:
-                pc = RTCPeerConnection(config)
+                pc = self._pool.acquire() if config is None else RTCPeerConnection(config)
                 self._peer_connections[sid] = pc
                 logger.info(f"Created new RTCPeerConnection for SID: {sid}")
                 return pc
@@ -35,6 +70,26 @@ class WebRTCManager:
                 logger.warning(f"RTCPeerConnection already exists for SID: {sid}. Returning existing one.")
                 return self._peer_connections[sid]
 
+    async def warm_pool(self):
+        """
+        Pre-creates pooled peer connections. Call once the event loop is running
+        so the first sockets to connect already find ready connections.
+        """
+        await self._pool.warm()
+
+    def pool_stats(self) -> dict:
+        return self._pool.stats()
+
+    def stats(self) -> dict:
+        """Returns counts of the peer connections and live sessions held by this manager."""
+        return {
+            'peer_connections': len(self._peer_connections),
+            'live_sessions': len(self._live_sessions),
+            'listener_tiers': self.listener_tier_counts(),
+            'pool': self._pool.stats(),
+            'egress': self.egress.report(sessions=False),
+        }
+
     def get_peer_connection(self, sid: str) -> RTCPeerConnection | None:
         """
         Retrieves an RTCPeerConnection by SocketIO SID.
@@ -42,11 +97,15 @@ class WebRTCManager:
         """
         return self._peer_connections.get(sid)
 
-    async def close_peer_connection(self, sid: str):
+    async def close_peer_connection(self, sid: str) -> list:
         """
         Closes and removes an RTCPeerConnection by SocketIO SID.
-        Also cleans up any associated live session data if the disconnected peer was a teacher.
+        If the disconnected peer was a teacher, their sessions are not torn down:
+        they enter a grace period (settings.SESSION_GRACE_PERIOD) during which
+        students stay connected and the teacher can resume. Returns the IDs of
+        the sessions that entered the grace period.
         """
+        orphaned = []
         async with self._peer_connection_lock:
             pc = self._peer_connections.pop(sid, None)
             if pc:
@@ -55,28 +114,113 @@ class WebRTCManager:
                 
                 # Clean up any associated live session data if this SID was a teacher
                 # Iterate over a copy of items to allow modification during iteration
+                self._incoming_tracks.pop(sid, None)
                 for session_id, data in list(self._live_sessions.items()):
+                    self._remove_listener(session_id, data, sid)
+                    for room in data['rooms'].values():
+                        room.set_speaker(sid, None)
                     if data.get('teacher_sid') == sid:
-                        self._live_sessions.pop(session_id)
-                        logger.info(f"Closed live session {session_id} due to teacher {sid} disconnect.")
-                        # TODO: In a real app, you would notify all students in this session
-                        # that the teacher has disconnected. This could involve emitting a SocketIO event.
+                        self._begin_grace_period(session_id, data)
+                        orphaned.append(session_id)
             else:
                 logger.warning(f"No RTCPeerConnection found for SID {sid} to close.")
+        return orphaned
+
+    def _begin_grace_period(self, session_id: str, data: dict):
+        """Detaches a departed teacher and schedules the session's teardown."""
+        data['teacher_sid'] = None
+        data['teacher_audio_track'] = None
+        data['rooms'][MAIN_ROOM].set_speaker('teacher', None) # Students hear silence until the teacher is back
+        data['grace_task'] = asyncio.get_running_loop().create_task(
+            self._expire_session(session_id, settings.SESSION_GRACE_PERIOD))
+        logger.info(f"Live session {session_id} lost its teacher; waiting {settings.SESSION_GRACE_PERIOD}s for resume.")
+
+    async def _expire_session(self, session_id: str, delay: float):
+        await asyncio.sleep(delay)
+        async with self._peer_connection_lock:
+            data = self._live_sessions.get(session_id)
+            if not data or data['teacher_sid'] is not None:
+                return # Resumed in the meantime
+            data['grace_task'] = None # This task is finishing; don't cancel it
+            listener_sids = self.close_live_session(session_id)
+        logger.info(f"Closed live session {session_id}: teacher did not resume within the grace period.")
+        if self.on_session_closed:
+            await self.on_session_closed(session_id, listener_sids)
+
+    def close_live_session(self, session_id: str) -> list:
+        """
+        Tears down a live session's fan-out. Students keep their PeerConnections
+        but stop receiving audio. Returns the SIDs of the session's listeners.
+        """
+        data = self._live_sessions.pop(session_id, None)
+        if not data:
+            return []
+        if data.get('grace_task'):
+            data['grace_task'].cancel()
+        for listener in data['listeners'].values():
+            listener['track'].stop()
+        for side_pipeline in data['side_pipelines'].values():
+            _stop_side_pipeline(side_pipeline)
+        data['rooms'][MAIN_ROOM].close()
+        for listener_sid in data['listeners']:
+            self.adaptive_bitrate.forget(session_id, listener_sid)
+        self.egress.forget_session(session_id)
+        return list(data['listeners'])
+
+    def resume_live_session(self, session_id: str, resume_token: str, teacher_sid: str) -> bool:
+        """
+        Re-attaches a reconnecting teacher to their session, keeping every
+        student's PeerConnection and subscription. The teacher's new audio track
+        is hot-swapped into the fan-out when it arrives (set_teacher_audio_track).
+        Returns False if the session is gone or the token does not match.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data or not resume_token or not secrets.compare_digest(data['resume_token'], resume_token):
+            return False
+        if data.get('grace_task'):
+            data['grace_task'].cancel()
+            data['grace_task'] = None
+        previous_sid = data['teacher_sid']
+        data['teacher_sid'] = teacher_sid
+        logger.info(f"Teacher {teacher_sid} resumed live session {session_id} (previous SID: {previous_sid}).")
+        return True
+
+    def get_listener_sids(self, session_id: str) -> list:
+        """Returns the SIDs of the students subscribed to a live session."""
+        data = self._live_sessions.get(session_id)
+        return list(data['listeners']) if data else []
+
+    def has_live_session(self, session_id: str) -> bool:
+        return session_id in self._live_sessions
 
-    def activate_live_session(self, session_id: str, teacher_sid: str):
+    def activate_live_session(self, session_id: str, teacher_sid: str) -> str | None:
         """
         Activates a live session, associating a teacher SID with it.
         This marks a session as active and designates a teacher.
+        Returns the session's resume token, which the teacher presents to
+        resume_live_session() after a reconnect, or None if another teacher
+        already holds the session.
         """
         if session_id not in self._live_sessions:
+            meter = UsageMeter() # CPU time of everything run for the session
             self._live_sessions[session_id] = {
                 'teacher_sid': teacher_sid,
-                'teacher_audio_track': None # This will be set when the teacher's track is received
+                'teacher_audio_track': None, # This will be set when the teacher's track is received
+                # Students can subscribe before the teacher's track arrives
+                'rooms': {MAIN_ROOM: Room(MAIN_ROOM, meter=meter)},
+                'listeners': {},
+                'side_pipelines': {},
+                'meter': meter,
+                'resume_token': secrets.token_urlsafe(16),
+                'grace_task': None,
             }
             logger.info(f"Live session '{session_id}' activated by teacher {teacher_sid}")
-        else:
-            logger.warning(f"Live session '{session_id}' already active. Teacher SID: {self._live_sessions[session_id]['teacher_sid']}")
+            return self._live_sessions[session_id]['resume_token']
+        data = self._live_sessions[session_id]
+        if data['teacher_sid'] == teacher_sid:
+            return data['resume_token']
+        logger.warning(f"Live session '{session_id}' already active. Teacher SID: {data['teacher_sid']}")
+        return None
 
     def get_live_session_teacher(self, session_id: str) -> str | None:
         """
@@ -95,12 +239,18 @@ class WebRTCManager:
         for session_id, data in self._live_sessions.items():
             if data.get('teacher_sid') == teacher_sid:
                 data['teacher_audio_track'] = track
+                # Hot-swap under the existing fan-out: listeners keep their senders untouched.
+                data['rooms'][MAIN_ROOM].set_speaker('teacher', track)
                 logger.info(f"Teacher {teacher_sid} audio track set for session {session_id}.")
                 found = True
                 break
         if not found:
             logger.warning(f"Could not find active session for teacher SID {teacher_sid} to set audio track.")
 
+    def is_teacher(self, sid: str) -> bool:
+        """Returns True if `sid` is the teacher of any active live session."""
+        return any(data['teacher_sid'] == sid for data in self._live_sessions.values())
+
     def get_teacher_audio_track(self, teacher_sid: str) -> MediaStreamTrack | None:
         """
         Retrieves the audio track for a teacher in an active session.
@@ -110,3 +260,334 @@ class WebRTCManager:
             if data.get('teacher_sid') == teacher_sid:
                 return data['teacher_audio_track']
         return None
+
+    def add_listener(self, session_id: str, sid: str, pc: RTCPeerConnection, tier: str = None):
+        """
+        Subscribes a student's PeerConnection to the session's fan-out, starting
+        in `tier` (the best tier by default). Returns the RTCRtpSender, or None
+        if the session is not active.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data:
+            return None
+        if sid in data['listeners']:
+            return data['listeners'][sid]['sender']
+        node = data['rooms'][MAIN_ROOM].node
+        tier = tier or node.default_tier
+        track = node.subscribe(tier)
+        meter = UsageMeter(parent=data['meter'])
+        egress = self._egress_track(session_id, node, track, meter)
+        sender = pc.addTrack(egress)
+        data['listeners'][sid] = {
+            'sender': sender, 'track': track, 'egress': egress, 'tier': tier, 'room': MAIN_ROOM,
+            'priority': 0, 'joined': time.time(), 'meter': meter,
+        }
+        self.egress.add_listener(session_id, sid)
+        self.adaptive_bitrate.start()
+        self.resources.start()
+        return sender
+
+    def _egress_track(self, session_id: str, node, track: MediaStreamTrack, meter: UsageMeter) -> EgressTrack:
+        """Wraps a listener's subscription so its packets go through the egress scheduler."""
+        return EgressTrack(track, self.egress, session_id, node.classifier_of(track), meter=meter)
+
+    async def set_listener_tier(self, session_id: str, sid: str, tier: str):
+        """
+        Moves a listener to another quality tier by pointing its egress track at
+        the tier's encoder. No renegotiation is needed, and the RTP timestamps
+        stay continuous (EgressTrack.replace_source).
+        """
+        data = self._live_sessions.get(session_id)
+        listener = data['listeners'].get(sid) if data else None
+        if not listener or listener['tier'] == tier:
+            return
+        node = data['rooms'][listener['room']].node
+        old_track = listener['track']
+        listener['track'] = node.subscribe(tier)
+        listener['tier'] = tier
+        listener['egress'].replace_source(listener['track'], node.classifier_of(listener['track']))
+        node.unsubscribe(old_track)
+
+    def _remove_listener(self, session_id: str, data: dict, sid: str):
+        listener = data['listeners'].pop(sid, None)
+        if listener:
+            data['rooms'][listener['room']].node.unsubscribe(listener['track'])
+            self.adaptive_bitrate.forget(session_id, sid)
+            self.egress.remove_listener(session_id, sid)
+
+    def iter_listeners(self):
+        """Yields (session_id, sid, listener) for every subscribed student."""
+        for session_id, data in list(self._live_sessions.items()):
+            for sid, listener in list(data['listeners'].items()):
+                yield session_id, sid, listener
+
+    def listener_tier_counts(self) -> dict:
+        """Returns the number of listeners per quality tier across all sessions."""
+        counts = {}
+        for data in self._live_sessions.values():
+            for room in data['rooms'].values():
+                for tier, count in room.node.listener_counts().items():
+                    counts[tier] = counts.get(tier, 0) + count
+        return counts
+
+    # --- Resource accounting and limits ---
+    def live_session_ids(self) -> list:
+        return list(self._live_sessions)
+
+    def session_full(self, session_id: str) -> bool:
+        """True if another listener would take the session over SESSION_MAX_PEER_CONNECTIONS."""
+        return not self.resources.admits_listener(session_id)
+
+    def set_listener_priority(self, session_id: str, sid: str, priority: int) -> bool:
+        """
+        Sets a listener's priority (default 0). When the session exceeds its
+        limits, listeners with the lowest priority are shed first.
+        """
+        data = self._live_sessions.get(session_id)
+        listener = data['listeners'].get(sid) if data else None
+        if not listener:
+            return False
+        listener['priority'] = int(priority)
+        return True
+
+    def add_side_pipeline(self, session_id: str, name: str, factory, priority: int = 0) -> bool:
+        """
+        Attaches an optional consumer of a session's main-room audio, such
+        as a recorder or a live analyzer. `factory(track, meter)` gets a
+        subscription to the decoded main-room audio and a UsageMeter to
+        charge its CPU time to, and returns an object with stop() (and, if
+        it buffers, `queued_frames` and `buffered_bytes` properties). Side
+        pipelines are stopped before any listener is shed when the session
+        exceeds its limits, lowest `priority` first. Returns False if the
+        session is not active or `name` is taken.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data or name in data['side_pipelines']:
+            return False
+        track = data['rooms'][MAIN_ROOM].node.subscribe_raw()
+        meter = UsageMeter(parent=data['meter'])
+        data['side_pipelines'][name] = {'pipeline': factory(track, meter), 'track': track, 'priority': priority, 'meter': meter}
+        self.resources.start()
+        logger.info(f"Side pipeline '{name}' attached to live session {session_id}.")
+        return True
+
+    def stop_side_pipeline(self, session_id: str, name: str) -> bool:
+        data = self._live_sessions.get(session_id)
+        side_pipeline = data['side_pipelines'].pop(name, None) if data else None
+        if not side_pipeline:
+            return False
+        _stop_side_pipeline(side_pipeline)
+        logger.info(f"Side pipeline '{name}' of live session {session_id} stopped.")
+        return True
+
+    async def shed_listeners(self, session_id: str, sids: list, reason: str):
+        """
+        Disconnects listeners to bring a session back within its limits:
+        their peer connections are closed, releasing everything held for
+        them, and on_listeners_shed is told so clients can be notified.
+        """
+        for sid in sids:
+            await self.close_peer_connection(sid)
+        if self.on_listeners_shed:
+            await self.on_listeners_shed(session_id, sids, reason)
+
+    def session_usage(self, session_id: str, peers: bool = True) -> dict | None:
+        """
+        Returns what a live session holds: peer connections, fan-out
+        pipelines (encoders and mixers), frames and bytes queued in its
+        tracks, cumulative CPU seconds spent in its track callbacks, and
+        approximate memory. Memory counts RESOURCE_PEER_CONNECTION_MEMORY
+        per peer connection and RESOURCE_PIPELINE_MEMORY per pipeline on top
+        of the bytes actually buffered. With `peers`, the same per teacher
+        and listener SID is included. Returns None if the session is not active.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data:
+            return None
+        speakers = {key for room in data['rooms'].values() for key in room.speakers if key != 'teacher'}
+        entries = {}
+        teacher_sid = data['teacher_sid']
+        if teacher_sid in self._peer_connections:
+            frames, size = pending_frames(data['teacher_audio_track'])
+            entries[teacher_sid] = {'role': 'teacher', 'queued_frames': frames, 'buffered_bytes': size, 'cpu_time': None}
+        for sid, listener in data['listeners'].items():
+            frames, size = pending_frames(listener['track'])
+            if sid in speakers:
+                incoming_frames, incoming_size = pending_frames(self._incoming_tracks.get(sid))
+                frames, size = frames + incoming_frames, size + incoming_size
+            entries[sid] = {
+                'role': 'listener', 'room': listener['room'], 'tier': listener['tier'],
+                'priority': listener['priority'], 'speaker': sid in speakers, 'joined': listener['joined'],
+                'queued_frames': frames, 'buffered_bytes': size, 'cpu_time': listener['meter'].cpu_time,
+            }
+        for sid, entry in entries.items():
+            has_pc = sid in self._peer_connections
+            entry['peer_connection'] = has_pc
+            entry['memory'] = entry['buffered_bytes'] + (settings.RESOURCE_PEER_CONNECTION_MEMORY if has_pc else 0)
+
+        side_pipelines = {}
+        for name, side_pipeline in data['side_pipelines'].items():
+            pipeline = side_pipeline['pipeline']
+            frames, size = pending_frames(side_pipeline['track'])
+            frames += getattr(pipeline, 'queued_frames', 0)
+            size += getattr(pipeline, 'buffered_bytes', 0)
+            side_pipelines[name] = {
+                'priority': side_pipeline['priority'], 'queued_frames': frames, 'buffered_bytes': size,
+                'memory': size + settings.RESOURCE_PIPELINE_MEMORY, 'cpu_time': side_pipeline['meter'].cpu_time,
+            }
+
+        totals = {'pipelines': 0, 'queued_frames': 0, 'buffered_bytes': 0}
+        for room in data['rooms'].values():
+            for key, value in room.usage().items():
+                totals[key] += value
+        peer_connections = sum(1 for entry in entries.values() if entry['peer_connection'])
+        queued_frames = totals['queued_frames'] + sum(entry['queued_frames'] for entry in (*entries.values(), *side_pipelines.values()))
+        buffered_bytes = totals['buffered_bytes'] + sum(entry['buffered_bytes'] for entry in (*entries.values(), *side_pipelines.values()))
+        usage = {
+            'peer_connections': peer_connections,
+            'listeners': len(data['listeners']),
+            'rooms': len(data['rooms']),
+            'pipelines': totals['pipelines'],
+            'queued_frames': queued_frames,
+            'buffered_bytes': buffered_bytes,
+            'memory': (buffered_bytes + peer_connections * settings.RESOURCE_PEER_CONNECTION_MEMORY
+                       + (totals['pipelines'] + len(side_pipelines)) * settings.RESOURCE_PIPELINE_MEMORY),
+            'cpu_time': data['meter'].cpu_time,
+            'side_pipelines': side_pipelines,
+        }
+        if peers:
+            usage['peers'] = entries
+        return usage
+
+    # --- Breakout rooms ---
+    def set_incoming_audio_track(self, sid: str, track: MediaStreamTrack):
+        """
+        Records an audio track sent by a non-teacher peer. It is heard in a room
+        once the peer is made one of that room's speakers.
+        """
+        self._incoming_tracks[sid] = track
+        for data in self._live_sessions.values():
+            for room in data['rooms'].values():
+                if sid in room.speakers:
+                    room.set_speaker(sid, track)
+
+    def create_breakout_rooms(self, session_id: str, room_ids: list, parent_id: str = MAIN_ROOM,
+                              receive_broadcast: bool = True) -> list:
+        """
+        Creates breakout rooms under `parent_id` (the main room by default).
+        Returns the IDs of the rooms that were created.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data or parent_id not in data['rooms']:
+            return []
+        parent = data['rooms'][parent_id]
+        created = []
+        for room_id in room_ids:
+            if room_id in data['rooms']:
+                continue
+            room = Room(room_id, parent=parent, receive_broadcast=receive_broadcast)
+            room.rewire() # Start with the parent's broadcast, if enabled
+            data['rooms'][room_id] = room
+            created.append(room_id)
+        logger.info(f"Created {len(created)} breakout room(s) under '{parent_id}' in session {session_id}.")
+        return created
+
+    def close_breakout_room(self, session_id: str, room_id: str) -> dict:
+        """
+        Closes a breakout room and its sub-rooms. Their listeners move to the
+        closed room's parent. Returns the applied {sid: room_id} moves.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data or room_id == MAIN_ROOM or room_id not in data['rooms']:
+            return {}
+        room = data['rooms'][room_id]
+        closing = []
+        pending = [room]
+        while pending:
+            current = pending.pop()
+            closing.append(current.room_id)
+            pending.extend(current.children.values())
+        moved = [sid for sid, listener in data['listeners'].items() if listener['room'] in closing]
+        moves = self.assign_rooms(session_id, {sid: room.parent.room_id for sid in moved})
+        room.close()
+        for closed_id in closing:
+            data['rooms'].pop(closed_id, None)
+        return moves
+
+    def assign_rooms(self, session_id: str, assignments: dict) -> dict:
+        """
+        Moves listeners between rooms: `assignments` maps SID -> room ID.
+        A move re-points the listener's egress track at the target room's
+        encoder for the listener's tier, so no PeerConnection is created,
+        nothing is renegotiated and RTP timestamps stay continuous
+        (EgressTrack.replace_source). Returns the applied {sid: room_id} moves.
+        """
+        data = self._live_sessions.get(session_id)
+        if not data:
+            return {}
+        applied = {}
+        for sid, room_id in assignments.items():
+            listener = data['listeners'].get(sid)
+            if not listener or room_id not in data['rooms'] or listener['room'] == room_id:
+                continue
+            old_node = data['rooms'][listener['room']].node
+            old_track = listener['track']
+            new_node = data['rooms'][room_id].node
+            listener['track'] = new_node.subscribe(listener['tier'])
+            listener['room'] = room_id
+            listener['egress'].replace_source(listener['track'], new_node.classifier_of(listener['track']))
+            old_node.unsubscribe(old_track)
+            applied[sid] = room_id
+        return applied
+
+    def set_room_speakers(self, session_id: str, room_id: str, speaker_sids: list) -> bool:
+        """
+        Replaces a room's speaker set (the main room's teacher slot is kept).
+        Speakers whose audio track has not arrived yet are added when it does.
+        """
+        data = self._live_sessions.get(session_id)
+        room = data['rooms'].get(room_id) if data else None
+        if not room:
+            return False
+        for key in [key for key in room.speakers if key != 'teacher' and key not in speaker_sids]:
+            room.speakers.pop(key)
+        for sid in speaker_sids:
+            # Placeholder until the speaker's track arrives (see set_incoming_audio_track)
+            room.speakers.setdefault(sid, None)
+            if self._incoming_tracks.get(sid) is not None:
+                room.speakers[sid] = self._incoming_tracks[sid]
+        room.rewire()
+        return True
+
+    def set_broadcast(self, session_id: str, enabled: bool, room_ids: list = None) -> bool:
+        """Turns the parent broadcast on or off for the given breakout rooms (all by default)."""
+        data = self._live_sessions.get(session_id)
+        if not data:
+            return False
+        for room_id, room in data['rooms'].items():
+            if room_id != MAIN_ROOM and (room_ids is None or room_id in room_ids):
+                room.set_receive_broadcast(enabled)
+        return True
+
+    def room_layout(self, session_id: str) -> dict:
+        """Returns {room_id: {'parent', 'speakers', 'listeners'}} for a live session."""
+        data = self._live_sessions.get(session_id)
+        if not data:
+            return {}
+        layout = {
+            room_id: {
+                'parent': room.parent.room_id if room.parent else None,
+                'speakers': [key for key in room.speakers if key != 'teacher'],
+                'broadcast': room.receive_broadcast if room.parent else None,
+                'listeners': [],
+            }
+            for room_id, room in data['rooms'].items()
+        }
+        for sid, listener in data['listeners'].items():
+            layout[listener['room']]['listeners'].append(sid)
+        return layout
+
+
+def _stop_side_pipeline(side_pipeline: dict):
+    side_pipeline['pipeline'].stop()
+    side_pipeline['track'].stop()
@@ -0,0 +1,267 @@
+# audiolms/live/workers.py
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+from ..config import settings
+from .media_loops import SessionRouter
+
+logger = logging.getLogger(__name__)
+
+# IPC framing between the server process and media workers:
+# a 4-byte big-endian length followed by a UTF-8 JSON message.
+_HEADER = struct.Struct('!I')
+
+
+async def _read_message(reader: asyncio.StreamReader) -> dict:
+    header = await reader.readexactly(_HEADER.size)
+    (length,) = _HEADER.unpack(header)
+    return json.loads(await reader.readexactly(length))
+
+
+async def _write_message(writer: asyncio.StreamWriter, lock: asyncio.Lock, message: dict):
+    payload = json.dumps(message).encode('utf-8')
+    async with lock:
+        writer.write(_HEADER.pack(len(payload)) + payload)
+        await writer.drain()
+
+
+class MediaWorker:
+    """
+    Runs inside a media worker process. Owns a WebRTCManager and a
+    LiveSignaling instance, executes the signaling events proxied by the
+    server process, sends Socket.IO emits back over the same connection and
+    reports its load periodically.
+
+    Messages from the server:  {'id', 'op': 'dispatch', 'event', 'sid', 'data'}
+                               {'id', 'op': 'stats'}
+                               {'id', 'op': 'resources', 'peers'}
+    Messages to the server:    {'id', 'result'} / {'id', 'error'}
+                               {'op': 'emit', 'event', 'data', 'to'}
+                               {'op': 'load', 'stats'}
+    """
+    def __init__(self, index: int, socket_path: str, count: int = 1):
+        self.index = index
+        self.socket_path = socket_path
+        self.count = count # Number of media workers on this node
+        self.manager = None
+        self.signaling = None
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._tasks = set()
+        self._done = None
+        self._cpu_sample = (time.monotonic(), time.process_time())
+        self._cpu = 0.0
+
+    async def serve(self):
+        from . import ice
+        from .egress import egress_scheduler
+        from .signaling import LiveSignaling
+        from .webrtc_manager import WebRTCManager
+
+        ice.install() # This process's aioice is not patched by the server's
+        if settings.EGRESS_NODE_RATE and self.count > 1:
+            # Processes cannot share one bucket; each worker gets an equal slice of the node rate.
+            egress_scheduler.configure(node_rate=settings.EGRESS_NODE_RATE / self.count)
+        self.manager = WebRTCManager()
+        self.signaling = LiveSignaling(self.manager, self._emit)
+        await self.manager.warm_pool()
+
+        self._done = asyncio.get_running_loop().create_future()
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        logger.info(f"Media worker {self.index} (pid {os.getpid()}) listening on {self.socket_path}")
+        async with server:
+            await self._done # Resolved when the server process disconnects
+
+    async def _handle_connection(self, reader, writer):
+        self._writer = writer
+        reporter = asyncio.create_task(self._report_load())
+        try:
+            while True:
+                message = await _read_message(reader)
+                # Requests run concurrently; the server keeps one client's events in order.
+                task = asyncio.create_task(self._handle_request(message))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.info(f"Media worker {self.index}: server process disconnected, shutting down.")
+        finally:
+            reporter.cancel()
+            if not self._done.done():
+                self._done.set_result(None)
+
+    async def _handle_request(self, message: dict):
+        try:
+            if message['op'] == 'dispatch':
+                result = await self.signaling.dispatch(message['event'], message['sid'], message.get('data'))
+            elif message['op'] == 'stats':
+                result = self.stats()
+            elif message['op'] == 'resources':
+                result = self.manager.resources.report(peers=message.get('peers', True))
+            else:
+                raise ValueError(f"Unknown op {message['op']!r}")
+            reply = {'id': message['id'], 'result': result}
+        except Exception as e:
+            logger.error(f"Media worker {self.index}: error handling {message.get('op')} {message.get('event')}: {e}")
+            reply = {'id': message['id'], 'error': str(e)}
+        await _write_message(self._writer, self._write_lock, reply)
+
+    async def _emit(self, event, data, to):
+        await _write_message(self._writer, self._write_lock, {'op': 'emit', 'event': event, 'data': data, 'to': to})
+
+    def stats(self) -> dict:
+        stats = self.manager.stats()
+        stats.update({'pid': os.getpid(), 'cpu': round(self._cpu, 3)})
+        return stats
+
+    async def _report_load(self):
+        while True:
+            await asyncio.sleep(settings.MEDIA_WORKER_REPORT_INTERVAL)
+            # CPU use since the previous report, as a fraction of one core
+            wall, cpu = time.monotonic(), time.process_time()
+            last_wall, last_cpu = self._cpu_sample
+            self._cpu = (cpu - last_cpu) / max(wall - last_wall, 1e-6)
+            self._cpu_sample = (wall, cpu)
+            await _write_message(self._writer, self._write_lock, {'op': 'load', 'stats': self.stats()})
+
+
+def _worker_main(index: int, socket_path: str, count: int = 1):
+    """Entry point of a media worker process."""
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(MediaWorker(index, socket_path, count).serve())
+
+
+class WorkerHandle:
+    """Server-side view of one media worker process and its IPC connection."""
+    def __init__(self, index: int, process, socket_path: str):
+        self.index = index
+        self.process = process
+        self.socket_path = socket_path
+        self.reader = None
+        self.writer = None
+        self.write_lock = asyncio.Lock()
+        self.pending = {} # request id -> Future
+        self.stats = {} # last load report
+        self.reader_task = None
+
+
+class MediaWorkerPool(SessionRouter):
+    """
+    SessionRouter backed by media worker processes, one per core by default.
+
+    Every peer connection, and all RTP/SRTP/Opus work for it, lives in the
+    worker owning its session; the server process only proxies signaling
+    events to that worker over a Unix socket and relays the worker's emits
+    back to Socket.IO. New sessions go to the worker reporting the lowest CPU
+    use (ties broken by connected clients). Peer connections cannot move
+    between processes, so balancing happens when sessions are placed.
+    """
+    def __init__(self, sio, count: int = None):
+        super().__init__(sio, count or settings.MEDIA_WORKERS)
+        self.workers = []
+        self._socket_dir = None
+        self._request_ids = itertools.count()
+
+    async def _start_backends(self):
+        self._socket_dir = tempfile.mkdtemp(prefix='audiolms-media-')
+        # 'spawn' so workers do not inherit the server's event loop or threads.
+        context = multiprocessing.get_context('spawn')
+        for index in range(self.count):
+            socket_path = os.path.join(self._socket_dir, f'worker-{index}.sock')
+            process = context.Process(target=_worker_main, args=(index, socket_path, self.count), name=f'audiolms-media-{index}', daemon=True)
+            process.start()
+            self.workers.append(WorkerHandle(index, process, socket_path))
+        await asyncio.gather(*(self._connect(worker) for worker in self.workers))
+        logger.info(f"Started {self.count} media worker process(es).")
+
+    async def _connect(self, worker: WorkerHandle, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                worker.reader, worker.writer = await asyncio.open_unix_connection(worker.socket_path)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                if not worker.process.is_alive() or time.monotonic() > deadline:
+                    raise RuntimeError(f"Media worker {worker.index} failed to start.")
+                await asyncio.sleep(0.05)
+        worker.reader_task = asyncio.create_task(self._read_worker(worker))
+
+    async def _read_worker(self, worker: WorkerHandle):
+        try:
+            while True:
+                message = await _read_message(worker.reader)
+                if 'id' in message:
+                    future = worker.pending.pop(message['id'], None)
+                    if future and not future.done():
+                        if 'error' in message:
+                            future.set_exception(RuntimeError(message['error']))
+                        else:
+                            future.set_result(message.get('result'))
+                elif message['op'] == 'emit':
+                    await self._sio.emit(message['event'], message['data'], to=message['to'])
+                elif message['op'] == 'load':
+                    worker.stats = message['stats']
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.error(f"Lost connection to media worker {worker.index}.")
+        finally:
+            for future in worker.pending.values():
+                if not future.done():
+                    future.set_exception(RuntimeError(f"Media worker {worker.index} is gone."))
+            worker.pending.clear()
+
+    async def _stop_backends(self):
+        for worker in self.workers:
+            if worker.writer:
+                worker.writer.close() # Worker shuts down when the connection closes
+        for worker in self.workers:
+            await asyncio.get_running_loop().run_in_executor(None, worker.process.join, 5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            if worker.reader_task:
+                worker.reader_task.cancel()
+        self.workers = []
+        if self._socket_dir:
+            shutil.rmtree(self._socket_dir, ignore_errors=True)
+
+    async def _request(self, worker: WorkerHandle, message: dict):
+        message['id'] = next(self._request_ids)
+        future = asyncio.get_running_loop().create_future()
+        worker.pending[message['id']] = future
+        await _write_message(worker.writer, worker.write_lock, message)
+        return await future
+
+    async def _call(self, index: int, event: str, sid: str, data=None):
+        return await self._request(self.workers[index], {'op': 'dispatch', 'event': event, 'sid': sid, 'data': data})
+
+    async def _resource_report(self, index: int, peers: bool) -> dict:
+        return await self._request(self.workers[index], {'op': 'resources', 'peers': peers})
+
+    def _least_loaded(self) -> int:
+        clients = self.load()
+
+        def score(index):
+            # CPU bucketed to 10% of a core so small fluctuations don't dominate placement
+            cpu = self.workers[index].stats.get('cpu', 0.0) if self.workers else 0.0
+            return (round(cpu, 1), clients[index])
+
+        return min(range(self.count), key=score)
+
+    def load_report(self) -> list:
+        report = super().load_report()
+        for entry, worker in zip(report, self.workers):
+            entry.update({
+                'pid': worker.process.pid,
+                'alive': worker.process.is_alive(),
+                'cpu': worker.stats.get('cpu'),
+                'peer_connections': worker.stats.get('peer_connections'),
+                'live_sessions': worker.stats.get('live_sessions'),
+                'egress': worker.stats.get('egress'),
+            })
+        return report
@@ -3,28 +3,64 @@
 # e.g., using SQLAlchemy or another ORM.
 # For this demo, it remains a placeholder.
 
+# MIME types of the audio formats audiolms stores, by file extension
+AUDIO_MIME_TYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav',
+    '.ogg': 'audio/ogg',
+    '.oga': 'audio/ogg',
+    '.opus': 'audio/ogg; codecs=opus',
+    '.m4a': 'audio/mp4',
+    '.aac': 'audio/aac',
+    '.flac': 'audio/flac',
+    '.webm': 'audio/webm',
+}
+
+
+def guess_mime_type(filename: str) -> str:
+    """Returns the MIME type for an audio file name, defaulting to audio/mpeg."""
+    extension = filename[filename.rfind('.'):].lower() if '.' in filename else ''
+    return AUDIO_MIME_TYPES.get(extension, 'audio/mpeg')
+
+
 class AudioRecord:
     """
     Conceptual model for an audio recording in the LMS.
     In a real application, this would map to a database table.
     """
-    def __init__(self, id: str, name: str, url: str, duration: float = 0.0):
+    def __init__(self, id: str, name: str, url: str, duration: float = 0.0,
+                 size: int = 0, sha256: str = None, course_id: str = None,
+                 mime_type: str = None, version: int = 1, analysis: dict = None):
         self.id = id
         self.name = name
         self.url = url
         self.duration = duration
+        self.size = size # bytes
+        self.sha256 = sha256 # hex digest of the file content
+        self.course_id = course_id
+        self.mime_type = mime_type or guess_mime_type(url)
+        self.version = version # bumped whenever the record's file or metadata changes
+        self.analysis = analysis # chapters and seek index, see analysis.analyze_file()
 
     def to_dict(self):
         return {
             "id": self.id,
             "name": self.name,
             "url": self.url,
-            "duration": self.duration
+            "duration": self.duration,
+            "size": self.size,
+            "sha256": self.sha256,
+            "course_id": self.course_id,
+            "mime_type": self.mime_type,
+            "version": self.version,
+            "analysis": self.analysis,
         }
 
     @classmethod
     def from_dict(cls, data: dict):
-        return cls(data['id'], data['name'], data['url'], data.get('duration', 0.0))
+        return cls(data['id'], data['name'], data['url'], data.get('duration', 0.0),
+                   data.get('size', 0), data.get('sha256'), data.get('course_id'),
+                   data.get('mime_type'), data.get('version', 1), data.get('analysis'))
 
 # Example usage (not used in the current demo, but for illustration)
 # def get_all_audio_records():
@@ -1,7 +1,4 @@
 # audiolms/recorder.py
-import wavio
-import sounddevice as sd
-import numpy as np
 import logging
 
 logger = logging.getLogger(__name__)
@@ -13,6 +10,11 @@ def record_audio(duration_seconds: int = 5, filename: str = "output.wav", sample
     This is a conceptual function for server-side recording, not browser-based.
     """
     try:
+        # Imported here rather than at module level: sounddevice loads PortAudio on import,
+        # which is slow and fails outright on servers without audio devices.
+        import sounddevice as sd
+        import wavio
+
         logger.info(f"Recording audio for {duration_seconds} seconds to {filename}...")
         # Record audio
         recording = sd.rec(int(duration_seconds * samplerate), samplerate=samplerate, channels=1, dtype='int16')
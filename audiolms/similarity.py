@@ -0,0 +1,275 @@
+# audiolms/similarity.py
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+from .analysis import open_source
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Spectrogram frames: 64 ms windows every 32 ms, at any sample rate
+WINDOW_SECONDS = 0.064
+HOP_SECONDS = 0.032
+# Peaks are picked between these frequencies and quantized to FREQUENCY_STEP Hz,
+# so files at different sample rates produce the same hashes.
+MIN_FREQUENCY = 150.0
+MAX_FREQUENCY = 4000.0
+FREQUENCY_STEP = 4000.0 / 256
+# Strongest spectral peaks kept per frame, and the neighbourhood (frames, bins)
+# in which a peak must be the maximum
+PEAKS_PER_FRAME = 5
+PEAK_NEIGHBOURHOOD = (3, 5)
+# Each anchor peak is paired with up to FAN_OUT later peaks at most
+# MAX_DELTA_FRAMES away in time and MAX_DELTA_BANDS away in frequency.
+FAN_OUT = 8
+MAX_DELTA_FRAMES = 63
+MAX_DELTA_BANDS = 96
+# Rows per lookup query (stays under SQLite's host parameter limit)
+_LOOKUP_CHUNK = 500
+
+
+def _bands_for(sample_rate: int, window: int) -> tuple:
+    frequencies = np.fft.rfftfreq(window, 1 / sample_rate)
+    low, high = np.searchsorted(frequencies, [MIN_FREQUENCY, min(MAX_FREQUENCY, sample_rate / 2)])
+    return low, high, (frequencies[low:high] / FREQUENCY_STEP).astype(np.int32)
+
+
+def _block_peaks(spectrum: np.ndarray) -> tuple:
+    """
+    Returns (frame, bin) indexes of the landmark peaks of a log-magnitude
+    spectrogram block: points that are the maximum of their neighbourhood,
+    keeping the PEAKS_PER_FRAME strongest per frame. Fully vectorized.
+    """
+    frames, bins = spectrum.shape
+    time_radius, frequency_radius = PEAK_NEIGHBOURHOOD
+    padded = np.pad(spectrum, ((time_radius, time_radius), (frequency_radius, frequency_radius)), constant_values=-np.inf)
+    # Separable maximum filter: over frequency, then over time.
+    local = np.lib.stride_tricks.sliding_window_view(padded, 2 * frequency_radius + 1, axis=1).max(axis=2)
+    local = np.lib.stride_tricks.sliding_window_view(local, 2 * time_radius + 1, axis=0).max(axis=2)
+    # Ignore peaks barely above the frame's typical level (noise floor)
+    floor = np.median(spectrum, axis=1, keepdims=True) + 1.0
+    candidates = np.where((spectrum == local) & (spectrum > floor), spectrum, -np.inf)
+    keep = min(PEAKS_PER_FRAME, bins)
+    strongest = np.argpartition(-candidates, keep - 1, axis=1)[:, :keep]
+    rows = np.repeat(np.arange(frames), keep)
+    columns = strongest.reshape(-1)
+    valid = np.isfinite(candidates[rows, columns])
+    return rows[valid], columns[valid]
+
+
+def extract_peaks(path: str) -> np.ndarray:
+    """
+    Streams a file and returns its landmark peaks as an (n, 2) int32 array of
+    (frame, frequency band), sorted by frame. Each decoded block is framed,
+    transformed and peak-picked as one batch.
+    """
+    source = open_source(path)
+    rate = source.sample_rate
+    window = int(round(WINDOW_SECONDS * rate))
+    hop = int(round(HOP_SECONDS * rate))
+    taper = np.hanning(window).astype(np.float32)
+    low, high, bands = _bands_for(rate, window)
+
+    leftover = np.zeros(0, dtype=np.float32)
+    first_frame = 0
+    peaks = []
+    for block in source.blocks():
+        samples = np.concatenate((leftover, block.astype(np.float32, copy=False)))
+        if len(samples) < window:
+            leftover = samples
+            continue
+        frames = np.lib.stride_tricks.sliding_window_view(samples, window)[::hop]
+        leftover = samples[len(frames) * hop:]
+        spectrum = np.log(np.abs(np.fft.rfft(frames * taper, axis=1))[:, low:high] + 1e-6)
+        rows, columns = _block_peaks(spectrum)
+        peaks.append(np.column_stack((rows + first_frame, bands[columns])).astype(np.int32))
+        first_frame += len(frames)
+    if not peaks:
+        return np.zeros((0, 2), dtype=np.int32)
+    return np.concatenate(peaks)
+
+
+def landmark_hashes(peaks: np.ndarray) -> tuple:
+    """
+    Pairs each peak with the next FAN_OUT peaks inside its target zone and
+    returns (hashes, anchor frames) as int64/int32 arrays. A hash packs the
+    anchor band, the target band and their time difference:
+
+        anchor band (8 bits) | target band (8 bits) | delta frames (6 bits)
+    """
+    hashes, anchors = [], []
+    frames, bands = peaks[:, 0], peaks[:, 1]
+    for step in range(1, FAN_OUT + 1):
+        if step >= len(peaks):
+            break
+        delta = frames[step:] - frames[:-step]
+        delta_bands = bands[step:] - bands[:-step]
+        valid = (delta > 0) & (delta <= MAX_DELTA_FRAMES) & (np.abs(delta_bands) <= MAX_DELTA_BANDS)
+        anchor_bands = bands[:-step][valid].astype(np.int64)
+        target_bands = bands[step:][valid].astype(np.int64)
+        hashes.append((anchor_bands & 0xFF) << 14 | (target_bands & 0xFF) << 6 | delta[valid].astype(np.int64))
+        anchors.append(frames[:-step][valid])
+    if not hashes:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+    return np.concatenate(hashes), np.concatenate(anchors).astype(np.int32)
+
+
+def fingerprint_file(path: str) -> tuple:
+    """Returns (hashes, anchor frames) of a file. Runs in worker processes."""
+    return landmark_hashes(extract_peaks(path))
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_recordings (
+    key INTEGER PRIMARY KEY,
+    record_id TEXT NOT NULL UNIQUE
+);
+-- Inverted index: landmark hash -> where it occurs. Clustered by hash so a
+-- lookup reads one contiguous range.
+CREATE TABLE IF NOT EXISTS fingerprints (
+    hash INTEGER NOT NULL,
+    recording INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    PRIMARY KEY (hash, recording, frame)
+) WITHOUT ROWID;
+"""
+
+
+class SimilarityIndex:
+    """
+    On-disk inverted index of landmark fingerprints (SQLite).
+
+    Recordings are added incrementally with add(); re-adding a record
+    replaces its fingerprints. query() fingerprints a clip, looks up its
+    hashes and votes on (recording, time offset) pairs: a repeated segment
+    shows up as many hashes agreeing on the same offset, which is robust to
+    noise and to the clip being a small part of a long recording.
+    """
+    def __init__(self, path: str = None):
+        self.path = path or settings.SIMILARITY_INDEX_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def indexed_ids(self) -> set:
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT record_id FROM indexed_recordings")}
+
+    def add(self, record_id: str, hashes: np.ndarray, frames: np.ndarray):
+        """Stores a recording's fingerprints in one transaction, replacing any previous ones."""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR IGNORE INTO indexed_recordings (record_id) VALUES (?)", (record_id,))
+            key = self._conn.execute("SELECT key FROM indexed_recordings WHERE record_id = ?", (record_id,)).fetchone()[0]
+            self._conn.execute("DELETE FROM fingerprints WHERE recording = ?", (key,))
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO fingerprints (hash, recording, frame) VALUES (?, ?, ?)",
+                zip(hashes.tolist(), [key] * len(hashes), frames.tolist()),
+            )
+
+    def remove(self, record_id: str):
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT key FROM indexed_recordings WHERE record_id = ?", (record_id,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM fingerprints WHERE recording = ?", row)
+                self._conn.execute("DELETE FROM indexed_recordings WHERE key = ?", row)
+
+    def _lookup(self, hashes: np.ndarray) -> np.ndarray:
+        """Returns the (hash, recording, frame) rows of all occurrences of `hashes`."""
+        unique = np.unique(hashes).tolist()
+        rows = []
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_CHUNK):
+                chunk = unique[start:start + _LOOKUP_CHUNK]
+                rows += self._conn.execute(
+                    f"SELECT hash, recording, frame FROM fingerprints WHERE hash IN ({', '.join('?' * len(chunk))})", chunk,
+                ).fetchall()
+        return np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+    def query(self, path: str, limit: int = 10, min_matches: int = None) -> list:
+        """
+        Returns recordings containing the clip at `path`, best first:
+        [{'record_id', 'offset_ms' (where the clip starts), 'matches'}, ...].
+        """
+        min_matches = min_matches or settings.SIMILARITY_MIN_MATCHES
+        hashes, frames = fingerprint_file(path)
+        if not len(hashes):
+            return []
+        found = self._lookup(hashes)
+        if not len(found):
+            return []
+
+        # Join query occurrences to index occurrences on hash (sort + searchsorted):
+        # index row i matches query positions first[i] .. last[i] - 1.
+        order = np.argsort(hashes, kind='stable')
+        sorted_hashes, sorted_frames = hashes[order], frames[order]
+        first = np.searchsorted(sorted_hashes, found[:, 0], side='left')
+        counts = np.searchsorted(sorted_hashes, found[:, 0], side='right') - first
+        rows = np.repeat(np.arange(len(found)), counts)
+        within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        offsets = found[rows, 2] - sorted_frames[np.repeat(first, counts) + within]
+
+        # Vote on (recording, offset) packed into one int64; neighbouring offsets
+        # add their votes to absorb one frame of jitter.
+        packed = found[rows, 1] << 32 | (offsets + (1 << 31))
+        keys, votes = np.unique(packed, return_counts=True)
+        scores = votes.copy()
+        for shift in (-1, 1):
+            position = np.minimum(np.searchsorted(keys, keys + shift), len(keys) - 1)
+            hit = keys[position] == keys + shift
+            scores[hit] += votes[position[hit]]
+        recordings = keys >> 32
+        offsets = (keys & 0xFFFFFFFF) - (1 << 31)
+
+        # Best offset per recording
+        order = np.lexsort((-scores, recordings))
+        first_of_recording = np.concatenate(([True], recordings[order][1:] != recordings[order][:-1]))
+        best = {
+            int(recordings[i]): (int(offsets[i]), int(scores[i]))
+            for i in order[first_of_recording] if scores[i] >= min_matches
+        }
+        if not best:
+            return []
+        with self._lock:
+            names = dict(self._conn.execute(
+                f"SELECT key, record_id FROM indexed_recordings WHERE key IN ({', '.join('?' * len(best))})", list(best),
+            ).fetchall())
+        results = [
+            {'record_id': names[recording], 'offset_ms': int(round(max(offset, 0) * HOP_SECONDS * 1000)), 'matches': score}
+            for recording, (offset, score) in best.items()
+        ]
+        results.sort(key=lambda result: result['matches'], reverse=True)
+        return results[:limit]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def index_catalog(catalog, index: SimilarityIndex, workers: int = None, reindex: bool = False) -> int:
+    """
+    Fingerprints every catalog recording not yet in the index (all of them
+    with reindex=True) on a pool of worker processes, inserting each result
+    as it arrives. Returns the number of recordings indexed.
+    """
+    done = set() if reindex else index.indexed_ids()
+    pending = [(record_id, url) for record_id, url in catalog.record_urls() if record_id not in done]
+    logger.info(f"Fingerprinting {len(pending)} recording(s)")
+    indexed = 0
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(workers or settings.ANALYSIS_WORKERS, mp_context=context) as pool:
+        futures = {pool.submit(fingerprint_file, url): record_id for record_id, url in pending if os.path.exists(url)}
+        for future in concurrent.futures.as_completed(futures):
+            record_id = futures[future]
+            try:
+                index.add(record_id, *future.result())
+                indexed += 1
+            except Exception as e:
+                logger.error(f"Fingerprinting {record_id} failed: {e}")
+    return indexed
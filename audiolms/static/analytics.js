@@ -0,0 +1,89 @@
+// audiolms/static/analytics.js - playback beacons for recording players
+// Reports play, seek and progress events of every <audio> that carries a
+// data-record-id (itself or on an enclosing element) to /analytics/beacon.
+// Events are queued and sent in batches with navigator.sendBeacon, every
+// FLUSH_MS and when the page is hidden, so listening costs a few requests per
+// minute however many events it produces.
+(function() {
+    var ENDPOINT = document.currentScript && document.currentScript.dataset.endpoint || '/analytics/beacon';
+    var FLUSH_MS = 15000;
+    var HEARTBEAT_S = 10; // Longest interval covered by one progress event
+    var MAX_QUEUE = 500;
+    var queue = [];
+
+    function push(event) {
+        if (queue.length >= MAX_QUEUE) {
+            flush();
+        }
+        queue.push(event);
+    }
+
+    function flush() {
+        if (!queue.length) {
+            return;
+        }
+        var body = JSON.stringify({events: queue});
+        queue = [];
+        if (navigator.sendBeacon) {
+            navigator.sendBeacon(ENDPOINT, new Blob([body], {type: 'application/json'}));
+        } else {
+            fetch(ENDPOINT, {method: 'POST', body: body, keepalive: true, headers: {'Content-Type': 'application/json'}});
+        }
+    }
+
+    function track(audio, recordId) {
+        var from = null; // Media time playing continuously since the last report
+        var last = 0; // currentTime at the last timeupdate, i.e. before any seek
+
+        function report(to) {
+            if (from !== null && to > from) {
+                push({r: recordId, t: 'progress', from: from, to: to});
+            }
+            from = audio.paused || audio.seeking ? null : audio.currentTime;
+        }
+
+        audio.addEventListener('play', function() {
+            push({r: recordId, t: 'play'});
+            from = last = audio.currentTime;
+        });
+        audio.addEventListener('timeupdate', function() {
+            if (audio.seeking) {
+                return;
+            }
+            last = audio.currentTime;
+            if (from !== null && last - from >= HEARTBEAT_S) {
+                report(last);
+            }
+        });
+        audio.addEventListener('seeking', function() {
+            // currentTime is already the seek target; report what was played before it
+            report(last);
+            push({r: recordId, t: 'seek'});
+        });
+        audio.addEventListener('seeked', function() {
+            last = audio.currentTime;
+            from = audio.paused ? null : last;
+        });
+        audio.addEventListener('pause', function() {
+            report(audio.currentTime);
+        });
+        audio.addEventListener('ended', function() {
+            report(audio.currentTime);
+        });
+    }
+
+    document.querySelectorAll('audio').forEach(function(audio) {
+        var owner = audio.closest('[data-record-id]');
+        if (owner) {
+            track(audio, owner.dataset.recordId);
+        }
+    });
+
+    setInterval(flush, FLUSH_MS);
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flush();
+        }
+    });
+    window.addEventListener('pagehide', flush);
+})();
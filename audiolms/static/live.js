@@ -0,0 +1,329 @@
+// audiolms/static/live.js - browser side of the live demo (Socket.IO signaling + WebRTC)
+var socket = io();
+var peerConnection = null; // Our RTCPeerConnection object
+var localStream = null; // Our local microphone stream
+var currentSessionId = null;
+var userRole = null; // 'teacher' or 'student'
+var resumeToken = null; // Lets a teacher take their session back after a reconnect
+var disconnectTimer = null; // Pending check of a 'disconnected' PeerConnection
+// How long a PeerConnection may stay 'disconnected' (which often recovers by itself) before it is given up
+var DISCONNECT_TIMEOUT_MS = 5000;
+
+function logMessage(msg) {
+    var messagesDiv = document.getElementById('messages');
+    var p = document.createElement('p');
+    p.textContent = new Date().toLocaleTimeString() + ': ' + msg;
+    messagesDiv.appendChild(p);
+    messagesDiv.scrollTop = messagesDiv.scrollHeight; // Auto-scroll
+}
+
+socket.on('connect', function() {
+    logMessage('Connected to signaling server');
+    document.getElementById('live-status').textContent = 'Live Session Status: Connected to Server';
+    if (userRole === 'teacher' && currentSessionId && resumeToken) {
+        // Reconnected while teaching: resume the session instead of restarting it,
+        // so students stay connected.
+        resumeLiveSession();
+    }
+});
+
+socket.on('disconnect', function() {
+    logMessage('Disconnected from signaling server');
+    document.getElementById('live-status').textContent = 'Live Session Status: Disconnected';
+    if (peerConnection) {
+        peerConnection.close();
+        peerConnection = null;
+    }
+    if (localStream) {
+        localStream.getTracks().forEach(track => track.stop());
+        localStream = null;
+    }
+    const remoteAudio = document.getElementById('remoteAudio');
+    remoteAudio.srcObject = null;
+});
+
+socket.on('error', function(data) {
+    logMessage('Server Error: ' + data.message);
+});
+
+// WebRTC Signaling Handlers
+socket.on('offer', async function(data) {
+    logMessage('Received offer from server (as student/listener)');
+    if (!peerConnection) {
+        logMessage('Creating new PeerConnection for incoming offer...');
+        await createPeerConnection(); // Ensure PC exists
+    }
+    await peerConnection.setRemoteDescription(new RTCSessionDescription(data));
+    const answer = await peerConnection.createAnswer();
+    await peerConnection.setLocalDescription(answer);
+    socket.emit('answer', {
+        sdp: peerConnection.localDescription.sdp,
+        type: peerConnection.localDescription.type
+    });
+    logMessage('Sent answer to server.');
+});
+
+socket.on('answer', async function(data) {
+    logMessage('Received answer from server (as teacher/speaker)');
+    if (peerConnection && peerConnection.currentLocalDescription) {
+        await peerConnection.setRemoteDescription(new RTCSessionDescription(data));
+        logMessage('Remote description (answer) set.');
+    } else {
+        logMessage('Warning: PeerConnection not ready for answer.');
+    }
+});
+
+socket.on('ice_candidate', async function(data) {
+    logMessage('Received ICE candidate from server');
+    if (peerConnection) {
+        try {
+            await peerConnection.addIceCandidate(new RTCIceCandidate(data));
+            logMessage('Added ICE candidate.');
+        } catch (e) {
+            logMessage('Error adding ICE candidate: ' + e);
+        }
+    }
+});
+
+// Live Session Management
+socket.on('live_session_started', function(data) {
+    logMessage(`Live session ${data.session_id} started successfully!`);
+    resumeToken = data.resume_token;
+    document.getElementById('live-status').textContent = `Live Session Status: Active (Session ID: ${data.session_id}, Role: Teacher)`;
+});
+
+socket.on('live_session_resumed', function(data) {
+    logMessage(`Live session ${data.session_id} resumed.`);
+    document.getElementById('live-status').textContent = `Live Session Status: Active (Session ID: ${data.session_id}, Role: Teacher)`;
+});
+
+socket.on('resume_failed', function(data) {
+    logMessage(`Could not resume live session ${data.session_id}; starting it again.`);
+    resumeToken = null;
+    startLiveSession('teacher');
+});
+
+socket.on('teacher_reconnecting', function(data) {
+    logMessage('Teacher connection lost, waiting for them to reconnect...');
+});
+
+socket.on('teacher_resumed', function(data) {
+    logMessage('Teacher reconnected.');
+});
+
+socket.on('live_session_ended', function(data) {
+    logMessage(`Live session ${data.session_id} ended${data.reason ? ` (${data.reason})` : ''}.`);
+    document.getElementById('live-status').textContent = 'Live Session Status: Ended';
+});
+
+socket.on('room_changed', function(data) {
+    // The server re-pointed our existing audio stream; nothing to renegotiate.
+    logMessage(`Moved to room ${data.room_id}.`);
+});
+
+socket.on('breakout_rooms_created', function(data) {
+    logMessage(`Breakout rooms created: ${data.rooms.join(', ')}`);
+});
+
+socket.on('live_session_joined', function(data) {
+    logMessage(`Joined live session ${data.session_id}. Teacher SID: ${data.teacher_sid}`);
+    document.getElementById('live-status').textContent = `Live Session Status: Listening (Session ID: ${data.session_id}, Role: Student)`;
+});
+
+
+async function createPeerConnection() {
+    if (peerConnection) {
+        logMessage('Existing PeerConnection found, closing before creating new.');
+        peerConnection.close();
+    }
+    peerConnection = new RTCPeerConnection({
+        iceServers: [
+            { urls: 'stun:stun.l.google.com:19302' } // Google's public STUN server
+        ]
+    });
+    const pc = peerConnection;
+
+    // Handle ICE candidates generated by our local peer
+    peerConnection.onicecandidate = (event) => {
+        if (event.candidate) {
+            logMessage('Gathering ICE candidate.');
+            socket.emit('ice_candidate', {
+                candidate: event.candidate.candidate,
+                sdpMid: event.candidate.sdpMid,
+                sdpMLineIndex: event.candidate.sdpMLineIndex
+            });
+        }
+    };
+
+    // Handle incoming remote tracks (e.g., teacher's audio for students)
+    peerConnection.ontrack = (event) => {
+        logMessage(`Received remote track: ${event.track.kind}`);
+        if (event.track.kind === 'audio') {
+            const remoteAudio = document.getElementById('remoteAudio');
+            if (remoteAudio.srcObject !== event.streams[0]) {
+                remoteAudio.srcObject = event.streams[0];
+                logMessage('Remote audio stream attached to player.');
+            }
+        }
+    };
+
+    // 'failed' is final; 'disconnected' often recovers by itself, so it only counts once it lasts
+    peerConnection.onconnectionstatechange = () => {
+        if (pc !== peerConnection) {
+            return; // Already replaced
+        }
+        logMessage(`PeerConnection state changed: ${pc.connectionState}`);
+        clearTimeout(disconnectTimer);
+        disconnectTimer = null;
+        if (pc.connectionState === 'failed') {
+            peerConnectionLost();
+        } else if (pc.connectionState === 'disconnected') {
+            disconnectTimer = setTimeout(() => {
+                if (pc === peerConnection && pc.connectionState === 'disconnected') {
+                    peerConnectionLost();
+                }
+            }, DISCONNECT_TIMEOUT_MS);
+        }
+    };
+
+    logMessage('New RTCPeerConnection created.');
+}
+
+function peerConnectionLost() {
+    if (userRole === 'teacher' && resumeToken) {
+        // Keep the session: resume now if signaling is still up, otherwise on reconnect.
+        // The server replaces its side of the connection when the resume arrives.
+        logMessage('PeerConnection lost. Resuming the live session.');
+        if (socket.connected) {
+            resumeLiveSession();
+        }
+        return;
+    }
+    logMessage('PeerConnection failed or stayed disconnected. Attempting to clean up.');
+    stopLiveSession();
+}
+
+async function startLiveSession(role) {
+    userRole = role;
+    currentSessionId = document.getElementById('sessionIdInput').value;
+    if (!currentSessionId) {
+        logMessage('Please enter a Session ID.');
+        return;
+    }
+    logMessage(`Attempting to start live session as ${userRole} for session ID: ${currentSessionId}`);
+
+    try {
+        localStream = await navigator.mediaDevices.getUserMedia({ audio: true, video: false });
+        logMessage('Microphone access granted.');
+
+        await createPeerConnection();
+        localStream.getTracks().forEach(track => {
+            peerConnection.addTrack(track, localStream);
+            logMessage(`Added local ${track.kind} track to PeerConnection.`);
+        });
+
+        // Announce the session before the offer so the server can place this
+        // connection on the media loop that owns the session.
+        socket.emit('start_live_session', { session_id: currentSessionId, role: userRole });
+
+        const offer = await peerConnection.createOffer();
+        await peerConnection.setLocalDescription(offer);
+        logMessage('Created and set local offer.');
+
+        socket.emit('offer', {
+            sdp: peerConnection.localDescription.sdp,
+            type: peerConnection.localDescription.type,
+            session_id: currentSessionId
+        });
+        logMessage('Sent offer to signaling server.');
+
+    } catch (e) {
+        logMessage('Error starting live session: ' + e.message);
+        console.error('Error starting live session:', e);
+    }
+}
+
+async function resumeLiveSession() {
+    logMessage(`Resuming live session ${currentSessionId}...`);
+    try {
+        localStream = await navigator.mediaDevices.getUserMedia({ audio: true, video: false });
+        await createPeerConnection();
+        localStream.getTracks().forEach(track => peerConnection.addTrack(track, localStream));
+
+        socket.emit('resume_live_session', { session_id: currentSessionId, resume_token: resumeToken });
+
+        const offer = await peerConnection.createOffer();
+        await peerConnection.setLocalDescription(offer);
+        socket.emit('offer', {
+            sdp: peerConnection.localDescription.sdp,
+            type: peerConnection.localDescription.type,
+            session_id: currentSessionId
+        });
+        logMessage('Sent offer to resume session.');
+    } catch (e) {
+        logMessage('Error resuming live session: ' + e.message);
+        console.error('Error resuming live session:', e);
+    }
+}
+
+async function joinLiveSession(role) {
+    userRole = role;
+    currentSessionId = document.getElementById('sessionIdInput').value;
+    if (!currentSessionId) {
+        logMessage('Please enter a Session ID.');
+        return;
+    }
+    logMessage(`Attempting to join live session as ${userRole} for session ID: ${currentSessionId}`);
+
+    try {
+        await createPeerConnection();
+        // Join first so the server adds the teacher's track before answering our offer.
+        socket.emit('join_live_session', { session_id: currentSessionId, role: userRole });
+
+        // For a student joining, we create an offer to signal we are ready to receive audio.
+        // The server will then add the teacher's track to our PC.
+        const offer = await peerConnection.createOffer({
+            offerToReceiveAudio: true,
+            offerToReceiveVideo: false // Ensure only audio is requested
+        });
+        await peerConnection.setLocalDescription(offer);
+        logMessage('Created and set local offer for joining.');
+
+        socket.emit('offer', {
+            sdp: peerConnection.localDescription.sdp,
+            type: peerConnection.localDescription.type,
+            session_id: currentSessionId
+        });
+        logMessage('Sent offer to signaling server to join.');
+
+    } catch (e) {
+        logMessage('Error joining live session: ' + e.message);
+        console.error('Error joining live session:', e);
+    }
+}
+
+function stopLiveSession() {
+    logMessage('Stopping live session and cleaning up.');
+    if (peerConnection) {
+        peerConnection.close();
+        peerConnection = null;
+    }
+    if (localStream) {
+        localStream.getTracks().forEach(track => track.stop());
+        localStream = null;
+    }
+    const remoteAudio = document.getElementById('remoteAudio');
+    remoteAudio.srcObject = null;
+    document.getElementById('live-status').textContent = 'Live Session Status: Inactive';
+    currentSessionId = null;
+    userRole = null;
+    resumeToken = null;
+    logMessage('Clean up complete.');
+    // Optionally, emit a 'leave_session' event to the server
+    // socket.emit('leave_session', { session_id: currentSessionId });
+}
+
+function recordServerAudio() {
+    logMessage('Server-side recording not implemented in this browser demo. This button is conceptual for server-side mic capture.');
+    // In a real scenario, this would trigger a Flask route that uses sounddevice on the server.
+}
@@ -14,21 +14,70 @@ class AudioStorage:
         self.s3_bucket_name = s3_bucket_name
         # self.s3_client = boto3.client('s3') if s3_bucket_name else None # Uncomment if using S3
         os.makedirs(self.local_base_path, exist_ok=True)
+        # Called as hook(file_path, course_id) after a file is stored locally,
+        # e.g. analysis.AnalysisQueue.submit to build its chapter/seek index.
+        self.post_save_hooks = []
 
-    def save_audio_local(self, file_content: bytes, filename: str) -> str:
+    def _run_post_save_hooks(self, file_path: str, course_id: str = None):
+        for hook in self.post_save_hooks:
+            try:
+                hook(file_path, course_id)
+            except Exception as e:
+                logger.error(f"Post-save hook {hook} failed for {file_path}: {e}")
+
+    def course_path(self, course_id: str) -> str:
+        """
+        Returns the directory holding a course's recordings.
+        Raises ValueError for IDs that would escape the storage directory.
+        """
+        if not course_id or course_id in ('.', '..') or os.path.basename(course_id) != course_id:
+            raise ValueError(f"Invalid course ID: {course_id!r}")
+        return os.path.join(self.local_base_path, course_id)
+
+    def _local_directory(self, course_id: str = None) -> str:
+        if course_id is None:
+            return self.local_base_path
+        directory = self.course_path(course_id)
+        os.makedirs(directory, exist_ok=True)
+        return directory
+
+    def save_audio_local(self, file_content: bytes, filename: str, course_id: str = None) -> str:
         """
-        Saves audio file content to local storage.
+        Saves audio file content to local storage, in the course's directory
+        if a course ID is given.
         Returns the full path to the saved file.
         """
-        file_path = os.path.join(self.local_base_path, filename)
+        file_path = os.path.join(self._local_directory(course_id), filename)
         try:
             with open(file_path, 'wb') as f:
                 f.write(file_content)
             logger.info(f"Audio file saved locally: {file_path}")
-            return file_path
         except Exception as e:
             logger.error(f"Error saving audio file locally {filename}: {e}")
             raise
+        self._run_post_save_hooks(file_path, course_id)
+        return file_path
+
+    def copy_audio_local(self, source_path: str, filename: str, course_id: str = None) -> str:
+        """
+        Copies an existing audio file into local storage without reading it
+        into memory (the kernel copies it directly where supported). The copy
+        is written under a temporary name and renamed, so an interrupted copy
+        never leaves a truncated file under the final name.
+        Returns the full path to the stored file.
+        """
+        import shutil # Deferred: only the import paths copy files
+        file_path = os.path.join(self._local_directory(course_id), filename)
+        partial_path = file_path + '.part'
+        try:
+            shutil.copyfile(source_path, partial_path)
+            os.replace(partial_path, file_path)
+            logger.debug(f"Audio file copied locally: {source_path} -> {file_path}")
+        except Exception as e:
+            logger.error(f"Error copying audio file {source_path} to {file_path}: {e}")
+            raise
+        self._run_post_save_hooks(file_path, course_id)
+        return file_path
 
     def save_audio_s3(self, file_content: bytes, filename: str) -> str:
         """
@@ -51,6 +100,25 @@ class AudioStorage:
             logger.error(f"Error uploading audio file to S3 {filename}: {e}")
             raise
 
+    def list_course_files(self, course_id: str) -> list:
+        """
+        Returns (name, path) for every recording of a course, sorted by name.
+        Raises FileNotFoundError if the course has no directory.
+        """
+        with os.scandir(self.course_path(course_id)) as entries:
+            files = [(entry.name, entry.path) for entry in entries if entry.is_file()]
+        return sorted(files)
+
+    def export_course_zip(self, course_id: str):
+        """
+        Returns a StoredZipStream of a course's recordings, placed in a folder
+        named after the course. Nothing is built until it is iterated.
+        """
+        from .export import StoredZipStream # Deferred: hashlib/zlib are only needed for exports
+        files = [(f"{course_id}/{name}", path) for name, path in self.list_course_files(course_id)]
+        logger.info(f"Exporting {len(files)} recording(s) of course {course_id}")
+        return StoredZipStream(files)
+
 # You can instantiate this in your main app or pass it around
 # For demo purposes, we'll use simple functions directly
 def save_audio_local(file_content: bytes, filename: str) -> str:
@@ -0,0 +1,354 @@
+# audiolms/web.py
+# The Flask application serving the demo page and HTTP routes.
+# It is shared by both server modes: wrapped by Flask-SocketIO in eventlet mode
+# (see eventlet_server.py) and mounted under the ASGI app in asgi mode (see asgi.py).
+import logging
+from flask import Flask, Response, request, redirect, url_for, jsonify, send_file
+from werkzeug.utils import secure_filename
+
+from .assets import AssetManifest, IMMUTABLE_CACHE_CONTROL
+from .config import settings
+from .embedder import generate_course_export_link, render_records
+from .storage import AudioStorage
+
+logger = logging.getLogger(__name__)
+
+app = Flask(__name__, static_url_path='/static')
+app.config['SECRET_KEY'] = 'a_very_secret_key_for_demo' # Replace in production!
+
+# Static assets (CSS/JS) with content-hashed URLs, compressed once at startup
+assets = AssetManifest()
+app.jinja_env.globals['asset_url'] = assets.url_for
+
+# HTML for a simple demo page
+DEMO_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>AudioLMS Live Demo</title>
+    <script src="https://cdnjs.cloudflare.com/ajax/libs/socket.io/4.0.0/socket.io.js"></script>
+    <link rel="stylesheet" href="{{ asset_url('live.css') }}">
+</head>
+<body>
+    <div class="container">
+        <h1>AudioLMS Live & Recording Demo</h1>
+
+        <div class="section">
+            <h2>Recorded Audio Files (Conceptual)</h2>
+            <form method="POST" action="/upload_recorded" enctype="multipart/form-data">
+                <p>Upload a recorded audio file:</p>
+                <input type="file" name="audio_file" accept="audio/*">
+                <button type="submit">Upload & Save</button>
+            </form>
+            <!-- Removed server-side recording button as it's conceptual and causes platform issues -->
+            <div id="recorded-files">
+                <h3>Uploaded & Recorded Audio:</h3>
+                <ul>
+                    {% for audio in recorded_audios %}
+                    <li>
+                        <strong>{{ audio.name }}</strong><br>
+                        {{ audio.embed_code | safe }}
+                    </li>
+                    {% endfor %}
+                </ul>
+            </div>
+        </div>
+
+        <div class="section">
+            <h2>Live Audio Stream</h2>
+            <p id="live-status">Live Session Status: Not Active</p>
+            <div style="text-align: center; margin-bottom: 15px;">
+                <input type="text" id="sessionIdInput" placeholder="Enter Session ID (e.g., 'class101')" style="width: 70%; max-width: 300px; display: inline-block;">
+            </div>
+            <div class="button-group">
+                <button onclick="startLiveSession('teacher')">Start Live Session (Teacher)</button>
+                <button onclick="joinLiveSession('student')">Join Live Session (Student)</button>
+                <button onclick="stopLiveSession()">Stop All Live</button>
+            </div>
+            <div id="live-audio-player">
+                <audio id="remoteAudio" autoplay controls></audio>
+            </div>
+        </div>
+
+        <div class="section">
+            <h3>Signaling Messages:</h3>
+            <div id="messages"></div>
+        </div>
+    </div>
+
+    <script src="{{ asset_url('live.js') }}"></script>
+</body>
+</html>
+"""
+
+COURSE_HTML = """
+<!DOCTYPE html>
+<html>
+<head>
+    <title>{{ course_id }} - AudioLMS</title>
+</head>
+<body>
+    <h1>{{ course_id }}</h1>
+    {{ export_link | safe }}
+    {{ recordings_html | safe }}
+    <script src="{{ asset_url('analytics.js') }}" defer></script>
+</body>
+</html>
+"""
+
+# Templates compiled on first use and reused (render_template_string recompiles on every call)
+_templates = {}
+
+
+def compiled_template(source: str):
+    template = _templates.get(source)
+    if template is None:
+        template = _templates[source] = app.jinja_env.from_string(source)
+    return template
+
+
+@app.route('/')
+def index():
+    # For this demo, recorded_audios will be an empty list as we focus on live.
+    # In a full LMS, this would fetch actual recorded files.
+    recorded_audios = []
+    response = Response(compiled_template(DEMO_HTML).render(recorded_audios=recorded_audios), mimetype='text/html')
+    # Always revalidate the page itself so new asset URLs are picked up after a deploy.
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/assets/<name>')
+def asset(name):
+    """Serves a content-hashed static asset, precompressed when the client accepts it."""
+    found = assets.get(name)
+    if found is None:
+        return "Not found", 404
+    encoding, body = found.negotiate(request.accept_encodings)
+    response = Response(body, mimetype=found.mimetype)
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(f"{found.etag}-{encoding}")
+    return response.make_conditional(request)
+
+# Created on first upload; shared by all requests (and their event loops)
+_async_storage = None
+# Analyzes uploads in worker processes (settings.ANALYZE_UPLOADS), created with the storage
+_analysis_queue = None
+
+
+def _catalog_upload(path: str, course_id: str = None):
+    """Post-save hook: adds an uploaded file to the catalog, so its analysis and course page can find it."""
+    from .importer import record_for_file # Deferred: only uploads need it
+    get_catalog().insert_many([record_for_file(path, course_id)])
+
+
+def get_async_storage():
+    global _async_storage, _analysis_queue
+    if _async_storage is None:
+        from .async_storage import AsyncAudioStorage
+        storage = AudioStorage(settings.ensure_upload_folder())
+        if settings.ANALYZE_UPLOADS:
+            from .analysis import AnalysisQueue # Deferred: loads NumPy
+            # Hooks run in order on the I/O pool: the record exists before its analysis is queued
+            storage.post_save_hooks.append(_catalog_upload)
+            _analysis_queue = AnalysisQueue(get_catalog())
+            _analysis_queue.install(storage)
+        _async_storage = AsyncAudioStorage(storage)
+    return _async_storage
+
+
+@app.route('/upload_recorded', methods=['POST'])
+async def upload_recorded():
+    # Streams the upload to storage through the async storage layer, so
+    # writing and fsyncing large files happens on its I/O threads.
+    if 'audio_file' not in request.files:
+        return "No audio file part", 400
+    file = request.files['audio_file']
+    if file.filename == '':
+        return "No selected file", 400
+    if file:
+        filename = secure_filename(file.filename)
+        course_id = secure_filename(request.form.get('course_id', '')) or None
+        storage = get_async_storage()
+        # The request body is spooled by werkzeug; read it on the I/O pool too.
+        chunks = storage.iterate(iter(lambda: file.stream.read(storage.write_buffer), b''))
+        save_path = await storage.save(chunks, filename, course_id)
+        logger.info(f"Uploaded {filename} to {save_path}")
+        return redirect(url_for('index'))
+    return "Upload failed", 500
+
+@app.route('/admin/media')
+def media_load():
+    """
+    Reports per-backend load (media loop threads or worker processes) in asgi mode.
+    """
+    router = app.extensions.get('audiolms.media')
+    if router is None:
+        return jsonify({'error': 'Media backends are only available in asgi mode.'}), 404
+    return jsonify({'backends': router.load_report()})
+
+@app.route('/admin/egress')
+def egress_utilization():
+    """
+    Reports outbound media against the node's cap (EGRESS_NODE_RATE): current
+    rate, utilization, per-session shares and how many more listeners fit.
+    In processes mode, each media worker reports its slice of the node.
+    """
+    router = app.extensions.get('audiolms.media')
+    workers = getattr(router, 'workers', None)
+    if workers:
+        return jsonify({'backends': [dict(worker.stats.get('egress') or {}, index=worker.index) for worker in workers]})
+    from .live.egress import egress_scheduler # Deferred: only admin views need it in this process
+    return jsonify(egress_scheduler.report())
+
+@app.route('/admin/sessions')
+async def session_resources():
+    """
+    Reports what each live session costs: peer connections, queued frames,
+    buffered bytes, CPU in its track callbacks and approximate memory, per
+    session and (unless ?peers=0) per peer, against the SESSION_MAX_* limits.
+    In asgi mode, each media backend reports its own sessions.
+    """
+    peers = request.args.get('peers', '1') != '0'
+    router = app.extensions.get('audiolms.media')
+    if router is not None:
+        return jsonify({'backends': await router.resource_report(peers)})
+    signaling = app.extensions.get('audiolms.signaling')
+    if signaling is None:
+        return jsonify({'error': 'Live signaling is not running in this process.'}), 404
+    return jsonify(signaling.manager.resources.report(peers))
+
+# Opened on first use so importing the app does not create the database
+_catalog = None
+
+
+def get_catalog():
+    global _catalog
+    if _catalog is None:
+        from .catalog import AudioCatalog
+        _catalog = AudioCatalog()
+    return _catalog
+
+
+@app.route('/courses/<course_id>')
+def course_page(course_id):
+    """
+    Lists a course's recordings. All players are rendered in one batch from
+    cached fragments, with durations from the catalog so browsers need not
+    fetch any audio before a student presses play.
+    """
+    records = get_catalog().course_records(course_id)
+    if not records:
+        return "Course not found", 404
+    return compiled_template(COURSE_HTML).render(
+        course_id=course_id, recordings_html=render_records(records),
+        export_link=generate_course_export_link(course_id),
+    )
+
+
+# Created (and its flusher started) on the first beacon
+_analytics = None
+
+
+def get_analytics():
+    global _analytics
+    if _analytics is None:
+        from .analytics import PlaybackAnalytics
+        import atexit
+        _analytics = PlaybackAnalytics()
+        _analytics.start()
+        atexit.register(_analytics.close) # Writes what is still pending
+    return _analytics
+
+
+@app.route('/analytics/beacon', methods=['POST'])
+def analytics_beacon():
+    """
+    Accepts a batch of playback events ({"events": [...]}, see analytics.py)
+    from navigator.sendBeacon. Events are only aggregated in memory here;
+    the aggregates are written to the database in bulk, periodically.
+    """
+    if (request.content_length or 0) > settings.ANALYTICS_MAX_BEACON_BYTES:
+        return "Beacon too large", 413
+    # sendBeacon may not set a JSON content type, so parse regardless of it
+    payload = request.get_json(force=True, silent=True)
+    events = payload.get('events') if isinstance(payload, dict) else None
+    if not isinstance(events, list):
+        return "Invalid beacon", 400
+    get_analytics().add_events(events)
+    return Response(status=204)
+
+
+@app.route('/recordings/<record_id>/listens')
+def recording_listens(record_id):
+    """Returns a recording's listen histogram (seconds listened per bucket of media time)."""
+    return jsonify(get_analytics().histogram(record_id))
+
+
+@app.route('/recordings/<record_id>/audio')
+def recording_audio(record_id):
+    """Serves a recording's file with Range support (resumable, seekable)."""
+    record = get_catalog().get(record_id)
+    if record is None:
+        return "Recording not found", 404
+    return send_file(record.url, mimetype=record.mime_type, conditional=True, etag=record.sha256 or True)
+
+
+@app.route('/recordings/<record_id>/seek')
+def recording_seek(record_id):
+    """
+    Maps ?t=<seconds> to the byte offset to request (Range: bytes=<offset>-)
+    from /recordings/<record_id>/audio, using the stored seek index, so
+    players can jump without scanning the file.
+    """
+    record = get_catalog().get(record_id)
+    if record is None:
+        return jsonify({'error': 'Recording not found.'}), 404
+    if not record.analysis:
+        return jsonify({'error': 'Recording has not been analyzed yet.'}), 409
+    seconds = request.args.get('t', 0.0, type=float)
+    from .analysis import seek # Deferred: pulls in numpy
+    return jsonify(dict(seek(record.analysis, seconds), chapters=record.analysis['chapters']))
+
+
+@app.route('/courses/<course_id>/export.zip')
+def export_course(course_id):
+    """
+    Streams all recordings of a course as one ZIP archive. The archive is
+    generated while it is sent (no temp file), has a known Content-Length and
+    supports Range requests, so interrupted downloads can resume.
+    """
+    try:
+        archive = AudioStorage(settings.UPLOAD_FOLDER).export_course_zip(course_id)
+    except ValueError:
+        return "Invalid course ID", 400
+    except FileNotFoundError:
+        return "Course not found", 404
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'Content-Disposition': f'attachment; filename="{secure_filename(course_id) or "course"}.zip"',
+    }
+    start, stop, status = 0, archive.size, 200
+    byte_range = request.range
+    # If-Range: only resume if the client's partial copy is of this exact archive
+    if byte_range and 'If-Range' in request.headers and request.if_range.etag != archive.etag:
+        byte_range = None
+    # Multi-range requests are answered with the whole archive
+    if byte_range and len(byte_range.ranges) == 1:
+        bounds = byte_range.range_for_length(archive.size)
+        if bounds is None:
+            headers['Content-Range'] = f'bytes */{archive.size}'
+            return Response(status=416, headers=headers)
+        start, stop = bounds
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{archive.size}'
+    headers['Content-Length'] = str(stop - start)
+
+    response = Response(archive.iter_bytes(start, stop), status=status, headers=headers,
+                        mimetype='application/zip', direct_passthrough=True)
+    response.set_etag(archive.etag)
+    return response
@@ -0,0 +1,68 @@
+# benchmarks/bench_index.py
+"""
+Requests per second on the demo page (`/`), measured in-process with Flask's
+test client so the numbers reflect the application, not the network or the
+server in front of it.
+
+Two variants are timed:
+    before  - the page rendered with render_template_string on every request
+              (the template is re-parsed and recompiled each time)
+    after   - the real `/` route: template compiled once, CSS/JS served
+              separately from precompressed, immutable, content-hashed assets
+
+It also reports the bytes a first visit and a repeat visit transfer with
+`Accept-Encoding: gzip, br`.
+
+Usage:
+    python benchmarks/bench_index.py [--requests N]
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+HEADERS = {'Accept-Encoding': 'gzip, br'}
+
+
+def requests_per_second(client, path: str, requests: int) -> float:
+    client.get(path, headers=HEADERS) # Warm up (first-use compilation, caches)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=HEADERS)
+    return requests / (time.perf_counter() - start)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per variant (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    from flask import render_template_string
+    from audiolms.web import DEMO_HTML, app, assets
+
+    @app.route('/__bench_before')
+    def before():
+        return render_template_string(DEMO_HTML, recorded_audios=[])
+
+    client = app.test_client()
+    before_rps = requests_per_second(client, '/__bench_before', args.requests)
+    after_rps = requests_per_second(client, '/', args.requests)
+    print(f"before (render_template_string)  {before_rps:10.0f} req/s")
+    print(f"after  (compiled template)        {after_rps:10.0f} req/s  ({after_rps / before_rps:.1f}x)")
+
+    page = client.get('/', headers=HEADERS)
+    asset_bytes = 0
+    for asset in assets:
+        response = client.get(assets.url_for(asset.name), headers=HEADERS)
+        asset_bytes += len(response.data)
+        print(f"  {asset.hashed_name:<28} {len(asset.variants['identity']):7d} B -> "
+              f"{len(response.data):7d} B ({response.headers.get('Content-Encoding', 'identity')})")
+    print(f"first visit: {len(page.data) + asset_bytes} B, repeat visit: {len(page.data)} B (assets cached as immutable)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# benchmarks/bench_live.py
+"""Live hot paths: WebRTCManager lookups, fan-out subscription, frame handling, peer connections."""
+import asyncio
+
+import fixtures
+from harness import benchmark
+
+LIVE = ('aiortc', 'av')
+
+# A node's worth of simulated classes
+SESSIONS = 200
+LISTENERS_PER_SESSION = 25
+
+
+def _populated_manager(context):
+    """
+    A WebRTCManager with SESSIONS live sessions (teacher track attached) of
+    LISTENERS_PER_SESSION subscribed listeners each. Returns (manager, teacher SIDs, listener SIDs).
+    """
+    from audiolms.live.pc_pool import PeerConnectionPool
+    from audiolms.live.webrtc_manager import WebRTCManager
+
+    async def build():
+        manager = WebRTCManager(pool=PeerConnectionPool(size=0))
+        sids = fixtures.simulated_sids(SESSIONS * (LISTENERS_PER_SESSION + 1))
+        teachers, listeners = sids[:SESSIONS], sids[SESSIONS:]
+        frames = fixtures.audio_frames(50)
+        for index, teacher_sid in enumerate(teachers):
+            session_id = f'class-{index}'
+            await manager.add_peer_connection_for_sid(teacher_sid)
+            manager.activate_live_session(session_id, teacher_sid)
+            manager.set_teacher_audio_track(teacher_sid, fixtures.frame_source(frames))
+            for sid in listeners[index * LISTENERS_PER_SESSION:(index + 1) * LISTENERS_PER_SESSION]:
+                pc = await manager.add_peer_connection_for_sid(sid)
+                manager.add_listener(session_id, sid, pc)
+        return manager, teachers, listeners
+
+    manager, teachers, listeners = context.run(build())
+
+    async def teardown():
+        manager.adaptive_bitrate.stop()
+        manager.resources.stop()
+        for sid in list(manager._peer_connections):
+            await manager.close_peer_connection(sid)
+        for session_id in list(manager._live_sessions):
+            manager.close_live_session(session_id)
+    context.on_teardown(teardown)
+    return manager, teachers, listeners
+
+
+@benchmark('live.manager.get_peer_connection', requires=LIVE)
+def manager_get_peer_connection(context):
+    manager, teachers, listeners = _populated_manager(context)
+    sids = listeners[::97]
+
+    def lookup():
+        for sid in sids:
+            manager.get_peer_connection(sid)
+    return lookup
+
+
+@benchmark('live.manager.is_teacher', requires=LIVE)
+def manager_is_teacher(context):
+    # Asked for every socket event; a listener is the worst case (scans every session)
+    manager, teachers, listeners = _populated_manager(context)
+    sid = listeners[-1]
+    return lambda: manager.is_teacher(sid)
+
+
+@benchmark('live.manager.get_teacher_audio_track', requires=LIVE)
+def manager_get_teacher_audio_track(context):
+    manager, teachers, listeners = _populated_manager(context)
+    sid = teachers[-1]
+    return lambda: manager.get_teacher_audio_track(sid)
+
+
+@benchmark('live.manager.listener_tier_counts', requires=LIVE)
+def manager_listener_tier_counts(context):
+    manager, teachers, listeners = _populated_manager(context)
+    return manager.listener_tier_counts
+
+
+@benchmark('live.manager.iter_listeners', requires=LIVE)
+def manager_iter_listeners(context):
+    manager, teachers, listeners = _populated_manager(context)
+    return lambda: sum(1 for _ in manager.iter_listeners())
+
+
+@benchmark('live.manager.session_usage', requires=LIVE)
+def manager_session_usage(context):
+    # Per-session accounting, as read by every resource poll and /admin/sessions
+    manager, teachers, listeners = _populated_manager(context)
+    return lambda: manager.session_usage('class-0')
+
+
+@benchmark('live.fanout.subscribe_unsubscribe', requires=LIVE)
+def fanout_subscribe_unsubscribe(context):
+    from audiolms.live.fanout import FanoutNode
+    node = FanoutNode(fixtures.frame_source(fixtures.audio_frames(50)))
+    node.subscribe() # Keeps the tier's encoder alive, as other listeners would
+    context.on_teardown(node.stop)
+    return lambda: node.unsubscribe(node.subscribe())
+
+
+def _opus_encode(context, tier_name):
+    from audiolms.config import settings
+    from audiolms.live.audio_track import OpusEncodedTrack
+    tier = next(tier for tier in settings.ABR_TIERS if tier['name'] == tier_name)
+    track = OpusEncodedTrack(fixtures.frame_source(fixtures.audio_frames(500)), bitrate=tier['bitrate'],
+                             ptime=tier['ptime'], fec=tier['fec'], packet_loss=tier['packet_loss'])
+    context.on_teardown(track.stop)
+    return track.recv # One encoded packet (one ptime of audio) per call
+
+
+@benchmark('live.frames.opus_encode_high', requires=LIVE)
+def frames_opus_encode_high(context):
+    return _opus_encode(context, 'high')
+
+
+@benchmark('live.frames.opus_encode_low', requires=LIVE)
+def frames_opus_encode_low(context):
+    return _opus_encode(context, 'low')
+
+
+@benchmark('live.frames.switchable_passthrough', requires=LIVE)
+def frames_switchable_passthrough(context):
+    from audiolms.live.audio_track import SwitchableAudioTrack
+    track = SwitchableAudioTrack(fixtures.frame_source(fixtures.audio_frames(50)))
+    context.on_teardown(track.stop)
+    return track.recv
+
+
+@benchmark('live.frames.mix_4_inputs', requires=LIVE)
+def frames_mix_4_inputs(context):
+    from audiolms.live.audio_track import AudioMixerTrack
+    frames = fixtures.audio_frames(50)
+    mixer = AudioMixerTrack([fixtures.frame_source(frames) for _ in range(4)])
+    context.on_teardown(mixer.stop)
+    context.run(mixer.recv()) # Starts the input readers and the mixer clock
+    # The mixer paces itself in real time; move its clock back so recv() never sleeps.
+    mixer._start -= 24 * 3600
+
+    async def mix():
+        await asyncio.sleep(0) # Each input reader buffers its next frame
+        return await mixer.recv()
+    return mix
+
+
+@benchmark('live.egress.admit', requires=LIVE)
+def egress_admit(context):
+    # Per-packet cost of the scheduler on a rate-limited node, never waiting
+    from audiolms.live.egress import EgressScheduler
+    scheduler = EgressScheduler(node_rate=10 ** 12, burst=1.0)
+    session_ids = [f'class-{index}' for index in range(SESSIONS)]
+    for session_id in session_ids:
+        scheduler.add_listener(session_id, 'listener')
+
+    async def admit():
+        for session_id in session_ids[::20]:
+            await scheduler.admit(session_id, 120, True, 0.02)
+    return admit
+
+
+@benchmark('live.peer_pair.connect', requires=LIVE)
+def peer_pair_connect(context):
+    # Offer/answer, ICE over loopback, DTLS handshake and SCTP association
+    pairs = []
+
+    async def connect():
+        pairs.append(await fixtures.peer_pair())
+
+    async def teardown():
+        for offerer, answerer in pairs:
+            await offerer.close()
+            await answerer.close()
+    context.on_teardown(teardown)
+    return connect
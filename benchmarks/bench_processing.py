@@ -0,0 +1,71 @@
+# benchmarks/bench_processing.py
+"""Processing hot paths: embed rendering, chapter analysis, fingerprinting, playback analytics."""
+import fixtures
+from harness import benchmark
+
+
+@benchmark('processing.render_records_500_cold')
+def render_records_500_cold(context):
+    # A course page of 500 recordings, nothing cached yet
+    from audiolms.embedder import EmbedCache, render_records
+    records = fixtures.records(500)
+    return lambda: render_records(records, cache=EmbedCache(maxsize=1000))
+
+
+@benchmark('processing.render_records_500_warm')
+def render_records_500_warm(context):
+    from audiolms.embedder import EmbedCache, render_records
+    records = fixtures.records(500)
+    cache = EmbedCache(maxsize=1000)
+    render_records(records, cache=cache)
+    return lambda: render_records(records, cache=cache)
+
+
+@benchmark('processing.analyze_wav_10min')
+def analyze_wav_10min(context):
+    from audiolms.analysis import analyze_file
+    path = fixtures.write_wav(context.path('lecture.wav'), fixtures.speech_like(600))
+    return lambda: analyze_file(path)
+
+
+@benchmark('processing.fingerprint_wav_2min')
+def fingerprint_wav_2min(context):
+    from audiolms.similarity import fingerprint_file
+    path = fixtures.write_wav(context.path('lecture.wav'), fixtures.speech_like(120))
+    return lambda: fingerprint_file(path)
+
+
+@benchmark('processing.similarity_query_10s')
+def similarity_query_10s(context):
+    # A 10 s clip against an index of 20 two-minute recordings
+    from audiolms.similarity import SimilarityIndex, fingerprint_file
+    index = SimilarityIndex(context.path('similarity.sqlite3'))
+    context.on_teardown(index.close)
+    for number in range(20):
+        path = fixtures.write_wav(context.path(f'{number}.wav'), fixtures.speech_like(120, seed=number))
+        index.add(f'rec-{number}', *fingerprint_file(path))
+    clip = fixtures.write_wav(context.path('clip.wav'), fixtures.speech_like(120, seed=7)[30 * 16000:40 * 16000])
+    return lambda: index.query(clip)
+
+
+@benchmark('processing.analytics_add_1000_events')
+def analytics_add_1000_events(context):
+    # One beacon-sized batch per call, spread over 2000 recordings
+    from audiolms.analytics import PlaybackAnalytics
+    analytics = PlaybackAnalytics(context.path('analytics.sqlite3'))
+    context.on_teardown(analytics.close)
+    events = fixtures.beacon_events(1000, [f'rec-{index}' for index in range(2000)])
+    return lambda: analytics.add_events(events)
+
+
+@benchmark('processing.analytics_flush_10000_keys')
+def analytics_flush_10000_keys(context):
+    from audiolms.analytics import PlaybackAnalytics
+    analytics = PlaybackAnalytics(context.path('analytics.sqlite3'))
+    context.on_teardown(analytics.close)
+    events = fixtures.beacon_events(10000, [f'rec-{index}' for index in range(2000)])
+
+    def flush():
+        analytics.add_events(events)
+        analytics.flush()
+    return flush
@@ -0,0 +1,92 @@
+# benchmarks/bench_storage.py
+"""Storage hot paths: local saves and copies, async saves, course ZIP streaming, catalog batches."""
+import itertools
+import os
+
+import fixtures
+from harness import benchmark
+
+
+def _names(count: int = 16):
+    """
+    Target file names, reused in turn: each save replaces an earlier file,
+    so the directory (and the page cache it uses) stays the same size
+    however many calls a round makes.
+    """
+    return itertools.cycle([f'lecture-{index:02d}.wav' for index in range(count)])
+
+
+def _storage(context):
+    from audiolms.storage import AudioStorage
+    return AudioStorage(context.path('uploads'))
+
+
+def _save_local(context, size):
+    storage = _storage(context)
+    content = fixtures.random_bytes(size)
+    names = _names()
+    return lambda: storage.save_audio_local(content, next(names), 'course-1')
+
+
+@benchmark('storage.save_audio_local_64k')
+def save_audio_local_64k(context):
+    return _save_local(context, 64 * 1024)
+
+
+@benchmark('storage.save_audio_local_4m')
+def save_audio_local_4m(context):
+    return _save_local(context, 4 * 1024 * 1024)
+
+
+@benchmark('storage.copy_audio_local_4m')
+def copy_audio_local_4m(context):
+    storage = _storage(context)
+    source = context.path('source.wav')
+    with open(source, 'wb') as f:
+        f.write(fixtures.random_bytes(4 * 1024 * 1024))
+    names = _names()
+    return lambda: storage.copy_audio_local(source, next(names), 'course-1')
+
+
+@benchmark('storage.async_save_4m')
+def async_save_4m(context):
+    # 4 MiB arriving as 64 KiB chunks (as from an upload), coalesced and group-fsynced
+    from audiolms.async_storage import AsyncAudioStorage
+    storage = AsyncAudioStorage(_storage(context))
+    context.on_teardown(storage.close)
+    content = fixtures.random_bytes(4 * 1024 * 1024)
+    chunks = [content[offset:offset + 65536] for offset in range(0, len(content), 65536)]
+    names = _names()
+
+    async def save():
+        await storage.save(chunks, next(names), 'course-1')
+    return save
+
+
+@benchmark('storage.export_zip_20x1m')
+def export_zip_20x1m(context):
+    # Builds the archive layout and streams all of it (CRCs cached after the first pass)
+    storage = _storage(context)
+    for index in range(20):
+        storage.save_audio_local(fixtures.random_bytes(1024 * 1024, seed=index), f'lecture-{index:02d}.wav', 'course-1')
+
+    def export():
+        for _ in storage.export_course_zip('course-1').iter_bytes():
+            pass
+    return export
+
+
+@benchmark('storage.catalog_insert_500')
+def catalog_insert_500(context):
+    from audiolms.catalog import AudioCatalog
+    catalog = AudioCatalog(context.path('catalog.sqlite3'))
+    context.on_teardown(catalog.close)
+    template = fixtures.records(500)
+    batches = itertools.count()
+
+    def insert():
+        batch = next(batches)
+        for record in template:
+            record.id = f'{batch}-{os.path.basename(record.url)}'
+        catalog.insert_many(template)
+    return insert
@@ -0,0 +1,38 @@
+# benchmarks/bench_web.py
+"""HTTP routes through Flask's test client (application cost only, no server or network)."""
+import fixtures
+from harness import benchmark
+
+WEB = ('flask',)
+HEADERS = {'Accept-Encoding': 'gzip, br'}
+
+
+@benchmark('web.index', requires=WEB)
+def web_index(context):
+    from audiolms.web import app
+    client = app.test_client()
+    return lambda: client.get('/', headers=HEADERS)
+
+
+@benchmark('web.asset', requires=WEB)
+def web_asset(context):
+    from audiolms.web import app, assets
+    client = app.test_client()
+    url = assets.url_for('live.js')
+    return lambda: client.get(url, headers=HEADERS)
+
+
+@benchmark('web.course_page_200', requires=WEB)
+def web_course_page_200(context):
+    from audiolms import web
+    from audiolms.catalog import AudioCatalog
+    catalog = AudioCatalog(context.path('catalog.sqlite3'))
+    catalog.insert_many(fixtures.records(200))
+    previous, web._catalog = web._catalog, catalog
+
+    def teardown():
+        web._catalog = previous
+        catalog.close()
+    context.on_teardown(teardown)
+    client = web.app.test_client()
+    return lambda: client.get('/courses/course-1', headers=HEADERS)
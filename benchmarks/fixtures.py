@@ -0,0 +1,179 @@
+# benchmarks/fixtures.py
+"""
+Deterministic synthetic inputs for the benchmark suite: generated audio,
+simulated Socket.IO SIDs, catalog records and beacon events, live media
+frames and in-process peer connection pairs. Every generator takes a seed,
+so two runs (and two machines) benchmark exactly the same data. Nothing
+here touches the network; peer pairs connect over the loopback interface.
+"""
+import asyncio
+import random
+import string
+import wave
+
+import numpy as np
+
+SID_ALPHABET = string.ascii_letters + string.digits + '-_'
+
+
+def speech_like(seconds: float, sample_rate: int = 16000, seed: int = 0) -> np.ndarray:
+    """
+    Mono int16 samples shaped roughly like a lecture: voiced segments (a
+    wandering fundamental with harmonics, syllable-rate amplitude
+    modulation) separated by short gaps and occasional long pauses, over a
+    low noise floor.
+    """
+    rng = np.random.default_rng(seed)
+    count = int(seconds * sample_rate)
+    t = np.arange(count) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.3 * t + rng.uniform(0, 2 * np.pi))
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 6))
+    syllables = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    # Segments of speech (1-8 s) and silence (0.2-0.6 s, or a 3 s pause one time in five)
+    gate = np.zeros(count)
+    position = 0
+    while position < count:
+        length = int(rng.uniform(1, 8) * sample_rate)
+        gate[position:position + length] = 1.0
+        position += length + int((3.0 if rng.random() < 0.2 else rng.uniform(0.2, 0.6)) * sample_rate)
+    signal = 0.3 * voice * syllables * gate + 0.002 * rng.standard_normal(count)
+    return np.clip(signal * 32767, -32768, 32767).astype(np.int16)
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = 16000) -> str:
+    """Writes mono int16 samples as a WAV file and returns its path."""
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+    return path
+
+
+def random_bytes(size: int, seed: int = 0) -> bytes:
+    """Incompressible payload of `size` bytes."""
+    return np.random.default_rng(seed).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def simulated_sids(count: int, seed: int = 0) -> list:
+    """Unique 20-character Socket.IO-style session IDs."""
+    rng = random.Random(seed)
+    sids = set()
+    while len(sids) < count:
+        sids.add(''.join(rng.choice(SID_ALPHABET) for _ in range(20)))
+    return sorted(sids)
+
+
+def records(count: int, course_id: str = 'course-1', seed: int = 0) -> list:
+    """AudioRecords with durations, hashes and a few analyzed chapters each."""
+    from audiolms.models import AudioRecord
+    rng = random.Random(seed)
+    result = []
+    for index in range(count):
+        duration = rng.uniform(300, 5400)
+        chapters = [{'start': 0.0, 'offset': 0, 'reason': 'start'}] + [
+            {'start': round(start, 2), 'offset': int(start * 16000), 'reason': 'pause'}
+            for start in sorted(rng.uniform(60, duration) for _ in range(rng.randrange(0, 6)))
+        ]
+        result.append(AudioRecord(
+            f'rec-{index:05d}', f'Lecture {index} <{course_id}> & "notes"', f'/uploads/{course_id}/lecture-{index:05d}.mp3',
+            duration=duration, size=int(duration * 16000), sha256=f'{rng.getrandbits(256):064x}',
+            course_id=course_id, analysis={'duration': duration, 'chapters': chapters, 'seek_index': []},
+        ))
+    return result
+
+
+def beacon_events(count: int, record_ids: list, seed: int = 0) -> list:
+    """Playback beacon events as sent by static/analytics.js: mostly progress heartbeats."""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(count):
+        record_id = rng.choice(record_ids)
+        roll = rng.random()
+        if roll < 0.05:
+            events.append({'r': record_id, 't': 'play'})
+        elif roll < 0.1:
+            events.append({'r': record_id, 't': 'seek'})
+        else:
+            start = rng.uniform(0, 3600)
+            events.append({'r': record_id, 't': 'progress', 'from': start, 'to': start + rng.uniform(5, 10)})
+    return events
+
+
+def audio_frames(count: int, ptime: int = 20, seed: int = 0) -> list:
+    """48 kHz mono s16 av.AudioFrames of `ptime` ms, cut from speech_like audio."""
+    from av import AudioFrame
+    from audiolms.live.audio_track import OPUS_SAMPLE_RATE, OPUS_TIME_BASE
+    size = OPUS_SAMPLE_RATE * ptime // 1000
+    samples = speech_like(count * size / OPUS_SAMPLE_RATE, OPUS_SAMPLE_RATE, seed)
+    frames = []
+    for index in range(count):
+        frame = AudioFrame.from_ndarray(samples[index * size:(index + 1) * size].reshape(1, -1), format='s16', layout='mono')
+        frame.sample_rate = OPUS_SAMPLE_RATE
+        frame.time_base = OPUS_TIME_BASE
+        frame.pts = index * size
+        frames.append(frame)
+    return frames
+
+
+_frame_source_class = None
+
+
+def frame_source(frames: list):
+    """
+    A MediaStreamTrack replaying `frames` in a loop, as fast as it is read
+    (no real-time pacing), with continuous timestamps. Each recv() yields to
+    the event loop once, as a network-fed track would, so tasks reading it
+    take turns with the rest of the loop.
+    """
+    global _frame_source_class
+    if _frame_source_class is None:
+        from aiortc.mediastreams import MediaStreamTrack
+
+        class FrameSource(MediaStreamTrack):
+            kind = 'audio'
+
+            def __init__(self, frames):
+                super().__init__()
+                self._frames = frames
+                self._index = 0
+                self._pts = 0
+
+            async def recv(self):
+                await asyncio.sleep(0)
+                frame = self._frames[self._index % len(self._frames)]
+                self._index += 1
+                frame.pts = self._pts
+                self._pts += frame.samples
+                return frame
+
+        _frame_source_class = FrameSource
+    return _frame_source_class(frames)
+
+
+async def peer_pair(audio_track=None) -> tuple:
+    """
+    Connects two RTCPeerConnections to each other over the loopback
+    interface (host candidates only, no STUN) and returns (offerer,
+    answerer) once the offerer's data channel is open. With `audio_track`,
+    the offerer also sends that track.
+    """
+    from aiortc import RTCConfiguration, RTCPeerConnection
+    from audiolms.live.ice import host_address_cache
+
+    host_address_cache.known_addresses = ['127.0.0.1']
+    host_address_cache.install()
+    offerer = RTCPeerConnection(RTCConfiguration(iceServers=[]))
+    answerer = RTCPeerConnection(RTCConfiguration(iceServers=[]))
+    if audio_track is not None:
+        offerer.addTrack(audio_track)
+    channel = offerer.createDataChannel('bench')
+    opened = asyncio.Event()
+    channel.on('open', opened.set)
+    await offerer.setLocalDescription(await offerer.createOffer())
+    await answerer.setRemoteDescription(offerer.localDescription)
+    await answerer.setLocalDescription(await answerer.createAnswer())
+    await offerer.setRemoteDescription(answerer.localDescription)
+    await asyncio.wait_for(opened.wait(), 10)
+    return offerer, answerer
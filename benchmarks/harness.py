@@ -0,0 +1,238 @@
+# benchmarks/harness.py
+"""
+Registry, timer and result comparison for the benchmark suite (see run.py).
+
+A benchmark is a factory registered with @benchmark: it receives a Context,
+does its setup (fixtures, temporary files, event loop objects) and returns
+the operation to time, a plain or async callable taking no arguments.
+
+Each operation is warmed up, then called in a loop calibrated to take at
+least `min_time` seconds per round, for `rounds` rounds with the garbage
+collector disabled. The median time per call is the reported figure (the
+minimum and interquartile range are kept to judge noise). The peak memory
+of a call is measured separately with tracemalloc, since tracing slows
+every allocation down.
+"""
+import asyncio
+import gc
+import importlib.util
+from importlib import metadata
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+RESULTS_VERSION = 1
+
+# Calls per round are capped so very fast operations still finish quickly
+MAX_LOOPS = 1_000_000
+# Traced calls per benchmark; the smallest peak is kept, which filters out
+# one-off allocations (a cache being filled, a buffer regrown) made by a single call
+MEMORY_CALLS = 5
+# Peak memory growth below this many bytes is never reported as a regression
+MEMORY_SLACK = 64 * 1024
+
+_registry = []
+
+
+class Benchmark:
+    def __init__(self, name: str, factory, requires: tuple = ()):
+        self.name = name
+        self.group = name.split('.', 1)[0]
+        self.factory = factory
+        self.requires = requires
+
+    def missing_requirements(self) -> list:
+        """Optional dependencies (module names) that are not installed."""
+        return [module for module in self.requires if importlib.util.find_spec(module) is None]
+
+
+def benchmark(name: str, requires: tuple = ()):
+    """Registers a benchmark factory under a dotted name (its first part is the group)."""
+    def register(factory):
+        _registry.append(Benchmark(name, factory, tuple(requires)))
+        return factory
+    return register
+
+
+def registered() -> list:
+    return list(_registry)
+
+
+class Context:
+    """
+    What a benchmark factory gets: a private temporary directory, an event
+    loop to run async setup and operations on, and teardown registration.
+    """
+    def __init__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix='audiolms-bench-')
+        self.loop = asyncio.new_event_loop()
+        self._teardowns = []
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.tmpdir, *parts)
+
+    def run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def on_teardown(self, function):
+        """Registers a function (or coroutine function) called after the benchmark."""
+        self._teardowns.append(function)
+
+    def close(self):
+        for function in reversed(self._teardowns):
+            result = function()
+            if asyncio.iscoroutine(result):
+                self.run(result)
+        # Let cancelled tasks and transports finish before the loop goes away
+        self.run(asyncio.sleep(0))
+        self.loop.close()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+
+async def _call_async(operation, loops: int) -> int:
+    start = time.perf_counter_ns()
+    for _ in range(loops):
+        await operation()
+    return time.perf_counter_ns() - start
+
+
+def _timer(context: Context, operation):
+    """Returns timed(loops) -> elapsed nanoseconds for `loops` calls of operation."""
+    if asyncio.iscoroutinefunction(operation):
+        return lambda loops: context.run(_call_async(operation, loops))
+
+    def timed(loops: int) -> int:
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            operation()
+        return time.perf_counter_ns() - start
+    return timed
+
+
+def measure(bench: Benchmark, rounds: int, min_time: float) -> dict:
+    """Runs one benchmark and returns its result entry."""
+    missing = bench.missing_requirements()
+    if missing:
+        return {'skipped': f"requires {', '.join(missing)}"}
+    context = Context()
+    try:
+        operation = bench.factory(context)
+        timed = _timer(context, operation)
+        timed(1) # Warm up: first-use imports, caches, lazily created objects
+
+        # Calibrate the number of calls per round
+        min_time_ns = min_time * 1e9
+        loops = 1
+        while loops < MAX_LOOPS:
+            elapsed = timed(loops)
+            if elapsed >= min_time_ns:
+                break
+            loops = min(MAX_LOOPS, max(2 * loops, int(loops * min_time_ns * 1.2 / max(elapsed, 1))))
+
+        samples = []
+        gc_was_enabled = gc.isenabled()
+        gc.collect()
+        gc.disable()
+        try:
+            for _ in range(rounds):
+                samples.append(timed(loops) / loops)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        tracemalloc.start()
+        try:
+            peaks = []
+            for _ in range(MEMORY_CALLS):
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                timed(1)
+                peaks.append(max(0, tracemalloc.get_traced_memory()[1] - before))
+            peak_bytes = min(peaks)
+        finally:
+            tracemalloc.stop()
+    finally:
+        context.close()
+
+    quartiles = statistics.quantiles(samples, n=4) if len(samples) > 1 else [samples[0]] * 3
+    return {
+        'median_ns': statistics.median(samples),
+        'min_ns': min(samples),
+        'iqr_ns': quartiles[2] - quartiles[0],
+        'rounds': rounds,
+        'loops': loops,
+        'peak_bytes': peak_bytes,
+    }
+
+
+def environment() -> dict:
+    """Describes the machine and interpreter, stored with results (baselines are per machine)."""
+    info = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+    for distribution in ('numpy', 'av', 'aiortc', 'Flask'):
+        try:
+            info[distribution.lower()] = metadata.version(distribution)
+        except metadata.PackageNotFoundError:
+            info[distribution.lower()] = None
+    return info
+
+
+def compare(baseline: dict, current: dict, threshold: float, memory_threshold: float) -> list:
+    """
+    Compares two result documents. Returns (name, status, time ratio,
+    memory ratio) rows, where status is 'regression', 'improved', 'ok',
+    'new', 'missing' or 'skipped'. A time regression is a median more than
+    `threshold` (a fraction) slower, by more than the sum of both runs'
+    interquartile ranges; a memory regression is a peak more than
+    `memory_threshold` larger, and larger by at least MEMORY_SLACK bytes.
+    """
+    rows = []
+    base_results, results = baseline['benchmarks'], current['benchmarks']
+    for name in sorted(set(base_results) | set(results)):
+        base, result = base_results.get(name), results.get(name)
+        if result is None:
+            rows.append((name, 'missing', None, None))
+            continue
+        if base is None:
+            rows.append((name, 'new', None, None))
+            continue
+        if 'skipped' in base or 'skipped' in result:
+            rows.append((name, 'skipped', None, None))
+            continue
+        time_ratio = result['median_ns'] / base['median_ns']
+        memory_ratio = (result['peak_bytes'] + 1) / (base['peak_bytes'] + 1)
+        # A change within the two runs' combined spread is noise, whatever its ratio
+        significant = abs(result['median_ns'] - base['median_ns']) > base['iqr_ns'] + result['iqr_ns']
+        if (significant and time_ratio > 1 + threshold) or (
+                memory_ratio > 1 + memory_threshold and result['peak_bytes'] - base['peak_bytes'] > MEMORY_SLACK):
+            status = 'regression'
+        elif significant and time_ratio < 1 / (1 + threshold):
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, status, time_ratio, memory_ratio))
+    return rows
+
+
+def format_time(ns: float) -> str:
+    for unit, scale in (('s', 1e9), ('ms', 1e6), ('us', 1e3)):
+        if ns >= scale:
+            return f"{ns / scale:.2f} {unit}"
+    return f"{ns:.0f} ns"
+
+
+def format_bytes(size: int) -> str:
+    for unit, scale in (('MiB', 1 << 20), ('KiB', 1 << 10)):
+        if size >= scale:
+            return f"{size / scale:.1f} {unit}"
+    return f"{size} B"
@@ -0,0 +1,81 @@
+# benchmarks/import_time.py
+"""
+Import-time budget check for the audiolms package.
+
+Runs `python -X importtime` in a fresh interpreter for each target module and
+compares the cumulative import time of that module against its budget.
+Standard library modules the package relies on (os, logging, ...) are
+imported first, so only audiolms' own cost is measured.
+
+Usage:
+    python benchmarks/import_time.py            # check all budgets
+    python benchmarks/import_time.py -v         # also print the slowest imports
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# module -> budget in microseconds (cumulative import time, best of REPEATS).
+# Most of the measured time is the path finder locating the package itself;
+# anything importing aiortc, av or sounddevice lands far above these numbers.
+BUDGETS = {
+    'audiolms': 5000,
+    'audiolms.config': 5000,
+    'audiolms.storage': 5000,
+    'audiolms.embedder': 5000,
+    'audiolms.models': 5000,
+    'audiolms.live': 5000,
+}
+REPEATS = 5
+PRELOAD = 'import os, logging, importlib'
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Parses `-X importtime` output into {module: (self_us, cumulative_us)}."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def measure(module: str) -> tuple:
+    """Returns (cumulative_us, timings) for the best of REPEATS fresh imports."""
+    best = None
+    for _ in range(REPEATS):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'{PRELOAD}; import {module}'],
+            cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        )
+        timings = parse_importtime(result.stderr)
+        cumulative = timings[module][1]
+        if best is None or cumulative < best[0]:
+            best = (cumulative, timings)
+    return best
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-v', '--verbose', action='store_true', help='print the slowest imports per module')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module, budget in BUDGETS.items():
+        cumulative, timings = measure(module)
+        status = 'ok' if cumulative <= budget else 'OVER BUDGET'
+        failed = failed or cumulative > budget
+        print(f"{module:<22} {cumulative / 1000:8.2f} ms  (budget {budget / 1000:.2f} ms)  {status}")
+        if args.verbose:
+            slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:5]
+            for name, (self_us, _) in slowest:
+                print(f"    {name:<40} {self_us / 1000:8.2f} ms self")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
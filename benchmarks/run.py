@@ -0,0 +1,144 @@
+# benchmarks/run.py
+"""
+Benchmark suite for audiolms' hot paths, with JSON baselines and regression checks.
+
+Suites (benchmarks/bench_<suite>.py):
+    live        WebRTCManager lookups and session accounting on a populated node,
+                fan-out subscription, frame handling in audio_track.py, egress
+                admission, loopback peer connection setup
+    storage     AudioStorage saves and copies, async saves, course ZIP streaming,
+                catalog batch inserts
+    processing  embed rendering, chapter analysis, fingerprinting and similarity
+                queries, playback analytics ingestion
+    web         HTTP routes through Flask's test client
+
+All inputs are synthetic and seeded (see fixtures.py), and nothing needs the
+network. Benchmarks whose optional dependencies are missing are reported as
+skipped. Baselines are only comparable on the machine that produced them:
+save one before a change and compare after it.
+
+Usage:
+    python benchmarks/run.py                        # run everything, print results
+    python benchmarks/run.py -k live.manager        # only names containing a pattern
+    python benchmarks/run.py --save                 # write benchmarks/baseline.json
+    python benchmarks/run.py --compare              # fail (exit 1) on regressions against it
+    python benchmarks/run.py --compare old.json --threshold 0.1 --memory-threshold 0.5
+    python benchmarks/run.py --quick                # fewer, shorter rounds (smoke test)
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+import harness # noqa: E402 (needs REPO_ROOT on sys.path first)
+
+SUITES = ('live', 'storage', 'processing', 'web')
+BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+
+def load_suites(suites: list) -> list:
+    for suite in suites:
+        importlib.import_module(f'bench_{suite}')
+    return harness.registered()
+
+
+def run(benchmarks: list, rounds: int, min_time: float) -> dict:
+    results = {}
+    for bench in benchmarks:
+        result = harness.measure(bench, rounds, min_time)
+        results[bench.name] = result
+        if 'skipped' in result:
+            print(f"{bench.name:<48} skipped ({result['skipped']})", flush=True)
+        else:
+            print(f"{bench.name:<48} {harness.format_time(result['median_ns']):>10} "
+                  f"± {harness.format_time(result['iqr_ns']):>9}  peak {harness.format_bytes(result['peak_bytes']):>10}",
+                  flush=True)
+    return results
+
+
+def print_comparison(rows: list, baseline: dict, current: dict):
+    if baseline.get('environment') != current.get('environment'):
+        print("warning: baseline was recorded in a different environment; timings may not be comparable")
+    print(f"\n{'benchmark':<48} {'time':>8} {'memory':>8}  status")
+    for name, status, time_ratio, memory_ratio in rows:
+        if time_ratio is None:
+            print(f"{name:<48} {'':>8} {'':>8}  {status}")
+        else:
+            print(f"{name:<48} {time_ratio:>7.2f}x {memory_ratio:>7.2f}x  {status}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='pattern', help='only run benchmarks whose name contains PATTERN')
+    parser.add_argument('--suite', action='append', choices=SUITES, help='only run these suites (repeatable)')
+    parser.add_argument('--rounds', type=int, default=15, help='timed rounds per benchmark (default: %(default)s)')
+    parser.add_argument('--min-time', type=float, default=0.05,
+                        help='minimum seconds per round; calls per round are calibrated to it (default: %(default)s)')
+    parser.add_argument('--quick', action='store_true', help='5 rounds of at least 10 ms (smoke test, noisy)')
+    parser.add_argument('--list', action='store_true', help='list benchmark names and exit')
+    parser.add_argument('--save', nargs='?', const=BASELINE, metavar='PATH',
+                        help=f'write results as JSON (default path: {os.path.relpath(BASELINE, REPO_ROOT)})')
+    parser.add_argument('--compare', nargs='?', const=BASELINE, metavar='PATH',
+                        help='compare with saved results and exit 1 on regressions (default: the baseline)')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='slowdown of the median counted as a regression, as a fraction (default: %(default)s)')
+    parser.add_argument('--memory-threshold', type=float, default=0.2,
+                        help='growth of peak memory counted as a regression, as a fraction (default: %(default)s)')
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.rounds, args.min_time = 5, 0.01
+
+    benchmarks = load_suites(args.suite or SUITES)
+    if args.pattern:
+        benchmarks = [bench for bench in benchmarks if args.pattern in bench.name]
+    if args.list:
+        for bench in benchmarks:
+            print(bench.name)
+        return 0
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get('version') != harness.RESULTS_VERSION:
+            print(f"{args.compare}: unsupported results version {baseline.get('version')}")
+            return 2
+
+    current = {
+        'version': harness.RESULTS_VERSION,
+        'environment': harness.environment(),
+        'settings': {'rounds': args.rounds, 'min_time': args.min_time},
+        'benchmarks': run(benchmarks, args.rounds, args.min_time),
+    }
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"Saved results to {args.save}")
+
+    if baseline is not None:
+        # Only benchmarks selected for this run are compared
+        selected = {bench.name for bench in benchmarks}
+        baseline = dict(baseline, benchmarks={
+            name: result for name, result in baseline['benchmarks'].items() if name in selected
+        })
+        rows = harness.compare(baseline, current, args.threshold, args.memory_threshold)
+        print_comparison(rows, baseline, current)
+        regressions = [name for name, status, _, _ in rows if status == 'regression']
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond the thresholds: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    # Hash randomization changes dict/set layouts between runs; fix it for comparable numbers.
+    if os.environ.get('PYTHONHASHSEED') != '0':
+        os.execve(sys.executable, [sys.executable] + sys.argv, dict(os.environ, PYTHONHASHSEED='0'))
+    sys.exit(main())
@@ -14,6 +14,7 @@ setup(
     long_description_content_type="text/markdown",
     url='https://github.com/Chidi09/audiolms', # Updated with your GitHub username
     packages=find_packages(),
+    package_data={'audiolms': ['static/*']}, # Demo page CSS/JS, served by audiolms.assets
     install_requires=[
         'sounddevice>=0.4.6',       # For offline microphone recording (recorder.py) - conceptual for live demo
         'wavio>=0.0.4',             # For WAV file handling (recorder.py) - conceptual for live demo
@@ -23,8 +24,18 @@ setup(
         'python-socketio[asyncio]>=5.4.0', # Dependency for Flask-SocketIO
         'aiortc>=1.0.0',            # For WebRTC core functionality
         'av>=8.0.0',                # Required by aiortc for media processing
+        'numpy>=1.20',              # Audio mixing (live breakout rooms)
         # 'boto3>=1.26.0',          # Uncomment if you specifically need S3 storage support
     ],
+    extras_require={
+        'asgi': [
+            'uvicorn>=0.20.0',      # ASGI server for the native asyncio mode (audiolms.asgi)
+            'asgiref>=3.5.0',       # WsgiToAsgi adapter mounting the Flask app under ASGI
+        ],
+        'brotli': [
+            'brotli>=1.0',          # Brotli-precompressed static assets (gzip is always available)
+        ],
+    },
     classifiers=[
         'Programming Language :: Python :: 3',
         'License :: OSI Approved :: MIT License',